@@ -3,12 +3,17 @@
 # It includes basic functionalities like adding blocks, mining, and validating the chain.
 # Author: Roni Herschmann
 
+import functools
 import hashlib
+import math
 import time
 import json
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Callable
+from itertools import islice
 import threading
+from metrics import REGISTRY, DURATION_BUCKETS
+import tracing
 
 # Configure logging
 logging.basicConfig(
@@ -19,33 +24,268 @@ logger = logging.getLogger("blockchain")
 
 # Constants
 GENESIS_PREVIOUS_HASH = "0"
+GENESIS_TIMESTAMP = 0.0  # fixed so every node derives the same genesis block
 MINING_TIMEOUT_SECONDS = 60
 MAX_MINING_ITERATIONS = 10000000  # 10 million iterations max
+MAX_BLOCK_TRANSACTIONS = 10000  # transactions taken from the mempool per block
+ORPHAN_HISTORY = 10000  # orphaned transaction IDs remembered for status queries
+TARGET_BLOCK_TIME = 10  # seconds per block that retargeting aims for
+RETARGET_WINDOW = 10  # blocks whose timestamps set the next block's target
+MAX_RETARGET = 4  # a window's timespan counts as at most 4x (at least 1/4x) the target
+MEDIAN_TIME_SPAN = 11  # a block's timestamp must be later than the median of this many before it
+MAX_FUTURE_DRIFT = 120  # seconds a block's timestamp may run ahead of the validating node's clock
+
+# Metrics
+MINE_SECONDS = REGISTRY.histogram("blockchain_mine_seconds",
+                                  "Proof-of-work time per mining attempt", buckets=DURATION_BUCKETS)
+MINE_ITERATIONS = REGISTRY.histogram("blockchain_mine_iterations",
+                                     "Hashes tried per mining attempt",
+                                     buckets=(10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000))
+MINE_HASHES = REGISTRY.counter("blockchain_mine_hashes_total", "Block hashes computed while mining")
+HASH_RATE = REGISTRY.gauge("blockchain_hash_rate", "Hashes per second of the last mining attempt")
+TRANSACTIONS = REGISTRY.counter("blockchain_transactions_total",
+                                "Transactions offered to the mempool, by outcome", ["result"])
+TX_ACCEPTED, TX_INVALID, TX_DUPLICATE = (TRANSACTIONS.labels(r) for r in ("accepted", "invalid", "duplicate"))
+REORGS = REGISTRY.counter("blockchain_reorgs_total", "Reorganizations that detached blocks")
+REORG_DEPTH = REGISTRY.histogram("blockchain_reorg_depth_blocks", "Blocks detached per reorganization",
+                                 buckets=(1, 2, 3, 5, 10, 25, 100))
 
 class BlockValidationError(Exception):
     """Exception raised for validation errors in blocks or the blockchain."""
     pass
 
+# one shared encoder: json.dumps() with non-default options builds a new
+# JSONEncoder on every call
+_CANONICAL_JSON = json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+
+def transaction_id(transaction: Dict) -> str:
+    """
+    Stable ID of a transaction: SHA-256 of its canonical JSON form.
+    Two transactions with identical content share an ID, which is what
+    duplicate detection already treats as "the same vote".
+    """
+    canonical = _CANONICAL_JSON.encode(transaction)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def vote_error(votes) -> str | None:
+    """
+    Why a transaction's "vote" can't be counted, or None if it can: it
+    must map candidates to non-negative integer counts. The one check
+    behind /vote, the console and bulk ingest, and validate_transaction()
+    applies it to every transaction, gossiped ones included.
+    """
+    if not isinstance(votes, dict):
+        return "vote must map candidates to counts"
+    for n in votes.values():
+        if type(n) is not int:
+            return "vote counts must be integers"
+        if n < 0:
+            return "vote counts must not be negative"
+    return None
+
+# ───────────────── Merkle tree over a block's contents ─────────────────
+# Leaves are the transaction IDs followed by one digest of the block's node
+# list, so the root commits to everything but the header fields. Leaf and
+# inner hashes are domain‑separated; an odd node is carried up unchanged.
+EMPTY_MERKLE_ROOT = "0" * 64
+
+def _merkle_leaf(item: str) -> bytes:
+    return hashlib.sha256(b"\x00" + bytes.fromhex(item)).digest()
+
+def _merkle_parent(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+def merkle_levels(items: List[str]) -> List[List[bytes]]:
+    """All tree levels, leaves first. `items` are hex digests."""
+    level = [_merkle_leaf(i) for i in items]
+    levels = [level]
+    while len(level) > 1:
+        level = [_merkle_parent(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+        levels.append(level)
+    return levels
+
+def merkle_root(items: List[str]) -> str:
+    if not items:
+        return EMPTY_MERKLE_ROOT
+    return merkle_levels(items)[-1][0].hex()
+
+def merkle_path(items: List[str], position: int) -> List[List[str]]:
+    """
+    Inclusion path for items[position]: one [sibling_hex, "L" | "R"] pair
+    per level that has a sibling, ordered from the leaf up.
+    """
+    path = []
+    for level in merkle_levels(items)[:-1]:
+        sibling = position ^ 1
+        if sibling < len(level):
+            path.append([level[sibling].hex(), "L" if sibling < position else "R"])
+        position //= 2
+    return path
+
+def verify_merkle_path(item: str, path: List[List[str]], root: str) -> bool:
+    """Check that `item` (hex digest) is a leaf of the tree with this root."""
+    try:
+        node = _merkle_leaf(item)
+        for sibling, side in path:
+            sib = bytes.fromhex(sibling)
+            node = _merkle_parent(sib, node) if side == "L" else _merkle_parent(node, sib)
+    except (ValueError, TypeError):
+        return False
+    return node.hex() == root
+
+def nodes_digest(nodes: List[str]) -> str:
+    return hashlib.sha256(json.dumps(nodes, separators=(",", ":")).encode()).hexdigest()
+
+def verify_vote_proof(proof: Dict, header: Dict) -> bool:
+    """
+    Check a Blockchain.get_vote_proof() result against a header the caller
+    already trusts (e.g. from its own HeaderChain): the transaction must
+    hash to the claimed ID and that ID must sit under the header's
+    merkle_root.
+    """
+    try:
+        return (transaction_id(proof["transaction"]) == proof["tx_id"] and
+                proof["header"]["hash"] == header["hash"] and
+                verify_merkle_path(proof["tx_id"], proof["path"], header["merkle_root"]))
+    except (KeyError, TypeError):
+        return False
+
+# ───────────────── Proof‑of‑work targets ─────────────────
+# A block's hash, read as a 256‑bit number, must not exceed the target its
+# header carries. Targets are stored in compact "bits" form (one size byte,
+# three mantissa bytes) and retargeted every block from the timestamps of
+# the RETARGET_WINDOW blocks before it, so every node derives the same
+# target for a block from the chain it extends.
+MAX_TARGET = 1 << 256  # every hash passes
+
+def bits_to_target(bits: int) -> int:
+    size, mantissa = bits >> 24, bits & 0x7fffff
+    return mantissa << 8 * (size - 3) if size > 3 else mantissa >> 8 * (3 - size)
+
+def target_to_bits(target: int) -> int:
+    """Compact form of `target`, rounded down to three significant bytes."""
+    size = (target.bit_length() + 7) // 8
+    mantissa = target << 8 * (3 - size) if size <= 3 else target >> 8 * (size - 3)
+    if mantissa & 0x800000:  # keep the sign bit clear
+        mantissa >>= 8
+        size += 1
+    return size << 24 | mantissa
+
+def difficulty_bits(zeros: int) -> int:
+    """Target equivalent to requiring `zeros` leading zero hex digits."""
+    return target_to_bits(MAX_TARGET >> 4 * zeros)
+
+MAX_BITS = difficulty_bits(0)
+
+@functools.lru_cache(maxsize=256)
+def _target_hex(bits: int) -> str:
+    # the largest passing hash as hex: equal‑length lowercase hex strings
+    # compare like the numbers they spell, so mining needs no int() per hash
+    return f"{max(min(bits_to_target(bits), MAX_TARGET), 1) - 1:064x}"
+
+def meets_target(block_hash: str, bits: int) -> bool:
+    return block_hash <= _target_hex(bits)
+
+def retarget(window: List[Tuple[float, int]], parent_index: int, limit_bits: int,
+             block_time: float = TARGET_BLOCK_TIME) -> int:
+    """
+    Target of the block that follows a parent at height `parent_index`.
+
+    Args:
+        window: (timestamp, bits) of the blocks up to and including the
+            parent, oldest first; the last RETARGET_WINDOW + 1 are used
+        parent_index: Height of the parent block
+        limit_bits: Easiest target allowed (the genesis block's)
+        block_time: Seconds per block to aim for; 0 disables retargeting
+
+    Returns:
+        int: Compact target: the mean target of the last RETARGET_WINDOW
+        blocks, scaled by how long they took against block_time (at most
+        MAX_RETARGET times either way). Until the chain is that long, the
+        parent's target
+    """
+    if parent_index < RETARGET_WINDOW or block_time <= 0:
+        return window[-1][1]
+    recent = window[-RETARGET_WINDOW - 1:]
+    expected = RETARGET_WINDOW * block_time
+    span = min(max(recent[-1][0] - recent[0][0], expected / MAX_RETARGET), expected * MAX_RETARGET)
+    total = sum(bits_to_target(bits) for _, bits in recent[1:])
+    target = total * round(span * 1000) // (RETARGET_WINDOW * round(expected * 1000))
+    return target_to_bits(max(1, min(target, bits_to_target(limit_bits))))
+
+# ───────────────── Block timestamps ─────────────────
+# Timestamps feed retargeting, so they are bounded both ways: later than
+# the median of the MEDIAN_TIME_SPAN blocks before (which no single
+# miner's clock can drag back) and no more than MAX_FUTURE_DRIFT ahead of
+# the clock of the node checking them. The span fits in the window that
+# retargeting already reads (RETARGET_WINDOW + 1 blocks).
+def median_time_past(timestamps: List[float]) -> float:
+    """Median of the last MEDIAN_TIME_SPAN timestamps (the later middle one of an even count)."""
+    recent = sorted(timestamps[-MEDIAN_TIME_SPAN:])
+    return recent[len(recent) // 2]
+
+def timestamp_error(timestamp: float, earlier: List[float]) -> str | None:
+    """
+    Check a block's timestamp against the blocks before it and this
+    node's clock.
+
+    Args:
+        timestamp: The block's timestamp
+        earlier: Timestamps of the blocks up to and including its parent,
+            oldest first; the last MEDIAN_TIME_SPAN are used
+
+    Returns:
+        str | None: What is wrong with the timestamp, or None if it is valid
+    """
+    if not isinstance(timestamp, (int, float)):
+        return "invalid timestamp"
+    if timestamp <= median_time_past(earlier):
+        return "timestamp not after median time past"
+    if timestamp > time.time() + MAX_FUTURE_DRIFT:
+        return "timestamp too far in the future"
+    return None
+
 class Block:
     def __init__(self, index: int, previous_hash: str, timestamp: float,
-                 transactions: List[Dict], nodes: List[str], nonce: int = 0):
+                 transactions: List[Dict], nodes: List[str], nonce: int = 0,
+                 bits: int = MAX_BITS):
         self.index = index
         self.previous_hash = previous_hash
-        self.timestamp = timestamp
+        # always a float: the hash covers its JSON form, and the binary
+        # codec packs a double, so an int would not survive a round trip
+        self.timestamp = float(timestamp) if type(timestamp) is int else timestamp
         self.transactions = transactions  # List of vote transactions
         self.nodes = nodes  # Current nodes in network
         self.nonce = nonce
+        self.bits = bits  # Compact proof-of-work target (see retarget)
+        self.merkle_root = self.compute_merkle_root()
         self.hash = self.calculate_hash()
+
+    def merkle_items(self) -> List[str]:
+        """Merkle leaves: every transaction ID, then the node‑list digest."""
+        return [transaction_id(tx) for tx in self.transactions] + [nodes_digest(self.nodes)]
+
+    def compute_merkle_root(self) -> str:
+        return merkle_root(self.merkle_items())
         
     def calculate_hash(self) -> str:
-        """Calculate the hash of this block."""
+        """
+        Calculate the hash of this block. Only header fields are hashed;
+        the transactions and nodes enter through merkle_root.
+        """
+        return self.hash_header(self.header())
+
+    @staticmethod
+    def hash_header(header: Dict) -> str:
+        """Block hash from header fields alone (what a light client checks)."""
         block_string = json.dumps({
-            "index": self.index,
-            "previous_hash": self.previous_hash,
-            "timestamp": self.timestamp,
-            "transactions": self.transactions,
-            "nodes": self.nodes,
-            "nonce": self.nonce
+            "index": header["index"],
+            "previous_hash": header["previous_hash"],
+            "timestamp": header["timestamp"],
+            "merkle_root": header["merkle_root"],
+            "nonce": header["nonce"],
+            "bits": header["bits"]
         }, sort_keys=True).encode()
         
         return hashlib.sha256(block_string).hexdigest()
@@ -57,63 +297,112 @@ class Block:
             "index": self.index,
             "previous_hash": self.previous_hash,
             "timestamp": self.timestamp,
+            "merkle_root": self.merkle_root,
             "nonce": self.nonce,
-            "hash": self.hash
+            "bits": self.bits,
+            "hash": getattr(self, "hash", None)
         }
         
-    def mine_block(self, difficulty: int) -> None:
+    def mine_block(self) -> None:
         """
-        Proof of work: Find a hash that starts with 'difficulty' number of zeros
+        Proof of work: Find a nonce whose hash meets the block's own target
+        (self.bits)
         
-        Args:
-            difficulty: Number of leading zeros required in the hash
-            
         Raises:
             TimeoutError: If mining takes too long
         """
-        target = '0' * difficulty
+        target = _target_hex(self.bits)
         start_time = time.time()
+        start_ns = time.perf_counter_ns()
         iterations = 0
         
-        logger.info(f"Started mining block {self.index} with difficulty {difficulty}")
+        logger.info(f"Started mining block {self.index} with target bits {self.bits:#010x}")
         
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
-            iterations += 1
-            
-            # Check for timeout or excessive iterations
-            if time.time() - start_time > MINING_TIMEOUT_SECONDS:
-                logger.warning(f"Mining timeout after {MINING_TIMEOUT_SECONDS} seconds")
-                raise TimeoutError(f"Mining took longer than {MINING_TIMEOUT_SECONDS} seconds")
+        try:
+            while self.hash > target:
+                self.nonce += 1
+                self.hash = self.calculate_hash()
+                iterations += 1
                 
-            if iterations > MAX_MINING_ITERATIONS:
-                logger.warning(f"Exceeded max mining iterations ({MAX_MINING_ITERATIONS})")
-                raise TimeoutError(f"Mining exceeded {MAX_MINING_ITERATIONS} iterations")
+                # Check for timeout or excessive iterations
+                if time.time() - start_time > MINING_TIMEOUT_SECONDS:
+                    logger.warning(f"Mining timeout after {MINING_TIMEOUT_SECONDS} seconds")
+                    raise TimeoutError(f"Mining took longer than {MINING_TIMEOUT_SECONDS} seconds")
+                    
+                if iterations > MAX_MINING_ITERATIONS:
+                    logger.warning(f"Exceeded max mining iterations ({MAX_MINING_ITERATIONS})")
+                    raise TimeoutError(f"Mining exceeded {MAX_MINING_ITERATIONS} iterations")
+        finally:
+            # recorded once per attempt, never per hash
+            elapsed = time.time() - start_time
+            MINE_SECONDS.observe(elapsed)
+            MINE_ITERATIONS.observe(iterations)
+            MINE_HASHES.inc(iterations)
+            if elapsed > 0:
+                HASH_RATE.set(iterations / elapsed)
+            tracing.complete("mine_block", start_ns, time.perf_counter_ns() - start_ns,
+                             {"index": self.index, "bits": self.bits, "iterations": iterations})
         
         logger.info(f"Successfully mined block {self.index} with nonce {self.nonce} in {iterations} iterations")
             
-    def is_valid(self, difficulty: int) -> bool:
+    def tally(self) -> Dict[str, int]:
+        """Votes per candidate in this block alone."""
+        tally = {}
+        for transaction in self.transactions:
+            votes = transaction.get('vote', {})
+            if isinstance(votes, dict):
+                for cand, n in votes.items():
+                    tally[cand] = tally.get(cand, 0) + int(n)
+        return tally
+
+    def is_valid(self) -> bool:
         """
-        Validate the block's hash
+        Validate the block's hash against its contents and its own target.
+        Whether that target is the right one for its place in the chain is
+        checked by Blockchain.block_error.
         
-        Args:
-            difficulty: Number of leading zeros required in the hash
-            
         Returns:
             bool: True if the block is valid, False otherwise
         """
-        return (self.hash == self.calculate_hash() and
-                self.hash[:difficulty] == '0' * difficulty)
+        return self.hash == self.calculate_hash() and meets_target(self.hash, self.bits)
+
+
+def record_reorg(depth: int) -> None:
+    """Count a reorganization that detached `depth` blocks from the old tip."""
+    if depth > 0:
+        REORGS.inc()
+        REORG_DEPTH.observe(depth)
+
+def load_genesis(path: str) -> Dict:
+    """
+    Load a genesis block from a JSON config file.
+
+    Args:
+        path: File holding one block in the serialize_chain() format
+
+    Returns:
+        Dict: The genesis block fields
+
+    Raises:
+        BlockValidationError: If the block is not a valid genesis block
+    """
+    with open(path) as f:
+        genesis = json.load(f)
+    Blockchain.genesis_from_dict(genesis)      # validates
+    return genesis
 
 
 class Blockchain:
-    def __init__(self, difficulty: int = 3):
+    def __init__(self, difficulty: int = 3, genesis: Dict | None = None):
         """
         Initialize a new blockchain with genesis block
         
         Args:
-            difficulty: Number of leading zeros required in block hashes
+            difficulty: Leading zero hex digits the genesis block's target
+                requires; no later block may carry an easier target
+            genesis: Genesis block fields (e.g. from load_genesis); by
+                default a deterministic genesis is mined, so chains built
+                with the same difficulty share it
         """
         logger.info(f"Initializing blockchain with difficulty {difficulty}")
         
@@ -123,27 +412,115 @@ class Blockchain:
         # Thread‑safe access to the chain (allow re‑entrant acquisition)
         self.lock = threading.RLock()
         
-        # Pending transactions
+        # Pending transactions, plus tx_id ➜ transaction for O(1) lookups
         self.pending_transactions = []
+        self.pending_index: Dict[str, Dict] = {}
         self.transaction_lock = threading.Lock()
+
+        # tx_id ➜ block index for every transaction on the chain, and the
+        # block hashes that index was built from (see _sync_tx_index)
+        self._tx_index: Dict[str, int] = {}
+        self._indexed_hashes: List[str] = []
+        # tx_id ➜ height of the block it was on before a reorg removed it,
+        # and the IDs add_block is currently mining (out of the mempool,
+        # not yet on the chain)
+        self._orphaned: Dict[str, int] = {}
+        self._mining: set = set()
+        # IDs indexed since the last prune_pending (None: index was rebuilt,
+        # check the whole mempool)
+        self._unpruned: List[str] | None = []
+        # (height, block hash, tally) of the last get_votes_tally()
+        self._tally_cache: Tuple[int, str, Dict[str, int]] | None = None
+        # called after every chain change (see add_listener)
+        self._listeners: List[Callable[[], None]] = []
         
         # Create the genesis block
-        self.create_genesis_block()
+        self.create_genesis_block(genesis)
         
-        # Track time to mine blocks for potential difficulty adjustments
-        self.last_block_time = time.time()
-        self.target_block_time = 10  # Target 10 seconds per block
+        # Seconds per block that retargeting aims for. Part of the
+        # consensus rules: nodes with different values reject each other's
+        # blocks (0 disables retargeting)
+        self.target_block_time = TARGET_BLOCK_TIME
         
-    def create_genesis_block(self) -> None:
-        """Create the first block in the chain"""
+    def create_genesis_block(self, genesis: Dict | None = None) -> None:
+        """
+        Create the first block in the chain
+
+        Args:
+            genesis: Genesis block fields to use instead of the default
+        """
         logger.info("Creating genesis block")
         
-        genesis_block = Block(0, GENESIS_PREVIOUS_HASH, time.time(), [], [], 0)
-        genesis_block.mine_block(self.difficulty)
+        if genesis is not None:
+            genesis_block = self.genesis_from_dict(genesis)
+        else:
+            genesis_block = Block(0, GENESIS_PREVIOUS_HASH, GENESIS_TIMESTAMP, [], [], 0,
+                                  difficulty_bits(self.difficulty))
+            genesis_block.mine_block()
         
         with self.lock:
             self.chain.append(genesis_block)
+
+    @staticmethod
+    def genesis_from_dict(genesis: Dict) -> Block:
+        """
+        Build and check a genesis block from its fields.
+
+        Raises:
+            BlockValidationError: If it isn't block 0, doesn't follow
+                GENESIS_PREVIOUS_HASH, or its hash doesn't match its contents
+        """
+        try:
+            block = Block(genesis["index"], genesis["previous_hash"], genesis["timestamp"],
+                          genesis["transactions"], genesis["nodes"], genesis["nonce"], genesis["bits"])
+        except (KeyError, TypeError) as e:
+            raise BlockValidationError(f"Malformed genesis block: {e}")
+        if block.index != 0 or block.previous_hash != GENESIS_PREVIOUS_HASH:
+            raise BlockValidationError("Genesis block must be index 0 with the genesis previous hash")
+        if genesis.get("hash", block.hash) != block.hash:
+            raise BlockValidationError("Genesis block hash does not match its contents")
+        return block
+
+    def reset_genesis(self, genesis: Dict) -> bool:
+        """
+        Adopt another genesis block, e.g. the one a tracker distributes.
+        Only possible while the chain holds nothing but its genesis.
+
+        Returns:
+            bool: True if the chain now starts with `genesis`
+        """
+        block = self.genesis_from_dict(genesis)
+        with self.lock:
+            if self.chain[0].hash == block.hash:
+                return True
+            if len(self.chain) > 1:
+                logger.error("Cannot switch genesis block: chain already has blocks")
+                return False
+            self.chain[0] = block
+            self._tx_index.clear()
+            self._indexed_hashes = []
+            self._unpruned = None
+        logger.info(f"Adopted genesis block {block.hash[:12]}")
+        self.notify_changed()
+        return True
         
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """
+        Register `callback()` to run after every change to the chain. It
+        runs in the thread that made the change, so it should only hand
+        the work off (e.g. set an Event).
+        """
+        self._listeners.append(callback)
+
+    def notify_changed(self) -> None:
+        """
+        Run the chain‑change listeners. Blockchain methods call this
+        themselves; code that edits self.chain directly must call it
+        afterwards.
+        """
+        for callback in list(self._listeners):
+            callback()
+
     def get_latest_block(self) -> Block:
         """
         Get the most recent block in the chain
@@ -159,6 +536,77 @@ class Blockchain:
                 logger.error("Attempted to get latest block from empty chain")
                 raise ValueError("Blockchain is empty")
             return self.chain[-1]
+
+    def next_bits(self, parent_index: int | None = None) -> int:
+        """
+        Target a block following chain[parent_index] must carry
+        
+        Args:
+            parent_index: Height of the parent block (default: the tip)
+            
+        Returns:
+            int: Compact target (see retarget)
+        """
+        with self.lock:
+            end = len(self.chain) if parent_index is None else parent_index + 1
+            return self._retarget(self.chain[max(0, end - RETARGET_WINDOW - 1):end])
+
+    def _retarget(self, window: List[Block]) -> int:
+        return retarget([(b.timestamp, b.bits) for b in window], window[-1].index,
+                        self.chain[0].bits, self.target_block_time)
+
+    def block_error(self, block: Block, window: List[Block]) -> str | None:
+        """
+        Check that a block can follow window[-1]: linked to it, with a
+        timestamp in bounds (see timestamp_error), hashed from its header,
+        carrying the target retargeting gives it and meeting that target
+        
+        Args:
+            block: The block to check
+            window: Blocks up to and including its parent, oldest first;
+                at least RETARGET_WINDOW + 1 of them, or all from genesis
+            
+        Returns:
+            str | None: What is wrong with the block, or None if it is valid
+        """
+        parent = window[-1]
+        if block.previous_hash != parent.hash or block.index != parent.index + 1:
+            return "invalid previous hash"
+        error = timestamp_error(block.timestamp, [b.timestamp for b in window])
+        if error:
+            return error
+        if block.hash != block.calculate_hash():
+            return "invalid hash"
+        if block.bits != self._retarget(window):
+            return "wrong difficulty target"
+        if not meets_target(block.hash, block.bits):
+            return "invalid proof of work"
+        return None
+
+    def extension_error(self, blocks: List[Block], after: int | None = None) -> str | None:
+        """
+        Check a run of blocks that would be appended to the chain as it is
+        now. Callers that then append them should hold self.lock across
+        both.
+        
+        Args:
+            blocks: The blocks, in index order
+            after: Height of the block the run would follow (default: the
+                tip; lower for a branch that forks below it)
+            
+        Returns:
+            str | None: What is wrong with the first invalid block, or None
+            if the whole run can follow that block
+        """
+        with self.lock:
+            end = len(self.chain) if after is None else after + 1
+            window = self.chain[max(0, end - RETARGET_WINDOW - 1):end] + list(blocks)
+            first = len(window) - len(blocks)
+            for pos in range(first, len(window)):
+                error = self.block_error(window[pos], window[max(0, pos - RETARGET_WINDOW - 1):pos])
+                if error:
+                    return f"block #{window[pos].index}: {error}"
+        return None
     
     def validate_transaction(self, transaction: Dict) -> bool:
         """
@@ -172,26 +620,38 @@ class Blockchain:
         """
         # Check transaction format
         if not isinstance(transaction, dict):
-            logger.warning(f"Invalid transaction format: {transaction}")
+            tracing.instant("tx.invalid", "not a dict")
+            if tracing.VERBOSE:
+                logger.warning(f"Invalid transaction format: {transaction}")
             return False
             
         # Check required fields for a vote transaction
         if 'vote' not in transaction:
-            logger.warning(f"Transaction missing 'vote' field: {transaction}")
+            tracing.instant("tx.invalid", "missing vote")
+            if tracing.VERBOSE:
+                logger.warning(f"Transaction missing 'vote' field: {transaction}")
             return False
             
         # Check for timestamp
         if 'timestamp' not in transaction:
-            logger.warning(f"Transaction missing 'timestamp' field: {transaction}")
+            tracing.instant("tx.invalid", "missing timestamp")
+            if tracing.VERBOSE:
+                logger.warning(f"Transaction missing 'timestamp' field: {transaction}")
             return False
             
-        # Additional validation can be added here
+        # Check the counts, which Block.tally() adds up
+        error = vote_error(transaction['vote'])
+        if error:
+            tracing.instant("tx.invalid", error)
+            if tracing.VERBOSE:
+                logger.warning(f"Transaction has an invalid vote ({error}): {transaction}")
+            return False
         
         return True
         
     def is_duplicate_transaction(self, transaction: Dict) -> bool:
         """
-        Check if a transaction is already in the pending list
+        Check if a transaction is already pending or on the chain
         
         Args:
             transaction: The transaction to check
@@ -199,17 +659,173 @@ class Blockchain:
         Returns:
             bool: True if it's a duplicate, False otherwise
         """
+        return self.has_transaction(transaction_id(transaction))
+
+    def has_transaction(self, tx_id: str) -> bool:
+        """
+        Check whether a transaction ID is known, either in the mempool (or
+        being mined) or already confirmed on the chain.
+        
+        Args:
+            tx_id: ID as returned by transaction_id()
+            
+        Returns:
+            bool: True if the transaction is known
+        """
         with self.transaction_lock:
-            # Create a serialized version of the transaction for comparison
-            tx_string = json.dumps(transaction, sort_keys=True)
-            
-            # Check against all pending transactions
-            for pending_tx in self.pending_transactions:
-                pending_tx_string = json.dumps(pending_tx, sort_keys=True)
-                if pending_tx_string == tx_string:
-                    return True
-                    
-        return False
+            if tx_id in self.pending_index or tx_id in self._mining:
+                return True
+        with self.lock:
+            self._sync_tx_index()
+            return tx_id in self._tx_index
+
+    def _sync_tx_index(self) -> None:
+        """
+        Bring the chain transaction index up to date. Caller holds self.lock.
+
+        Appending blocks (the common case) only indexes the new blocks; any
+        other change to the chain (reorg, replacement) triggers a rebuild.
+        """
+        indexed = len(self._indexed_hashes)
+        previous = None
+        if (indexed > len(self.chain) or
+                (indexed and self.chain[indexed - 1].hash != self._indexed_hashes[-1])):
+            previous = self._tx_index
+            self._tx_index = {}
+            self._indexed_hashes = []
+            self._unpruned = None
+            indexed = 0
+
+        for block in self.chain[indexed:]:
+            for tx in block.transactions:
+                tx_id = transaction_id(tx)
+                self._tx_index[tx_id] = block.index
+                if self._unpruned is not None:
+                    self._unpruned.append(tx_id)
+                if self._orphaned:
+                    self._orphaned.pop(tx_id, None)
+            self._indexed_hashes.append(block.hash)
+
+        if previous:
+            # remember where transactions dropped by the rebuild used to be
+            for tx_id, height in previous.items():
+                if tx_id not in self._tx_index:
+                    self._orphaned[tx_id] = height
+            while len(self._orphaned) > ORPHAN_HISTORY:
+                del self._orphaned[next(iter(self._orphaned))]
+
+    def get_transaction_status(self, tx_id: str) -> Dict | None:
+        """
+        Where a transaction is right now.
+        
+        Args:
+            tx_id: ID as returned by transaction_id()
+            
+        Returns:
+            Dict | None: {"tx_id", "status", ...} where status is
+            "pending" (in the mempool), "requeued" (back in the mempool
+            after a reorg removed its block), "mining", "mined" (with
+            height, block_hash and confirmations) or "orphaned" (its block
+            was removed and it is not in the mempool); None if unknown
+        """
+        with self.lock:
+            self._sync_tx_index()
+            height = self._tx_index.get(tx_id)
+            if height is not None:
+                return {
+                    "tx_id": tx_id,
+                    "status": "mined",
+                    "height": height,
+                    "block_hash": self.chain[height].hash,
+                    "confirmations": len(self.chain) - height
+                }
+            orphaned_at = self._orphaned.get(tx_id)
+            with self.transaction_lock:
+                pending = tx_id in self.pending_index
+                mining = tx_id in self._mining
+
+        if pending or mining:
+            status = {"tx_id": tx_id, "status": "mining" if mining else "pending"}
+        elif orphaned_at is not None:
+            status = {"tx_id": tx_id, "status": "orphaned"}
+        else:
+            return None
+        if orphaned_at is not None:
+            if pending:
+                status["status"] = "requeued"
+            status["orphaned_height"] = orphaned_at
+        return status
+
+    def get_pending_transactions(self, tx_ids: List[str]) -> List[Dict]:
+        """
+        Look up pending transactions by ID (unknown IDs are skipped).
+        
+        Args:
+            tx_ids: IDs to fetch from the mempool
+            
+        Returns:
+            List[Dict]: The matching pending transactions
+        """
+        with self.transaction_lock:
+            return [self.pending_index[t] for t in tx_ids if t in self.pending_index]
+
+    def get_vote_proof(self, tx_id: str) -> Dict | None:
+        """
+        Build a Merkle inclusion proof for a confirmed transaction.
+        
+        Args:
+            tx_id: ID as returned by transaction_id()
+            
+        Returns:
+            Dict | None: The transaction, the header of the block holding it
+            and the Merkle path from its ID to that header's merkle_root,
+            or None if the transaction is not on the chain
+        """
+        with self.lock:
+            self._sync_tx_index()
+            index = self._tx_index.get(tx_id)
+            if index is None or index >= len(self.chain):
+                return None
+            block = self.chain[index]
+            items = block.merkle_items()
+            position = items.index(tx_id)
+            return {
+                "tx_id": tx_id,
+                "transaction": block.transactions[position],
+                "header": block.header(),
+                "position": position,
+                "path": merkle_path(items, position)
+            }
+
+    @tracing.traced("Blockchain.prune_pending")
+    def prune_pending(self) -> int:
+        """
+        Drop pending transactions that have since been confirmed on the
+        chain, e.g. after accepting a block mined by a peer.
+        
+        Returns:
+            int: Number of transactions removed from the mempool
+        """
+        with self.lock:
+            self._sync_tx_index()
+            # only IDs confirmed since the last prune can be in the mempool
+            # unless the index was rebuilt
+            candidates, self._unpruned = self._unpruned, []
+            with self.transaction_lock:
+                if candidates is None:
+                    confirmed = [t for t in self.pending_index if t in self._tx_index]
+                else:
+                    # (a detach_after() may have unconfirmed some since)
+                    confirmed = [t for t in set(candidates)
+                                 if t in self.pending_index and t in self._tx_index]
+                if not confirmed:
+                    return 0
+                for tx_id in confirmed:
+                    del self.pending_index[tx_id]
+                self.pending_transactions = list(self.pending_index.values())
+        if tracing.VERBOSE:
+            logger.info(f"Pruned {len(confirmed)} confirmed transactions from the mempool")
+        return len(confirmed)
         
     def add_transaction(self, transaction: Dict) -> int:
         """
@@ -226,22 +842,82 @@ class Blockchain:
         """
         # Validate the transaction
         if not self.validate_transaction(transaction):
-            logger.warning(f"Rejected invalid transaction: {transaction}")
+            if tracing.VERBOSE:
+                logger.warning(f"Rejected invalid transaction: {transaction}")
+            TX_INVALID.inc()
             raise ValueError("Invalid transaction format")
             
         # Check for duplicates
         if self.is_duplicate_transaction(transaction):
-            logger.warning(f"Rejected duplicate transaction: {transaction}")
+            tracing.instant("tx.duplicate")
+            if tracing.VERBOSE:
+                logger.warning(f"Rejected duplicate transaction: {transaction}")
+            TX_DUPLICATE.inc()
             raise ValueError("Duplicate transaction")
             
-        # Add the transaction
+        # Add the transaction (re-checked under the lock so two threads
+        # racing on the same vote can't both insert it)
+        tx_id = transaction_id(transaction)
         with self.transaction_lock:
+            if tx_id in self.pending_index:
+                TX_DUPLICATE.inc()
+                raise ValueError("Duplicate transaction")
             self.pending_transactions.append(transaction)
+            self.pending_index[tx_id] = transaction
+        TX_ACCEPTED.inc()
+        tracing.instant("tx.added", tx_id)
+        if tracing.VERBOSE:
             logger.info(f"Added transaction: {transaction}")
             
-            # Return the index of the next block
-            return self.get_latest_block().index + 1
+        # Return the index of the next block (chain lock is taken outside
+        # the transaction lock to keep lock order chain → transactions)
+        return self.get_latest_block().index + 1
+        
+    @tracing.traced("Blockchain.add_transactions")
+    def add_transactions(self, transactions: List[Dict]) -> List[Tuple[str | None, str | None]]:
+        """
+        Batch form of add_transaction: the chain index and the mempool are
+        each locked once for the whole batch instead of once per call.
         
+        Args:
+            transactions: The transactions to add
+            
+        Returns:
+            List[Tuple[str | None, str | None]]: One (tx_id, error) pair per
+            transaction, in order; error is None if it was added, and
+            tx_id is None if it failed validation
+        """
+        results = []
+        for tx in transactions:
+            if self.validate_transaction(tx):
+                results.append((transaction_id(tx), None))
+            else:
+                results.append((None, "Invalid transaction format"))
+                
+        added = 0
+        with self.lock:
+            self._sync_tx_index()
+            with self.transaction_lock:
+                for i, (tx, (tx_id, error)) in enumerate(zip(transactions, results)):
+                    if error is not None:
+                        continue
+                    if (tx_id in self.pending_index or tx_id in self._mining or
+                            tx_id in self._tx_index):
+                        results[i] = (tx_id, "Duplicate transaction")
+                        continue
+                    self.pending_transactions.append(tx)
+                    self.pending_index[tx_id] = tx
+                    added += 1
+                    
+        invalid = sum(1 for tx_id, _ in results if tx_id is None)
+        TX_ACCEPTED.inc(added)
+        TX_INVALID.inc(invalid)
+        TX_DUPLICATE.inc(len(transactions) - added - invalid)
+        if tracing.VERBOSE:
+            logger.info(f"Added {added} of {len(transactions)} transactions")
+        return results
+        
+    @tracing.traced("Blockchain.add_block")
     def add_block(self, nodes: List[str]) -> Block:
         """
         Add a new block to the chain with pending transactions
@@ -252,95 +928,113 @@ class Blockchain:
         Returns:
             Block: The newly created and mined block
         """
-        logger.info("Creating new block with pending transactions")
+        if tracing.VERBOSE:
+            logger.info("Creating new block with pending transactions")
         
-        # Get pending transactions with the lock
+        # Drop anything a peer has already mined, then take the rest
+        self.prune_pending()
         with self.transaction_lock:
             if not self.pending_transactions:
                 logger.warning("No pending transactions to include in block")
                 return None
                 
-            transactions = self.pending_transactions.copy()
-            self.pending_transactions = []
-            
-        # Create and mine the new block
-        with self.lock:
-            latest_block = self.get_latest_block()
-            new_block = Block(
-                latest_block.index + 1,
-                latest_block.hash,
-                time.time(),
-                transactions,
-                nodes
-            )
+            # at most MAX_BLOCK_TRANSACTIONS, oldest first; the list and
+            # the index are kept in the same order
+            transactions = self.pending_transactions[:MAX_BLOCK_TRANSACTIONS]
+            mining = set(islice(self.pending_index, MAX_BLOCK_TRANSACTIONS))
+            self._mining |= mining
+            del self.pending_transactions[:MAX_BLOCK_TRANSACTIONS]
+            for tx_id in mining:
+                del self.pending_index[tx_id]
             
-            try:
-                # Mine the block
-                new_block.mine_block(self.difficulty)
-                
-                # Add to chain
-                self.chain.append(new_block)
-                
-                # Update timing information for difficulty adjustment
-                current_time = time.time()
-                block_time = current_time - self.last_block_time
-                self.last_block_time = current_time
+        # Create and mine the new block. The proof of work runs without the
+        # chain lock so lookups, new transactions and peers' blocks aren't
+        # held up; if the tip moved meanwhile, mine again on the new one.
+        try:
+            while True:
+                with self.lock:
+                    latest_block = self.get_latest_block()
+                    bits = self.next_bits()
+                    # a clock behind the chain's still gives a valid timestamp
+                    earliest = math.nextafter(median_time_past(
+                        [b.timestamp for b in self.chain[-MEDIAN_TIME_SPAN:]]), math.inf)
+                new_block = Block(
+                    latest_block.index + 1,
+                    latest_block.hash,
+                    max(time.time(), earliest),
+                    transactions,
+                    nodes,
+                    bits=bits
+                )
                 
-                # Adjust difficulty if needed
-                self._adjust_difficulty(block_time)
+                # Mine the block
+                new_block.mine_block()
                 
+                with self.lock:
+                    if self.get_latest_block().hash != latest_block.hash:
+                        logger.info(f"Tip moved while mining block #{new_block.index}; mining again")
+                        self._sync_tx_index()
+                        transactions = [tx for tx in transactions
+                                        if transaction_id(tx) not in self._tx_index]
+                        if not transactions:
+                            return None
+                        continue
+                    
+                    # Add to chain
+                    self.chain.append(new_block)
+                    
                 logger.info(f"Added new block #{new_block.index} with {len(transactions)} transactions")
+                self.notify_changed()
                 return new_block
                 
-            except TimeoutError as e:
-                logger.error(f"Mining failed: {str(e)}")
-                
-                # Return pending transactions to the pool
-                with self.transaction_lock:
-                    self.pending_transactions.extend(transactions)
-                    
-                return None
-    
-    def _adjust_difficulty(self, block_time: float) -> None:
-        """
-        Adjust mining difficulty based on the time taken to mine the last block
-        
-        Args:
-            block_time: Time taken to mine the last block in seconds
-        """
-        # Only adjust after we have some blocks
-        if len(self.chain) < 10:
-            return
+        except TimeoutError as e:
+            logger.error(f"Mining failed: {str(e)}")
             
-        # If blocks are taking too long, decrease difficulty
-        if block_time > self.target_block_time * 2:
-            if self.difficulty > 1:
-                self.difficulty -= 1
-                logger.info(f"Decreased difficulty to {self.difficulty} (block time: {block_time:.2f}s)")
+            # Return pending transactions to the pool
+            with self.transaction_lock:
+                for tx in transactions:
+                    tx_id = transaction_id(tx)
+                    if tx_id not in self.pending_index:
+                        self.pending_index[tx_id] = tx
+                        self.pending_transactions.append(tx)
                 
-        # If blocks are being mined too quickly, increase difficulty
-        elif block_time < self.target_block_time / 2:
-            self.difficulty += 1
-            logger.info(f"Increased difficulty to {self.difficulty} (block time: {block_time:.2f}s)")
+            return None
+        finally:
+            with self.transaction_lock:
+                self._mining -= mining
     
-    def get_votes_tally(self) -> Dict:
+    @tracing.traced("Blockchain.get_votes_tally")
+    def get_votes_tally(self, chain: List[Block] | None = None) -> Dict:
         """
-        Calculate the vote tally across the entire blockchain
+        Calculate the vote tally across the entire blockchain. The result
+        is cached against the tip; while the cached tip is still on the
+        chain only the blocks after it are added in.
+
+        Args:
+            chain: A snapshot of self.chain to tally instead of the live
+                chain (so the result describes exactly that snapshot)
         
         Returns:
             Dict: Dictionary with candidate names as keys and vote counts as values
         """
-        tally = {}
         with self.lock:
-            for block in self.chain:
-                for transaction in block.transactions:
-                    votes = transaction.get('vote', {})
-                    if isinstance(votes, dict):
-                        for cand, n in votes.items():
-                            tally[cand] = tally.get(cand, 0) + int(n)
-        logger.info(f"Current vote tally: {tally}")            
+            if chain is None:
+                chain = self.chain
+            cached = self._tally_cache
+            if cached and cached[0] < len(chain) and chain[cached[0]].hash == cached[1]:
+                start, tally = cached[0] + 1, dict(cached[2])
+            else:
+                start, tally = 0, {}
+            for block in chain[start:]:
+                for cand, n in block.tally().items():
+                    tally[cand] = tally.get(cand, 0) + n
+            tip = chain[-1]
+            self._tally_cache = (len(chain) - 1, tip.hash, dict(tally))
+        if tracing.VERBOSE:
+            logger.info(f"Current vote tally: {tally}")
         return tally
         
+    @tracing.traced("Blockchain.is_chain_valid")
     def is_chain_valid(self) -> bool:
         """
         Validate the entire blockchain
@@ -348,7 +1042,8 @@ class Blockchain:
         Returns:
             bool: True if the chain is valid, False otherwise
         """
-        logger.info("Validating blockchain integrity")
+        if tracing.VERBOSE:
+            logger.info("Validating blockchain integrity")
         
         with self.lock:
             # Check if chain is empty
@@ -361,29 +1056,71 @@ class Blockchain:
                 logger.error("Invalid genesis block")
                 return False
                 
-            # Validate each block
+            # Validate each block: links, hash, and proof of work against
+            # the target retargeting gives it
             for i in range(1, len(self.chain)):
-                current = self.chain[i]
-                previous = self.chain[i-1]
-                
-                # Check hash integrity
-                if current.hash != current.calculate_hash():
-                    logger.error(f"Block #{current.index} has invalid hash")
-                    return False
-                    
-                # Check link integrity
-                if current.previous_hash != previous.hash:
-                    logger.error(f"Block #{current.index} has invalid previous hash")
-                    return False
-                    
-                # Check proof of work
-                if current.hash[:self.difficulty] != '0' * self.difficulty:
-                    logger.error(f"Block #{current.index} has invalid proof of work")
+                error = self.block_error(self.chain[i], self.chain[max(0, i - RETARGET_WINDOW - 1):i])
+                if error:
+                    logger.error(f"Block #{self.chain[i].index} has {error}")
                     return False
             
-            logger.info("Blockchain is valid")        
+            if tracing.VERBOSE:
+                logger.info("Blockchain is valid")
             return True
         
+    @tracing.traced("Blockchain.detach_after")
+    def detach_after(self, index: int) -> List[Block]:
+        """
+        Remove every block after chain[index] (a reorg's first step) and
+        put their transactions back into the mempool, ahead of the ones
+        already waiting. The chain index is unwound block by block, so the
+        cost grows with the detached transactions, not the chain.
+        
+        Args:
+            index: Height of the last block to keep
+            
+        Returns:
+            List[Block]: The detached blocks, oldest first
+        """
+        with self.lock:
+            self._sync_tx_index()
+            detached = self.chain[index + 1:]
+            if not detached:
+                return []
+            del self.chain[index + 1:]
+            del self._indexed_hashes[index + 1:]
+            requeue = {}
+            for block in detached:
+                for tx in block.transactions:
+                    tx_id = transaction_id(tx)
+                    self._tx_index.pop(tx_id, None)
+                    self._orphaned[tx_id] = block.index
+                    requeue[tx_id] = tx
+            while len(self._orphaned) > ORPHAN_HISTORY:
+                del self._orphaned[next(iter(self._orphaned))]
+            # a tally cached at the old tip is rolled back, not recounted
+            cached = self._tally_cache
+            if cached and cached[1] == detached[-1].hash:
+                tally = dict(cached[2])
+                for block in detached:
+                    for cand, n in block.tally().items():
+                        tally[cand] -= n
+                self._tally_cache = (index, self.chain[index].hash, tally)
+            with self.transaction_lock:
+                for tx_id in list(requeue):
+                    if tx_id in self.pending_index or tx_id in self._mining:
+                        del requeue[tx_id]
+                requeued = len(requeue)
+                if requeue:
+                    # list and index stay in the same (oldest first) order
+                    requeue.update(self.pending_index)
+                    self.pending_index = requeue
+                    self.pending_transactions = list(requeue.values())
+        logger.info(f"Detached {len(detached)} blocks after #{index}; "
+                    f"{requeued} transactions back in the mempool")
+        return detached
+        
+    @tracing.traced("Blockchain.replace_chain")
     def replace_chain(self, new_chain: List[Block]) -> bool:
         """
         Replace current chain with a longer valid chain (Fork resolution mechanism)
@@ -426,54 +1163,56 @@ class Blockchain:
             if new_chain[0].previous_hash != GENESIS_PREVIOUS_HASH:
                 logger.error("Invalid genesis block in new chain")
                 raise BlockValidationError("Invalid genesis block in new chain")
+            if new_chain[0].hash != self.chain[0].hash:
+                logger.error("New chain starts from a different genesis block")
+                raise BlockValidationError("New chain starts from a different genesis block")
                 
             # Validate each block in the new chain
             for i in range(1, len(new_chain)):
-                current = new_chain[i]
-                previous = new_chain[i-1]
-                
-                if (current.previous_hash != previous.hash or
-                    current.hash != current.calculate_hash() or
-                    current.hash[:self.difficulty] != '0' * self.difficulty):
-                    logger.error(f"Invalid block at index {i} in new chain")
-                    raise BlockValidationError(f"Invalid block at index {i} in new chain")
+                error = self.block_error(new_chain[i], new_chain[max(0, i - RETARGET_WINDOW - 1):i])
+                if error:
+                    logger.error(f"Invalid block at index {i} in new chain: {error}")
+                    raise BlockValidationError(f"Invalid block at index {i} in new chain: {error}")
                     
             # Collect transactions that need to be retransmitted
-            current_transactions = set()
+            current_transactions = {}
             for block in self.chain:
                 for tx in block.transactions:
-                    # Create a hashable representation of the transaction
-                    tx_string = json.dumps(tx, sort_keys=True)
-                    current_transactions.add(tx_string)
+                    current_transactions[transaction_id(tx)] = tx
                     
             new_transactions = set()
             for block in new_chain:
                 for tx in block.transactions:
-                    tx_string = json.dumps(tx, sort_keys=True)
-                    new_transactions.add(tx_string)
+                    new_transactions.add(transaction_id(tx))
                     
             # Find orphaned transactions (in old chain but not in new chain)
-            orphaned = current_transactions - new_transactions
+            orphaned = [tx_id for tx_id in current_transactions
+                        if tx_id not in new_transactions]
             
             # Replace chain
             old_chain = self.chain
             self.chain = new_chain
+            fork = 0
+            while (fork < len(old_chain) and fork < len(new_chain)
+                   and old_chain[fork].hash == new_chain[fork].hash):
+                fork += 1
+            record_reorg(len(old_chain) - fork)
             
             logger.info(f"Chain replaced with new chain of length {len(new_chain)}")
             logger.info(f"Found {len(orphaned)} orphaned transactions to reprocess")
             
-            # Re-add orphaned transactions to pending
+            # Re-add orphaned transactions to pending, and drop pending ones
+            # the new chain already confirms
             with self.transaction_lock:
-                for tx_string in orphaned:
-                    try:
-                        tx = json.loads(tx_string)
-                        if not self.is_duplicate_transaction(tx):
-                            self.pending_transactions.append(tx)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse orphaned transaction: {tx_string}")
-                    
-            return True
+                for tx_id in orphaned:
+                    if tx_id not in self.pending_index:
+                        self.pending_index[tx_id] = current_transactions[tx_id]
+                        self.pending_transactions.append(current_transactions[tx_id])
+            self.prune_pending()
+        self.notify_changed()
+        return True
     
+    @tracing.traced("Blockchain.serialize_chain")
     def serialize_chain(self) -> str:
         """
         Serialize the blockchain to a JSON string for transmission over the network
@@ -484,7 +1223,8 @@ class Blockchain:
         Raises:
             json.JSONEncodeError: If serialization fails
         """
-        logger.info("Serializing blockchain")
+        if tracing.VERBOSE:
+            logger.info("Serializing blockchain")
         
         serialized_chain = []
         with self.lock:
@@ -496,19 +1236,22 @@ class Blockchain:
                     "transactions": block.transactions,
                     "nodes": block.nodes,
                     "nonce": block.nonce,
+                    "bits": block.bits,
                     "hash": block.hash
                 }
                 serialized_chain.append(serialized_block)
         
         try:
             json_data = json.dumps(serialized_chain)
-            logger.info(f"Blockchain serialized to {len(json_data)} bytes")
+            if tracing.VERBOSE:
+                logger.info(f"Blockchain serialized to {len(json_data)} bytes")
             return json_data
         except Exception as e:
             logger.error(f"Serialization error: {str(e)}")
             raise
     
     @staticmethod
+    @tracing.traced("Blockchain.deserialize_chain")
     def deserialize_chain(chain_json: str) -> List[Block]:
         """
         Deserialize a JSON string back into a list of Block objects
@@ -523,7 +1266,8 @@ class Blockchain:
             json.JSONDecodeError: If deserialization fails
             ValueError: If deserialized data is invalid
         """
-        logger.info("Deserializing blockchain")
+        if tracing.VERBOSE:
+            logger.info("Deserializing blockchain")
         
         try:
             chain_data = json.loads(chain_json)
@@ -540,7 +1284,7 @@ class Blockchain:
         for block_data in chain_data:
             # Validate required fields
             required_fields = ["index", "previous_hash", "timestamp", "transactions", 
-                               "nodes", "nonce", "hash"]
+                               "nodes", "nonce", "bits", "hash"]
             for field in required_fields:
                 if field not in block_data:
                     logger.error(f"Missing required field '{field}' in block data")
@@ -553,7 +1297,8 @@ class Blockchain:
                 block_data["timestamp"],
                 block_data["transactions"],
                 block_data["nodes"],
-                block_data["nonce"]
+                block_data["nonce"],
+                block_data["bits"]
             )
             
             # Recalculate and validate the hash
@@ -571,5 +1316,117 @@ class Blockchain:
                 
             deserialized_chain.append(block)
             
-        logger.info(f"Deserialized chain with {len(deserialized_chain)} blocks")
+        if tracing.VERBOSE:
+            logger.info(f"Deserialized chain with {len(deserialized_chain)} blocks")
         return deserialized_chain
+
+
+class HeaderChain:
+    """
+    Header‑only view of a chain: the Block.header() fields of every block,
+    with hash links checked but no transactions kept. Lets a relay (the
+    tracker) answer header requests without holding or re‑hashing blocks.
+    """
+    HEADER_FIELDS = ("index", "previous_hash", "timestamp", "merkle_root", "nonce", "bits", "hash")
+
+    def __init__(self, genesis_hash: str | None = None, verify_work: bool = False,
+                 target_block_time: float = TARGET_BLOCK_TIME):
+        """
+        Args:
+            genesis_hash: If given, header runs starting at index 0 must
+                begin with this genesis block
+            verify_work: If set, every header's hash is recomputed
+                (Block.hash_header) and must meet the target the header
+                carries, which must be the one retargeting gives it, and
+                its timestamp must be in bounds (see timestamp_error);
+                what a light client uses in place of full block validation
+            target_block_time: The full nodes' Blockchain.target_block_time,
+                which retargeting depends on
+        """
+        self.headers: List[Dict] = []
+        self.genesis_hash = genesis_hash
+        self.verify_work = verify_work
+        self.target_block_time = target_block_time
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.headers)
+
+    def tip(self) -> Dict | None:
+        with self.lock:
+            return self.headers[-1] if self.headers else None
+
+    def headers_from(self, index: int) -> List[Dict]:
+        with self.lock:
+            return self.headers[max(index, 0):]
+
+    def index_of(self, block_hash: str) -> int | None:
+        """Index of the header with this hash, searching back from the tip."""
+        with self.lock:
+            for h in reversed(self.headers):
+                if h["hash"] == block_hash:
+                    return h["index"]
+        return None
+
+    def extend(self, headers: List[Dict]) -> bool | None:
+        """
+        Merge a run of consecutive headers using the longest‑chain rule.
+
+        Args:
+            headers: Header dicts in index order
+
+        Returns:
+            True if the chain changed, False if the headers were stale,
+            duplicate or not properly linked, None if they start past a
+            gap (or fork from an unknown ancestor) and earlier headers
+            are needed first
+        """
+        try:
+            run = [{k: h[k] for k in self.HEADER_FIELDS} for h in headers]
+        except (KeyError, TypeError):
+            return False
+        if not run:
+            return False
+        if self.verify_work:
+            for h in run:
+                if Block.hash_header(h) != h["hash"] or (h["index"] and not meets_target(h["hash"], h["bits"])):
+                    return False
+        for prev, cur in zip(run, run[1:]):
+            if cur["index"] != prev["index"] + 1 or cur["previous_hash"] != prev["hash"]:
+                return False
+
+        with self.lock:
+            start = run[0]["index"]
+            if start > len(self.headers):
+                return None
+            if start == 0:
+                if run[0]["previous_hash"] != GENESIS_PREVIOUS_HASH:
+                    return False
+                if self.genesis_hash and run[0]["hash"] != self.genesis_hash:
+                    return False
+            elif self.headers[start - 1]["hash"] != run[0]["previous_hash"]:
+                return None
+            if run[-1]["index"] + 1 <= len(self.headers):
+                return False        # nothing longer; equal‑length forks keep the first seen
+            if self.verify_work and not self._consensus_ok(run, start):
+                return False
+            self.headers[start:] = run
+            return True
+
+    def _consensus_ok(self, run: List[Dict], start: int) -> bool:
+        """
+        Every header in `run` has a timestamp in bounds and carries the
+        target retargeting gives it. Caller holds self.lock.
+        """
+        context = self.headers[max(0, start - RETARGET_WINDOW - 1):start] + run
+        limit = (self.headers or run)[0]["bits"]
+        for pos in range(len(context) - len(run), len(context)):
+            if context[pos]["index"] == 0:
+                continue
+            window = context[max(0, pos - RETARGET_WINDOW - 1):pos]
+            if timestamp_error(context[pos]["timestamp"], [h["timestamp"] for h in window]):
+                return False
+            if context[pos]["bits"] != retarget([(h["timestamp"], h["bits"]) for h in window],
+                                                 window[-1]["index"], limit, self.target_block_time):
+                return False
+        return True
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Size and speed of the binary codec against the JSON formats it replaces.
+
+Builds a chain of --blocks blocks with --txs vote transactions each (hashes
+are random rather than mined, so no proof of work is spent), then times
+encoding and decoding of headers, blocks and the whole chain both ways.
+
+    python3 bench_codec.py --blocks 2000 --txs 20
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+import codec
+from LinkedList import Block, Blockchain
+
+
+def _build_chain(blocks: int, txs: int) -> list[Block]:
+    chain, prev = [], "0"
+    for i in range(blocks):
+        transactions = [{"vote": {"A": i % 7, "B": j}, "timestamp": time.time(), "ref": f"{i}-{j}"}
+                        for j in range(txs)]
+        blk = Block(i, prev, time.time(), transactions, [f"node{n}" for n in range(4)], i)
+        blk.hash = os.urandom(32).hex()
+        chain.append(blk)
+        prev = blk.hash
+    return chain
+
+
+def _block_dict(b: Block) -> dict:
+    return {"index": b.index, "previous_hash": b.previous_hash, "timestamp": b.timestamp,
+            "transactions": b.transactions, "nodes": b.nodes,
+            "merkle_root": b.merkle_root, "nonce": b.nonce, "bits": b.bits, "hash": b.hash}
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(blocks: int, txs: int, repeat: int) -> list[dict]:
+    chain = _build_chain(blocks, txs)
+    headers = [b.header() for b in chain]
+    dicts = [_block_dict(b) for b in chain]
+    results = []
+
+    def case(name, count, enc_json, dec_json, enc_bin, dec_bin):
+        j, b = enc_json(), enc_bin()
+        row = {"case": name, "items": count,
+               "json_bytes": len(j), "bin_bytes": len(b),
+               "size_ratio": round(len(b) / len(j), 3)}
+        for label, enc, dec, data in (("json", enc_json, dec_json, j), ("bin", enc_bin, dec_bin, b)):
+            row[f"{label}_encode_per_s"] = round(count / _time(enc, repeat))
+            row[f"{label}_decode_per_s"] = round(count / _time(lambda: dec(data), repeat))
+        results.append(row)
+
+    msg = {"type": "HEADERS", "src": "a", "dst": "b", "ts": 0.0}
+    case("headers", blocks,
+         lambda: json.dumps(dict(msg, headers=headers)).encode(), json.loads,
+         lambda: codec.encode_message(dict(msg, headers=headers)), codec.decode_message)
+
+    msg = {"type": "BLOCKS", "src": "a", "dst": "b", "ts": 0.0}
+    case("blocks", blocks,
+         lambda: json.dumps(dict(msg, blocks=dicts)).encode(), json.loads,
+         lambda: codec.encode_message(dict(msg, blocks=dicts)), codec.decode_message)
+
+    # same output as Blockchain.serialize_chain(), without its lock/logging
+    logging.getLogger("blockchain").setLevel(logging.ERROR)
+    case("chain file", blocks,
+         lambda: json.dumps(dicts).encode(),
+         lambda d: Blockchain.deserialize_chain(d.decode()),
+         lambda: codec.encode_chain(chain), codec.decode_chain)
+
+    results[0]["bytes_per_header"] = {"json": round(results[0]["json_bytes"] / blocks, 1),
+                                      "bin": round(results[0]["bin_bytes"] / blocks, 1)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=2000)
+    parser.add_argument("--txs", type=int, default=20, help="transactions per block")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N timings")
+    args = parser.parse_args()
+    print(json.dumps(run(args.blocks, args.txs, args.repeat), indent=2))
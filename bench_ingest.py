@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Bulk vote ingestion throughput and memory.
+
+Streams --votes synthetic NDJSON and CSV records (generated on the fly, so
+the upload itself is never in memory) through ingest.ingest() into a
+fresh Blockchain's mempool, and compares with one add_transaction() call
+per vote, the path /vote takes. Peak memory of the streaming path is
+measured with tracemalloc at two upload sizes against a sink that keeps
+nothing; equal peaks mean memory does not grow with the upload.
+--mine also drains the mempool into blocks of MAX_BLOCK_TRANSACTIONS.
+
+    python3 bench_ingest.py --votes 1000000
+"""
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+
+import ingest
+from LinkedList import Blockchain, MAX_BLOCK_TRANSACTIONS, transaction_id
+
+
+class _Upload:
+    """Binary stream that generates `n` records as it is read."""
+
+    def __init__(self, n: int, fmt: str):
+        self._lines = self._generate(n, fmt)
+
+    @staticmethod
+    def _generate(n: int, fmt: str):
+        if fmt == "csv":
+            yield b"a,b,ref\n"
+            for i in range(n):
+                yield f"{i % 500},{i * 7 % 500},booth-{i}\n".encode()
+        else:
+            for i in range(n):
+                yield f'{{"a": {i % 500}, "b": {i * 7 % 500}, "ref": "booth-{i}"}}\n'.encode()
+
+    def readline(self, size: int = -1) -> bytes:
+        return next(self._lines, b"")
+
+
+class _Sink:
+    """add_transactions() that validates and hashes but keeps nothing."""
+
+    def add_transactions(self, transactions):
+        return [(transaction_id(tx), None) for tx in transactions]
+
+
+def _drain(results) -> dict:
+    summary = None
+    for summary in results:
+        pass
+    return summary
+
+
+def bench_bulk(votes: int, fmt: str) -> dict:
+    bc = Blockchain(difficulty=1)
+    t0 = time.perf_counter()
+    summary = _drain(ingest.ingest(bc, _Upload(votes, fmt), fmt))
+    elapsed = time.perf_counter() - t0
+    return {"case": f"bulk {fmt}", "votes": votes, "seconds": round(elapsed, 2),
+            "votes_per_s": round(votes / elapsed), "mempool": len(bc.pending_index), **summary}
+
+
+def bench_single(votes: int) -> dict:
+    bc = Blockchain(difficulty=1)
+    t0 = time.perf_counter()
+    for i in range(votes):
+        bc.add_transaction({"vote": {"A": i % 500, "B": i * 7 % 500},
+                            "timestamp": time.time(), "ref": f"booth-{i}"})
+    elapsed = time.perf_counter() - t0
+    return {"case": "add_transaction per vote", "votes": votes, "seconds": round(elapsed, 2),
+            "votes_per_s": round(votes / elapsed)}
+
+
+def bench_memory(sizes: list[int]) -> dict:
+    peaks = {}
+    for n in sizes:
+        tracemalloc.start()
+        _drain(ingest.ingest(_Sink(), _Upload(n, "ndjson")))
+        peaks[n] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"case": "streaming peak bytes (sink)", **{str(n): p for n, p in peaks.items()}}
+
+
+def bench_mine(votes: int) -> dict:
+    bc = Blockchain(difficulty=1)
+    bc.target_block_time = 0      # keep retargeting from raising difficulty
+    _drain(ingest.ingest(bc, _Upload(votes, "ndjson")))
+    t0 = time.perf_counter()
+    blocks = 0
+    while bc.add_block(nodes=[]) is not None:
+        blocks += 1
+    elapsed = time.perf_counter() - t0
+    return {"case": "mine mempool", "votes": votes, "blocks": blocks,
+            "block_size": MAX_BLOCK_TRANSACTIONS, "seconds": round(elapsed, 2),
+            "votes_per_s": round(votes / elapsed)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--votes", type=int, default=1_000_000)
+    parser.add_argument("--single", type=int, default=50_000,
+                        help="votes for the one-call-per-vote baseline")
+    parser.add_argument("--mem-votes", type=int, nargs=2, default=[20_000, 200_000],
+                        help="two upload sizes for the memory comparison")
+    parser.add_argument("--mine", action="store_true", help="also mine the ingested votes")
+    args = parser.parse_args()
+
+    logging.getLogger("blockchain").setLevel(logging.ERROR)
+    results = [bench_single(args.single),
+               bench_bulk(args.votes, "ndjson"),
+               bench_bulk(args.votes, "csv"),
+               bench_memory(args.mem_votes)]
+    if args.mine:
+        results.append(bench_mine(args.votes))
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the LinkedList.py core, at chain sizes up to 1M blocks.
+
+Synthetic chains of each --sizes length are built with --txs vote
+transactions per block (deterministic contents, properly linked and
+hashed, with no proof of work: the chain difficulty is 0, so validation
+costs are hashing and linking). Cases:
+
+  calculate_hash    one header hash (µs/op)
+  mine_block/D      a block mined at each --difficulties D (hashes/s)
+  add_transaction/M one vote into a mempool already holding M votes
+  get_votes_tally   cold (full scan) and warm (one block after the cache)
+  is_chain_valid    the whole chain
+  replace_chain/F   with a longer chain that forks F blocks below the tip
+  serialize_chain / deserialize_chain
+
+Times are the best of --repeat runs. Each case then runs once more under
+tracemalloc for its peak memory (the heap it allocated beyond what
+existed before, in KiB); --no-memory skips that. Results go to stdout or
+--out as JSON, with the commit and Python version; --compare OLD.json
+prints the time ratio of every case against an earlier run.
+
+    python3 bench_linkedlist.py --sizes 1000,100000 --out before.json
+    python3 bench_linkedlist.py --sizes 1000,100000 --compare before.json
+"""
+import argparse
+import gc
+import json
+import logging
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from LinkedList import Block, Blockchain, difficulty_bits, transaction_id
+
+NODES = ["node0", "node1", "node2", "node3"]
+
+
+def _vote(i: int) -> dict:
+    return {"vote": {"A": i % 500, "B": i * 7 % 500}, "timestamp": float(i), "ref": f"booth-{i}"}
+
+
+def build_chain(chain: list[Block], blocks: int, txs: int, start: int = 0, seed: str = "") -> list[Block]:
+    """Append `blocks` linked blocks to chain (votes numbered from `start`)."""
+    for i in range(blocks):
+        prev = chain[-1]
+        n = start + i * txs
+        transactions = [dict(_vote(n + j), ref=f"{seed}booth-{n + j}") for j in range(txs)]
+        chain.append(Block(prev.index + 1, prev.hash, float(prev.index + 1), transactions, NODES))
+    return chain
+
+
+def _best(fn, repeat: int, setup=None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak_kib(fn, setup=None) -> int:
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        return (tracemalloc.get_traced_memory()[1] - base) // 1024
+    finally:
+        tracemalloc.stop()
+
+
+class Bench:
+    def __init__(self, repeat: int, memory: bool):
+        self.repeat = repeat
+        self.memory = memory
+        self.results: list[dict] = []
+
+    def case(self, name: str, fn, ops: int = 1, setup=None, **info) -> dict:
+        """Time fn (ops operations per call); setup runs untimed before each call."""
+        seconds = _best(fn, self.repeat, setup)
+        row = {"case": name, **info, "seconds": round(seconds, 6),
+               "us_per_op": round(seconds / ops * 1e6, 3), "ops_per_s": round(ops / seconds, 1)}
+        if self.memory:
+            row["peak_kib"] = _peak_kib(fn, setup)
+        self.results.append(row)
+        print(f"  {name:<22} {json.dumps(info) if info else '':<56} "
+              f"{row['us_per_op']:>12.3f} µs/op" +
+              (f"  {row['peak_kib']:>9} KiB" if self.memory else ""), flush=True)
+        return row
+
+    # ── size-independent cases -------------------------------------------------------
+    def hashing(self, n: int = 20000):
+        bc = Blockchain(difficulty=0)
+        blocks = build_chain(bc.chain, 100, 4)[1:]
+        self.case("calculate_hash", lambda: [blocks[i % 100].calculate_hash() for i in range(n)],
+                  ops=n)
+
+    def mining(self, difficulties: list[int], blocks: int):
+        for d in difficulties:
+            work = [Block(i + 1, "0" * 64, float(i), [_vote(i)], NODES, bits=difficulty_bits(d))
+                    for i in range(blocks)]
+
+            def mine():
+                for blk in work:
+                    blk.nonce = 0
+                    blk.hash = blk.calculate_hash()
+                    blk.mine_block()
+            row = self.case(f"mine_block/{d}", mine, ops=blocks, difficulty=d)
+            # nonce ends at the iteration count, so hashes/s follows from the last run
+            row["hashes_per_s"] = round(sum(b.nonce for b in work) / row["seconds"])
+
+    def mempool(self, sizes: list[int], adds: int = 2000):
+        for m in sizes:
+            bc = Blockchain(difficulty=0)
+            bc.add_transactions([_vote(i) for i in range(m)])
+            extra = [_vote(m + i) for i in range(adds)]
+            extra_ids = [transaction_id(tx) for tx in extra]
+
+            def reset():
+                with bc.transaction_lock:
+                    for tx_id in extra_ids:
+                        bc.pending_index.pop(tx_id, None)
+                    del bc.pending_transactions[m:]
+
+            def add():
+                for tx in extra:
+                    bc.add_transaction(tx)
+            self.case(f"add_transaction/{m}", add, ops=adds, setup=reset, mempool=m)
+
+    # ── per chain size ---------------------------------------------------------------
+    def chain(self, size: int, txs: int, fork_depths: list[int]):
+        t0 = time.perf_counter()
+        bc = Blockchain(difficulty=0)
+        bc.target_block_time = 0      # synthetic timestamps would raise the target
+        build_chain(bc.chain, size - 1, txs)
+        base = list(bc.chain)
+        print(f"chain of {size} blocks × {txs} txs built in {time.perf_counter() - t0:.1f}s",
+              flush=True)
+        info = {"blocks": size, "txs_per_block": txs}
+
+        def cold():
+            bc._tally_cache = None
+        self.case("get_votes_tally/cold", bc.get_votes_tally, setup=cold, **info)
+
+        def one_behind():
+            tip = bc.chain.pop()
+            bc.get_votes_tally()
+            bc.chain.append(tip)
+        self.case("get_votes_tally/warm", bc.get_votes_tally, setup=one_behind, **info)
+
+        self.case("is_chain_valid", bc.is_chain_valid, ops=size, **info)
+
+        for depth in fork_depths:
+            if depth >= size:
+                continue
+            longer = build_chain(base[:size - depth], depth + 1, txs, start=size * txs, seed="fork-")
+
+            def restore():
+                bc.chain = list(base)
+                bc._tx_index, bc._indexed_hashes, bc._orphaned = {}, [], {}
+                with bc.transaction_lock:
+                    bc.pending_transactions, bc.pending_index = [], {}
+            self.case(f"replace_chain/{depth}", lambda: bc.replace_chain(longer), setup=restore,
+                      fork_depth=depth, **info)
+        bc.chain = base
+
+        data = bc.serialize_chain()
+        self.case("serialize_chain", bc.serialize_chain, ops=size, bytes=len(data), **info)
+        self.case("deserialize_chain", lambda: Blockchain.deserialize_chain(data), ops=size, **info)
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict) -> None:
+    """Print new/old time ratios for the cases both runs have."""
+    key = lambda r: (r["case"], r.get("blocks"))
+    before = {key(r): r for r in old["results"]}
+    print(f"\nvs {old['meta'].get('commit')}: time ratio (new / old; > 1 is slower)")
+    for r in new["results"]:
+        o = before.get(key(r))
+        if o and o["seconds"]:
+            ratio = r["seconds"] / o["seconds"]
+            size = f" @{r['blocks']}" if "blocks" in r else ""
+            print(f"  {r['case'] + size:<34} {ratio:6.2f}" + ("  ⚠" if ratio > 1.1 else ""))
+
+
+def _ints(text: str) -> list[int]:
+    return [int(float(v)) for v in text.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=_ints, default=[1000, 100000, 1000000],
+                        help="chain lengths in blocks (default 1000,100000,1000000)")
+    parser.add_argument("--txs", type=int, default=1, help="transactions per block")
+    parser.add_argument("--difficulties", type=_ints, default=[1, 2, 3, 4])
+    parser.add_argument("--mine-blocks", type=int, default=20, help="blocks mined per difficulty")
+    parser.add_argument("--mempool", type=_ints, default=[0, 10000, 100000, 1000000],
+                        help="mempool sizes for add_transaction")
+    parser.add_argument("--fork-depths", type=_ints, default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--out", metavar="FILE", help="write the JSON results here (default stdout)")
+    parser.add_argument("--compare", metavar="OLD", help="print time ratios against an earlier --out")
+    args = parser.parse_args()
+
+    logging.getLogger("blockchain").setLevel(logging.ERROR)
+    bench = Bench(args.repeat, not args.no_memory)
+    bench.hashing()
+    bench.mining(args.difficulties, args.mine_blocks)
+    bench.mempool(args.mempool)
+    for size in args.sizes:
+        bench.chain(size, args.txs, args.fork_depths)
+
+    report = {"meta": {"commit": _commit(), "python": platform.python_version(),
+                       "platform": platform.platform(), "args": vars(args)},
+              "results": bench.results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Instrumentation overhead of metrics.py on the paths it was wired into.
+
+Each round runs a case instrumented and bare back to back, alternating
+which goes first, and the overhead is the median of the rounds'
+instrumented/bare time ratios: pairing cancels the machine's drift, and
+the median keeps a noisy round from faking or hiding overhead (the
+collector is off while timing). The best time of each side is reported
+too. Bare means Counter.inc, Gauge.set/inc and Histogram.observe are
+no-ops, NetworkInterface.dispatch calls handle_message directly (no
+counting or clock reads) and the tracker skips its per-frame accounting.
+Cases:
+
+  add_transaction  one vote per call into a fresh mempool
+  receive/N        the listen_for_messages loop over a socket: recv_frame,
+                   decode and dispatch of TXS frames carrying N votes each;
+                   N=1 is the worst case, INV gossip batches up to 500.
+                   Frames are written in socket-buffer-sized chunks from
+                   the same thread, so no sender thread competes for the GIL
+  relay            a threaded Tracker on localhost relaying broadcast INV
+                   frames from one peer to 8 others, until all have them
+  mine             Block.mine_block at --difficulty
+
+The raw cost of each primitive is printed too (ns per update).
+
+    python3 bench_metrics.py --rounds 15
+"""
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import socket
+import statistics
+import threading
+import time
+
+import metrics
+from metrics import Counter, Gauge, Histogram
+from LinkedList import Blockchain, Block, difficulty_bits
+import decentralized_node as dn
+import network
+from p2p import recv_frame
+
+
+@contextlib.contextmanager
+def _disabled():
+    saved = (Counter.inc, Gauge.set, Gauge.inc, Histogram.observe,
+             dn.NetworkInterface.dispatch, network.Tracker._count_frame,
+             network.Tracker._count_relay)
+    Counter.inc = Gauge.set = Gauge.inc = Histogram.observe = lambda self, *args: None
+    dn.NetworkInterface.dispatch = lambda self, msg, size, via="p2p": self.handle_message(msg)
+    network.Tracker._count_frame = lambda self, ftype, size: None
+    network.Tracker._count_relay = lambda self, copies, size: None
+    try:
+        yield
+    finally:
+        (Counter.inc, Gauge.set, Gauge.inc, Histogram.observe,
+         dn.NetworkInterface.dispatch, network.Tracker._count_frame,
+         network.Tracker._count_relay) = saved
+
+
+def _vote(i: int) -> dict:
+    return {"vote": {"A": i % 500, "B": i * 7 % 500}, "timestamp": 1.0, "ref": f"booth-{i}"}
+
+
+# ── cases: each returns a zero-argument callable that does the work once ───
+def case_add_transaction(n: int):
+    def run():
+        bc = Blockchain(difficulty=1)
+        for i in range(n):
+            bc.add_transaction(_vote(i))
+    return run
+
+
+def case_receive(n: int, per_frame: int, chunk_bytes: int = 65536):
+    frames = [network.Tracker.encode_frame({
+        "type": "TXS", "src": "B", "dst": "A", "ts": 1.0,
+        "transactions": [_vote(i * per_frame + j) for j in range(per_frame)]})
+        for i in range(n // per_frame)]
+    chunks, start, size = [], 0, 0        # (bytes, frame count), each fits the socket buffer
+    for i, frame in enumerate(frames):
+        if size + len(frame) > chunk_bytes and i > start:
+            chunks.append((b"".join(frames[start:i]), i - start))
+            start, size = i, 0
+        size += len(frame)
+    chunks.append((b"".join(frames[start:]), len(frames) - start))
+    net_if = dn.NetworkInterface.__new__(dn.NetworkInterface)
+    dn.NODE_ID = "A"
+
+    def run():
+        dn.blockchain = Blockchain(difficulty=1)
+        rx, tx = socket.socketpair()
+        for stream, count in chunks:
+            tx.sendall(stream)
+            for _ in range(count):
+                data = recv_frame(rx)
+                net_if.dispatch(json.loads(data.decode()), len(data), "tracker")
+        rx.close()
+        tx.close()
+    return run
+
+
+def case_relay(n: int, peers: int = 8):
+    tracker = network.Tracker(0, heartbeat_interval=0, send_hwm=1 << 30)
+    threading.Thread(target=tracker.serve_forever, daemon=True).start()
+    while tracker.port == 0:
+        time.sleep(0.01)
+    socks = []
+    for i in range(peers + 1):
+        sock = socket.create_connection(("127.0.0.1", tracker.port))
+        network.Tracker.send_msg(sock, {"type": "REGISTER", "src": f"N{i}", "dst": "tracker",
+                                        "payload": {"node_id": f"N{i}"}})
+        socks.append(sock)
+    done = threading.Semaphore(0)
+    expected = [0]
+
+    def drain(sock):
+        got = 0
+        while True:
+            data = recv_frame(sock)
+            if data.startswith(b'{"type":"INV"'):
+                got += 1
+                if got == expected[0]:
+                    got = 0
+                    done.release()
+    for sock in socks[1:]:
+        threading.Thread(target=drain, args=(sock,), daemon=True).start()
+    time.sleep(0.5)                           # roster traffic settles
+    stream = network.Tracker.encode_frame({"type": "INV", "src": "N0", "dst": "*", "ts": 1.0,
+                                           "txids": ["ab" * 32] * 8}) * n
+
+    def run():
+        expected[0] = n
+        socks[0].sendall(stream)
+        for _ in range(peers):
+            done.acquire()
+    return run
+
+
+def case_mine(n: int, difficulty: int):
+    def run():
+        for i in range(n):
+            Block(1, "0" * 64, float(i), [_vote(i)], [], bits=difficulty_bits(difficulty)).mine_block()
+    return run
+
+
+def _timed(run) -> float:
+    gc.collect()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        run()
+        return time.perf_counter() - t0
+    finally:
+        gc.enable()
+
+
+def measure(run, rounds: int) -> dict:
+    on, off = [], []
+    for i in range(rounds):
+        if i % 2:
+            on.append(_timed(run))
+        with _disabled():
+            off.append(_timed(run))
+        if not i % 2:
+            on.append(_timed(run))
+    ratio = statistics.median(a / b for a, b in zip(on, off))
+    return {"instrumented_s": round(min(on), 4), "bare_s": round(min(off), 4),
+            "overhead_pct": round(100 * (ratio - 1), 2)}
+
+
+def primitives(n: int = 200_000) -> dict:
+    registry = metrics.Registry()
+    counter = registry.counter("c", "c")
+    child = registry.counter("l", "l", ["type"]).labels("BLOCK")
+    hist = registry.histogram("h", "h")
+    out = {}
+    for name, op in (("counter.inc", counter.inc), ("labelled child.inc", child.inc),
+                     ("histogram.observe", lambda: hist.observe(0.003))):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            op()
+        out[name] = round((time.perf_counter() - t0) / n * 1e9)
+    return {"case": "primitive ns/op", **out}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--txs", type=int, default=20_000, help="votes per add_transaction / receive round")
+    parser.add_argument("--frames", type=int, default=10_000, help="frames per relay round")
+    parser.add_argument("--blocks", type=int, default=20, help="blocks per mining round")
+    parser.add_argument("--difficulty", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("blockchain").setLevel(logging.ERROR)
+    dn.print = lambda *a, **k: None          # the TXS handler logs each batch
+    results = [primitives()]
+    for name, run in (("add_transaction", case_add_transaction(args.txs)),
+                      ("receive/1", case_receive(args.txs, 1)),
+                      ("receive/50", case_receive(args.txs, 50)),
+                      ("relay", case_relay(args.frames)),
+                      ("mine", case_mine(args.blocks, args.difficulty))):
+        results.append({"case": name, **measure(run, args.rounds)})
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Load test for the tracker: threaded vs. selectors mode.
+
+Starts a tracker in‑process on a free port, connects N simulated peers
+(all driven from one selectors loop on the client side so the harness
+itself doesn't need a thread per peer), then has S of them broadcast M
+messages each. Reports accepted connections/s and relayed messages/s.
+
+    python3 bench_tracker.py --peers 500 --senders 10 --messages 50
+
+Large --peers values may need a higher open‑file limit (ulimit -n).
+
+With --trackers K (K > 1) it instead starts K federated trackers as
+subprocesses and one client process per tracker, each driving the peers
+that the consistent‑hash ring assigns to its tracker. Scaling shows up
+only with at least K+K free cores:
+
+    python3 bench_tracker.py --trackers 3 --peers 300 --senders 30
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from federation import HashRing
+from network import TRACKER_MODES
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _frame(obj: dict) -> bytes:
+    raw = json.dumps(obj, separators=(",", ":")).encode()
+    return len(raw).to_bytes(4, "big") + raw
+
+
+class Swarm:
+    """N client sockets drained by one background selectors loop."""
+
+    def __init__(self):
+        self.sel = selectors.DefaultSelector()
+        self.socks: list[socket.socket] = []
+        self.received = 0           # BENCH frames delivered to any client
+        self.frames = 0             # all frames delivered
+        self._stop = False
+        self._buffers: dict[int, bytearray] = {}
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def connect(self, port: int, node_id: str) -> socket.socket:
+        s = socket.create_connection(("127.0.0.1", port))
+        s.sendall(_frame({"type": "REGISTER", "src": node_id, "dst": "tracker",
+                          "ts": time.time(), "payload": {"node_id": node_id}}))
+        s.setblocking(False)
+        self._buffers[s.fileno()] = bytearray()
+        self.sel.register(s, selectors.EVENT_READ)
+        self.socks.append(s)
+        return s
+
+    def _drain(self):
+        while not self._stop:
+            if not self.socks:
+                time.sleep(0.01)
+                continue
+            for key, _ in self.sel.select(timeout=0.1):
+                try:
+                    data = key.fileobj.recv(1 << 16)
+                except (BlockingIOError, OSError):
+                    continue
+                if not data:
+                    self.sel.unregister(key.fileobj)
+                    continue
+                buf = self._buffers[key.fileobj.fileno()]
+                buf += data
+                while len(buf) >= 4:
+                    size = int.from_bytes(buf[:4], "big")
+                    if len(buf) < 4 + size:
+                        break
+                    if b'"BENCH"' in buf[4:4 + 64]:
+                        self.received += 1
+                    elif b'"PING"' in buf[4:4 + 64]:
+                        try:
+                            key.fileobj.send(_frame({"type": "PONG", "src": "bench",
+                                                     "dst": "tracker", "payload": {}}))
+                        except OSError:
+                            pass
+                    self.frames += 1
+                    del buf[:4 + size]
+
+    def close(self):
+        self._stop = True
+        self._thread.join(timeout=1)
+        for s in self.socks:
+            s.close()
+
+
+def _stalled_peer(port: int, node_id: str) -> socket.socket:
+    """A peer that registers and then never reads, like a hung process."""
+    s = socket.socket()
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    s.connect(("127.0.0.1", port))
+    s.sendall(_frame({"type": "REGISTER", "src": node_id, "dst": "tracker",
+                      "ts": time.time(), "payload": {"node_id": node_id}}))
+    return s
+
+
+def run(mode: str, peers: int, senders: int, messages: int, payload: int,
+        timeout: float, stalled: int = 0, send_hwm: int = 4 << 20) -> dict:
+    port = _free_port()
+    tracker = TRACKER_MODES[mode](port, send_hwm=send_hwm)
+    threading.Thread(target=tracker.serve_forever, daemon=True).start()
+    time.sleep(0.2)
+
+    swarm = Swarm()
+    t0 = time.perf_counter()
+    for i in range(peers):
+        swarm.connect(port, f"p{i}")
+    while len(tracker.peers) < peers and time.perf_counter() - t0 < timeout:
+        time.sleep(0.005)
+    connect_s = time.perf_counter() - t0
+    registered = len(tracker.peers)
+    hung = [_stalled_peer(port, f"stalled{i}") for i in range(stalled)]
+
+    # let the roster churn settle before timing the relay
+    time.sleep(0.5)
+    swarm.received = 0
+    expected = senders * messages * (registered - 1)     # stalled peers excluded
+    body = "x" * payload
+
+    t1 = time.perf_counter()
+    for m in range(messages):
+        for i in range(senders):
+            frame = _frame({"type": "BENCH", "src": f"p{i}", "dst": "*",
+                            "ts": time.time(), "payload": body})
+            swarm.socks[i].setblocking(True)
+            swarm.socks[i].sendall(frame)
+            swarm.socks[i].setblocking(False)
+    while swarm.received < expected and time.perf_counter() - t1 < timeout:
+        time.sleep(0.005)
+    relay_s = time.perf_counter() - t1
+    swarm.close()
+    for s in hung:
+        s.close()
+
+    return {
+        "mode":             mode,
+        "peers":            registered,
+        "connect_seconds":  round(connect_s, 3),
+        "accepted_per_s":   round(registered / connect_s, 1),
+        "relayed":          swarm.received,
+        "expected":         expected,
+        "relay_seconds":    round(relay_s, 3),
+        "relayed_per_s":    round(swarm.received / relay_s, 1),
+        "stalled_peers":    stalled,
+    }
+
+
+# ── federated mode -----------------------------------------------------------
+def _fed_worker(port: int, names: list[str], senders: set[str], messages: int,
+                payload: int, expected: int, timeout: float, barrier, results) -> None:
+    swarm = Swarm()
+    socks = {name: swarm.connect(port, name) for name in names}
+    barrier.wait()          # every tracker has every peer by now
+
+    body = "x" * payload
+    t0 = time.perf_counter()
+    for m in range(messages):
+        for name in senders:
+            frame = _frame({"type": "BENCH", "src": name, "dst": "*",
+                            "ts": time.time(), "payload": body})
+            socks[name].setblocking(True)
+            socks[name].sendall(frame)
+            socks[name].setblocking(False)
+    while swarm.received < expected and time.perf_counter() - t0 < timeout:
+        time.sleep(0.005)
+    results.put((swarm.received, time.perf_counter() - t0))
+    swarm.close()
+
+
+def run_federated(mode: str, trackers: int, peers: int, senders: int, messages: int,
+                  payload: int, timeout: float, settle: float = 3.0) -> dict:
+    ports = {f"t{i}": _free_port() for i in range(trackers)}
+    spec = ",".join(f"{tid}=127.0.0.1:{port}" for tid, port in ports.items())
+    here = os.path.dirname(os.path.abspath(__file__))
+    procs = [subprocess.Popen([sys.executable, os.path.join(here, "network.py"), str(port),
+                               "--mode", mode, "--federation", spec, "--tracker-id", tid],
+                              stdout=subprocess.DEVNULL)
+             for tid, port in ports.items()]
+    time.sleep(1.5)         # trackers dial each other once per second
+
+    ring = HashRing(list(ports))
+    names = [f"p{i}" for i in range(peers)]
+    sending = set(names[:senders])
+    shard = {tid: [n for n in names if ring.owner(n) == tid] for tid in ports}
+
+    barrier = multiprocessing.Barrier(trackers + 1)
+    results = multiprocessing.Queue()
+    workers = []
+    for tid, local in shard.items():
+        local_senders = sending.intersection(local)
+        # each peer gets every sender's messages except its own
+        expected = sum(senders * messages - (messages if n in sending else 0) for n in local)
+        w = multiprocessing.Process(target=_fed_worker,
+                                    args=(ports[tid], local, local_senders, messages, payload,
+                                          expected, timeout, barrier, results))
+        w.start()
+        workers.append(w)
+    time.sleep(settle)      # let registrations and FED_JOINED deltas settle
+    barrier.wait()
+
+    received, seconds = 0, 0.0
+    for _ in workers:
+        r, t = results.get()
+        received += r
+        seconds = max(seconds, t)
+    for w in workers:
+        w.join()
+    for p in procs:
+        p.terminate()
+        p.wait()
+
+    return {
+        "mode":             f"federated-{mode}",
+        "trackers":         trackers,
+        "peers":            peers,
+        "shard_sizes":      [len(v) for v in shard.values()],
+        "relayed":          received,
+        "expected":         senders * messages * (peers - 1),
+        "relay_seconds":    round(seconds, 3),
+        "relayed_per_s":    round(received / seconds, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=[*TRACKER_MODES, "both"], default="both")
+    parser.add_argument("--peers", type=int, default=200)
+    parser.add_argument("--senders", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--payload", type=int, default=256, help="bytes per message body")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--stalled", type=int, default=0,
+                        help="extra peers that register but never read")
+    parser.add_argument("--send-hwm", type=int, default=4 << 20,
+                        help="tracker send high-water mark in bytes")
+    parser.add_argument("--trackers", type=int, default=1,
+                        help="run K federated tracker processes instead of one in-process tracker")
+    args = parser.parse_args()
+
+    modes = list(TRACKER_MODES) if args.mode == "both" else [args.mode]
+    if args.trackers > 1:
+        results = [run_federated(m, args.trackers, args.peers, args.senders, args.messages,
+                                 args.payload, args.timeout)
+                   for m in modes]
+    else:
+        results = [run(m, args.peers, args.senders, args.messages, args.payload, args.timeout,
+                       args.stalled, args.send_hwm)
+                   for m in modes]
+    print(json.dumps(results, indent=2))
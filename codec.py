@@ -0,0 +1,296 @@
+# Compact binary codec for headers, blocks and whole chains
+# Headers are fixed‑width struct records with raw 32‑byte hashes; blocks add
+# length‑prefixed node IDs and a length‑prefixed transaction section. Used on direct peer links
+# once both sides have agreed on it in their HELLO, and for chain files on
+# disk. JSON stays the default everywhere else and for debugging.
+
+import json
+import os
+import struct
+from typing import Dict, List, Tuple
+
+from LinkedList import Block, GENESIS_PREVIOUS_HASH
+
+CODEC_VERSION = 3
+SUPPORTED_VERSIONS = (3,)     # v2: headers carry merkle_root; v3: and the target bits
+WIRE_NAME = f"bin{CODEC_VERSION}"      # advertised in HELLO "codecs"
+
+# version, index, previous_hash, timestamp, merkle_root, nonce, bits, hash
+HEADER = struct.Struct(">BI32sd32sQI32s")
+U16 = struct.Struct(">H")
+U32 = struct.Struct(">I")
+
+# binary frames start with a zero byte; JSON frames always start with "{"
+FRAME_MAGIC = b"\x00"
+CHAIN_MAGIC = b"VCHN"
+
+# a block's transactions are one length‑prefixed canonical JSON array
+# (sort_keys, no spaces: the transaction_id() form); one C‑level encode or
+# decode per block is far faster than a Python loop over tx records
+_TX_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+_TX_DECODER = json.JSONDecoder()
+
+# message fields that carry headers/blocks and are packed in binary frames
+BINARY_FIELDS = {
+    "headers": "headers",   # list of header dicts
+    "blocks":  "blocks",    # list of block dicts
+    "block":   "block",     # one block dict
+}
+
+
+class CodecError(ValueError):
+    """Raised for truncated, malformed or unsupported‑version data."""
+    pass
+
+
+# ── hashes ---------------------------------------------------------------------
+def _hash_bytes(h: str) -> bytes:
+    if h == GENESIS_PREVIOUS_HASH:
+        return bytes(32)
+    raw = bytes.fromhex(h)
+    if len(raw) != 32:
+        raise CodecError(f"hash must be 32 bytes, got {len(raw)}")
+    return raw
+
+
+def _hash_str(raw: bytes, previous: bool = False) -> str:
+    if previous and raw == bytes(32):
+        return GENESIS_PREVIOUS_HASH
+    return raw.hex()
+
+
+# ── headers ------------------------------------------------------------------
+def encode_header(header: Dict) -> bytes:
+    """Pack the Block.header() fields into HEADER.size bytes."""
+    return HEADER.pack(CODEC_VERSION, header["index"], _hash_bytes(header["previous_hash"]),
+                       header["timestamp"], bytes.fromhex(header["merkle_root"]),
+                       header["nonce"], header["bits"], _hash_bytes(header["hash"]))
+
+
+def decode_header(data: bytes, offset: int = 0) -> Tuple[Dict, int]:
+    """
+    Returns:
+        (header dict, offset just past it)
+    """
+    try:
+        version, index, prev, ts, root, nonce, bits, h = HEADER.unpack_from(data, offset)
+    except struct.error as e:
+        raise CodecError(f"truncated header: {e}")
+    if version not in SUPPORTED_VERSIONS:
+        raise CodecError(f"unsupported codec version {version}")
+    return {
+        "index": index,
+        "previous_hash": _hash_str(prev, previous=True),
+        "timestamp": ts,
+        "merkle_root": root.hex(),
+        "nonce": nonce,
+        "bits": bits,
+        "hash": _hash_str(h)
+    }, offset + HEADER.size
+
+
+# ── blocks -------------------------------------------------------------------
+def _pack_str(s: str) -> bytes:
+    raw = s.encode()
+    return U16.pack(len(raw)) + raw
+
+
+def encode_block_dict(block: Dict) -> bytes:
+    """Header record, then the length‑prefixed node IDs and transaction section."""
+    parts = [encode_header(block), U16.pack(len(block["nodes"]))]
+    parts += [_pack_str(n) for n in block["nodes"]]
+    raw = _TX_ENCODER.encode(block["transactions"]).encode()
+    parts.append(U32.pack(len(block["transactions"])) + U32.pack(len(raw)) + raw)
+    return b"".join(parts)
+
+
+def encode_block(block: Block) -> bytes:
+    return encode_block_dict({
+        "index": block.index,
+        "previous_hash": block.previous_hash,
+        "timestamp": block.timestamp,
+        "transactions": block.transactions,
+        "nodes": block.nodes,
+        "merkle_root": block.merkle_root,
+        "nonce": block.nonce,
+        "bits": block.bits,
+        "hash": block.hash
+    })
+
+
+def decode_block_dict(data: bytes, offset: int = 0) -> Tuple[Dict, int]:
+    """
+    Returns:
+        (block dict in the block_to_dict() shape, offset just past it)
+    """
+    block, offset = decode_header(data, offset)
+    try:
+        (n_nodes,) = U16.unpack_from(data, offset)
+        offset += U16.size
+        nodes = []
+        for _ in range(n_nodes):
+            (size,) = U16.unpack_from(data, offset)
+            offset += U16.size
+            nodes.append(data[offset:offset + size].decode())
+            offset += size
+        n_txs, size = U32.unpack_from(data, offset)[0], U32.unpack_from(data, offset + 4)[0]
+        offset += 2 * U32.size
+        txs = _TX_DECODER.decode(data[offset:offset + size].decode())
+        offset += size
+    except (struct.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise CodecError(f"malformed block record: {e}")
+    if offset > len(data) or not isinstance(txs, list) or len(txs) != n_txs:
+        raise CodecError("truncated block record")
+    block["nodes"] = nodes
+    block["transactions"] = txs
+    return block, offset
+
+
+def decode_block(data: bytes, offset: int = 0) -> Tuple[Block, int]:
+    """Decode a block record and rebuild the Block, keeping the stored hash
+    (the contents are still checked against the stored merkle_root)."""
+    d, offset = decode_block_dict(data, offset)
+    try:
+        block = Block(d["index"], d["previous_hash"], d["timestamp"],
+                      d["transactions"], d["nodes"], d["nonce"], d["bits"])
+    except (TypeError, ValueError, AttributeError) as e:
+        raise CodecError(f"malformed block {d['index']}: {e}")
+    if block.merkle_root != d["merkle_root"]:
+        raise CodecError(f"block {d['index']} contents do not match its merkle_root")
+    block.hash = d["hash"]
+    return block, offset
+
+
+# ── chains (storage) ---------------------------------------------------------
+def encode_chain(blocks: List[Block]) -> bytes:
+    return b"".join([CHAIN_MAGIC, bytes([CODEC_VERSION]), U32.pack(len(blocks))] +
+                    [encode_block(b) for b in blocks])
+
+
+def decode_chain(data: bytes) -> List[Block]:
+    """
+    Raises:
+        CodecError: If the data is not a complete binary chain
+    """
+    if data[:4] != CHAIN_MAGIC:
+        raise CodecError("not a binary chain file")
+    if len(data) < 9:
+        raise CodecError("truncated chain header")
+    if data[4] not in SUPPORTED_VERSIONS:
+        raise CodecError(f"unsupported codec version {data[4]}")
+    (count,) = U32.unpack_from(data, 5)
+    offset, blocks = 9, []
+    for _ in range(count):
+        block, offset = decode_block(data, offset)
+        blocks.append(block)
+    return blocks
+
+
+def save_chain(blocks: List[Block], path: str, fmt: str = "bin") -> None:
+    """
+    Write a chain file atomically (temp file + rename).
+
+    Args:
+        fmt: "bin" for the binary codec, "json" for Blockchain.serialize_chain() format
+    """
+    if fmt == "bin":
+        data = encode_chain(blocks)
+    else:
+        data = json.dumps([
+            {"index": b.index, "previous_hash": b.previous_hash, "timestamp": b.timestamp,
+             "transactions": b.transactions, "nodes": b.nodes, "nonce": b.nonce, "bits": b.bits, "hash": b.hash}
+            for b in blocks
+        ], indent=1).encode()
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_chain(path: str) -> List[Block]:
+    """
+    Read a chain file in either format (detected from its first bytes).
+
+    Raises:
+        OSError: If the file can't be read
+        CodecError: If its contents are not a chain
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] == CHAIN_MAGIC:
+        return decode_chain(data)
+    from LinkedList import Blockchain
+    try:
+        return Blockchain.deserialize_chain(data.decode())
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise CodecError(f"malformed JSON chain file: {e}")
+
+
+# ── wire messages --------------------------------------------------------------
+# A binary frame is FRAME_MAGIC, the codec version, a U32‑prefixed JSON
+# envelope holding every other message field, then the packed records.
+def is_binary(message: bytes) -> bool:
+    return message[:1] == FRAME_MAGIC
+
+
+def encode_message(msg: Dict) -> bytes:
+    """Binary‑encode a message if it carries headers/blocks, else return JSON."""
+    field = next((f for f in BINARY_FIELDS if f in msg), None)
+    if field is None:
+        return json.dumps(msg).encode()
+    envelope = {k: v for k, v in msg.items() if k != field}
+    envelope["_bin"] = field
+    env = json.dumps(envelope, separators=(",", ":")).encode()
+    if field == "headers":
+        body = U32.pack(len(msg[field])) + b"".join(encode_header(h) for h in msg[field])
+    elif field == "blocks":
+        body = U32.pack(len(msg[field])) + b"".join(encode_block_dict(b) for b in msg[field])
+    else:
+        body = encode_block_dict(msg[field])
+    return FRAME_MAGIC + bytes([CODEC_VERSION]) + U32.pack(len(env)) + env + body
+
+
+def decode_message(data: bytes) -> Dict:
+    """
+    Inverse of encode_message; plain JSON frames are accepted too.
+
+    Raises:
+        CodecError: If the frame is truncated or malformed, or isn't a
+            JSON object
+    """
+    if not is_binary(data):
+        try:
+            msg = json.loads(data)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise CodecError(f"malformed JSON frame: {e}")
+        if not isinstance(msg, dict):
+            raise CodecError("frame is not a JSON object")
+        return msg
+    if len(data) < 6:
+        raise CodecError("truncated frame header")
+    if data[1] not in SUPPORTED_VERSIONS:
+        raise CodecError(f"unsupported codec version {data[1]}")
+    (size,) = U32.unpack_from(data, 2)
+    try:
+        msg = json.loads(data[6:6 + size])
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise CodecError(f"malformed frame envelope: {e}")
+    field = msg.pop("_bin", None) if isinstance(msg, dict) else None
+    if field not in BINARY_FIELDS:
+        raise CodecError("frame envelope names no binary field")
+    offset = 6 + size
+    if field == "block":
+        msg[field], _ = decode_block_dict(data, offset)
+        return msg
+    try:
+        (count,) = U32.unpack_from(data, offset)
+    except struct.error as e:
+        raise CodecError(f"truncated record count: {e}")
+    offset += U32.size
+    decode = decode_header if field == "headers" else decode_block_dict
+    items = []
+    for _ in range(count):
+        item, offset = decode(data, offset)
+        items.append(item)
+    msg[field] = items
+    return msg
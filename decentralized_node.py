@@ -1,22 +1,100 @@
-import sys, socket, time, json, threading, webbrowser
-from LinkedList import Blockchain, Block
-
-# Flask imports
-from flask import Flask, request, redirect, url_for, render_template_string
+import sys, os, socket, time, json, threading, argparse, random
+from LinkedList import (Blockchain, Block, HeaderChain, BlockValidationError, transaction_id,
+                        vote_error, load_genesis, verify_vote_proof, record_reorg)
+from inventory import SeenCache
+import codec
+import ingest
+from events import EventHub
+from webcache import TipCache
+from network import peek_routing
+from p2p import PeerLinks, recv_frame
+from metrics import REGISTRY, CONTENT_TYPE, ThreadTotals, serve_metrics
+import tracing
 
 # Local blockchain instance and live peer list
 blockchain = Blockchain(difficulty=1)
 peer_ids: list[str] = []
-# Blocks mined locally but not yet broadcast
+# Roster version from the tracker; deltas must arrive as roster_epoch + 1
+roster_epoch = 0
+# Spanning tree pushed by a tracker in topology mode (node ➜ tree neighbors),
+# and per-source relay children derived from it
+tree_adj: dict[str, list[str]] = {}
+_tree_children: dict[str, list[str]] = {}
+# Blocks mined locally but not yet broadcast: held by the user
+# ("broadcast=n", console/control "hold"), and mined while the tracker
+# link was down (sent on their own once it is back)
 pending_broadcast: list[Block] = []
+_offline_blocks: list[Block] = []
+# Block hashes already processed, and tips we already asked a peer for
+seen_blocks = SeenCache(capacity=4096, bloom_capacity=100_000)
+requested_blocks = SeenCache(capacity=256)
+# Transaction IDs we already asked a peer for, per TX_REQUEST_TIMEOUT window:
+# an unanswered request (or an empty reply) lets the next INV ask again
+requested_txs = SeenCache(capacity=8192)
+TX_REQUEST_TIMEOUT = 2.0      # seconds
+
+# Mempool gossip: new tx IDs are batched and announced in one INV message
+TX_FLUSH_INTERVAL = 0.25      # seconds between INV flushes
+TX_INV_MAX        = 500       # max IDs per INV message
+_tx_outbox: list[str] = []
+_tx_outbox_lock = threading.Lock()
+
+# Tracker reconnect backoff: doubles per failed attempt up to the cap,
+# each wait jittered so a restarted tracker isn't hit by the whole fleet at once
+RECONNECT_BASE_DELAY = 0.5    # seconds
+RECONNECT_MAX_DELAY  = 30.0
+
+# Optional chain file (--chain-file); rewritten when the tip changes
+CHAIN_SAVE_INTERVAL = 5.0     # seconds between tip checks
+
+# Initial sync: a GET_HEADERS is lost if it went out on a direct link that
+# both ends drop because they dialled each other at once. Still at genesis
+# INITIAL_SYNC_RETRY seconds later, we ask the next peer
+INITIAL_SYNC_RETRY    = 3.0   # seconds
+INITIAL_SYNC_ATTEMPTS = 3
+
+# Background miner, in every full-node mode: /vote only queues the vote
+# and wakes it, as do reorgs and console votes whose mining failed. It waits
+# MINER_GRACE seconds so votes arriving together share one proof of work.
+# Blocks holding a vote submitted with "broadcast=n" are queued instead.
+MINER_GRACE = 0.5             # seconds
+_mine_wakeup = threading.Event()
+_held_txs: set[str] = set()
+
+# Light-client mode (--light): verified headers only, no blocks; votes are
+# checked against Merkle proofs fetched from full nodes
+light_headers: HeaderChain | None = None
+# headers to step back from our tip on the next GET_HEADERS: doubled each
+# time a reply doesn't link (the peer's chain forks below our tip), so the
+# request soon reaches the fork point; reset once headers are accepted
+_light_rewind = 0
+
+# Metrics (served on /metrics, or --metrics-port when headless). dispatch()
+# counts every message and its bytes in a plain per-thread cell, which the
+# counters sum at scrape time, and times (and traces) one message in
+# HANDLER_SAMPLE per type and thread: a clock pair, two metric updates and
+# a span per message cost more than the 2% the receive path allows.
+# Types beyond MAX_MESSAGE_TYPES share "other".
+MAX_MESSAGE_TYPES = 64
+HANDLER_SAMPLE    = 16
+MESSAGES = REGISTRY.counter("node_messages_received_total",
+                            "Messages received, by message type and path", ["type", "via"])
+MESSAGE_BYTES = REGISTRY.counter("node_message_bytes_received_total",
+                                 "Frame bytes received, by message type and path", ["type", "via"])
+HANDLER_SECONDS = REGISTRY.histogram("node_message_handler_seconds",
+                                     f"handle_message() time of one message in {HANDLER_SAMPLE}, "
+                                     "by message type and path (tracker or p2p)", ["type", "via"])
+# (type, path) ➜ per-thread [messages, bytes, histogram, type] cells
+_message_totals: dict[tuple[str, str], ThreadTotals] = {}
+_message_totals_lock = threading.Lock()
+_dispatch_local = threading.local()     # path ➜ this thread's {type: cell}
+# highest chain height a peer has announced (BLOCK_MINED, HEADERS)
+best_remote_height = 0
 
 # ────────────────────────────── NODE ID ──────────────────────────────
 NODE_ID = None     # will be set in __main__
 
-# ────────────────────────────── Flask app ──────────────────────────────
-app = Flask(__name__)
-
-# -------------------------------------------------------------------------
+# ────────────────────────────── Web UI templates ──────────────────────────────
 PAGE = """
 <!doctype html>
 <html lang="en">
@@ -141,6 +219,11 @@ TALLY_PAGE = """
 
 # ────────────────────────── Helper to broadcast a mined block ──────────────────────────
 def _broadcast_block(blk: Block):
+    if not net_interface.connected.is_set():
+        # tracker link is down; sent again once the reconnect completes
+        _offline_blocks.append(blk)
+        print(f"[INFO] offline; queued block #{blk.index} for broadcast")
+        return
     head_msg = {
         "type": "HEADERS",
         "src":  NODE_ID,
@@ -161,125 +244,456 @@ def _broadcast_block(blk: Block):
     net_interface.send(json.dumps(msg).encode())
     print(f"[INFO] broadcast block #{blk.index}")
 
-# ────────────────────────── Flask route functions ──────────────────────────
-@app.route("/")
-def index():
-    return render_template_string(PAGE,
-                                  node=NODE_ID,
-                                  length=len(blockchain.chain))
-
-@app.route("/vote", methods=["POST"])
-def submit_vote():
-    votesA = int(request.form["a"])
-    votesB = int(request.form["b"])
-    broadcast_now = request.form["broadcast"] == "y"
-
-    tx = {"vote": {"A": votesA, "B": votesB}, "timestamp": time.time()}
-    try:
-        blockchain.add_transaction(tx)
-    except ValueError as e:
-        return f"Transaction rejected: {e}", 400
-
-    blk = blockchain.add_block(nodes=peer_ids)
-    if blk is None:
-        return "Mining failed", 500
-
-    if broadcast_now:
+def flush_pending_broadcast():
+    """Broadcast every queued block in the order it was mined."""
+    blocks = pending_broadcast[:]
+    pending_broadcast.clear()
+    for blk in blocks:
         _broadcast_block(blk)
-    else:
-        pending_broadcast.append(blk)
 
-    return redirect(url_for('index'))
+def _flush_offline_blocks():
+    """Broadcast the blocks mined while the tracker link was down (held blocks stay queued)."""
+    blocks = _offline_blocks[:]
+    _offline_blocks.clear()
+    for blk in blocks:
+        _broadcast_block(blk)
 
-@app.route("/broadcast")
-def do_broadcast():
+# ────────────────────────── Background miner ──────────────────────────
+def _miner_loop():
+    """Mine the mempool whenever a local vote wakes us, after a short grace period."""
+    while True:
+        _mine_wakeup.wait()
+        time.sleep(MINER_GRACE)
+        _mine_wakeup.clear()
+        blk = blockchain.add_block(nodes=peer_ids)
+        if blk is None:
+            if blockchain.pending_transactions:
+                _mine_wakeup.set()    # mining timed out; votes are back in the pool
+            continue
+        seen_blocks.add(blk.hash)
+        if blockchain.pending_transactions:
+            _mine_wakeup.set()        # more than one block's worth queued
+        held = (_held_txs.intersection(transaction_id(tx) for tx in blk.transactions)
+                if _held_txs else None)
+        if held:
+            _held_txs.difference_update(held)
+            pending_broadcast.append(blk)
+            print(f"[INFO] queued block #{blk.index} for later broadcast")
+        else:
+            _broadcast_block(blk)
+
+def _have_block(bd: dict) -> bool:
     """
-    Broadcast every queued block in the order it was mined.
+    True if the block a message describes (a block or header dict) is on
+    our chain. seen_blocks answers misses cheaply; a hit may be a Bloom
+    false positive or a block we have since detached, so it is confirmed
+    by index against the chain.
     """
-    for blk in list(pending_broadcast):   # iterate over a snapshot
-        _broadcast_block(blk)
-    pending_broadcast.clear()
-    return redirect(url_for('index'))
-
-@app.route("/chain")
-def view_chain():
-    chain_rows = [
-        {
-            "index": b.index,
-            "hash":  b.hash,
-            "txs":   len(b.transactions),
-            "time":  time.strftime('%H:%M:%S', time.localtime(b.timestamp))
-        }
-        for b in blockchain.chain
-    ]
-    return render_template_string(CHAIN_PAGE,
-                                  node=NODE_ID,
-                                  chain=chain_rows)
-
-@app.route("/tally")
-def view_tally():
-    return render_template_string(TALLY_PAGE,
-                                  node=NODE_ID,
-                                  tally=blockchain.get_votes_tally())
+    h, i = bd.get("hash"), bd.get("index")
+    if not isinstance(h, str) or not seen_blocks.seen(h):
+        return False
+    chain = blockchain.chain
+    return isinstance(i, int) and 0 <= i < len(chain) and chain[i].hash == h
+
+def _message_cell(mtype, via: str) -> list:
+    """This thread's dispatch() cell for a message type, created on first use."""
+    cells = getattr(_dispatch_local, via, None)
+    if cells is None:
+        cells = {}
+        setattr(_dispatch_local, via, cells)
+    name = mtype if isinstance(mtype, str) else "other"
+    if (name, via) not in _message_totals and len(_message_totals) >= MAX_MESSAGE_TYPES:
+        name = "other"
+    cell = cells.get(name)
+    if cell is None:
+        key = (name, via)
+        with _message_totals_lock:
+            totals = _message_totals.get(key)
+            if totals is None:
+                totals = _message_totals[key] = ThreadTotals(2, (HANDLER_SECONDS.labels(*key), name))
+                MESSAGES.labels(*key).set_function(lambda: totals.total(0))
+                MESSAGE_BYTES.labels(*key).set_function(lambda: totals.total(1))
+        cell = cells[name] = totals.cell()
+    return cell
+
+# ────────────────────────── Mempool gossip helpers ──────────────────────────
+def announce_transaction(tx_id: str):
+    """Queue a mempool entry for the next batched INV announcement."""
+    with _tx_outbox_lock:
+        _tx_outbox.append(tx_id)
+
+def _tx_flush_loop(net_if: 'NetworkInterface'):
+    """Every TX_FLUSH_INTERVAL seconds, announce queued tx IDs in INV batches."""
+    while True:
+        time.sleep(TX_FLUSH_INTERVAL)
+        with _tx_outbox_lock:
+            if not _tx_outbox:
+                continue
+            batch = _tx_outbox[:]
+            _tx_outbox.clear()
+        for i in range(0, len(batch), TX_INV_MAX):
+            inv = {
+                "type":  "INV",
+                "src":   NODE_ID,
+                "dst":   "*",
+                "ts":    time.time(),
+                "txids": batch[i:i + TX_INV_MAX]
+            }
+            try:
+                net_if.send(json.dumps(inv).encode())
+            except OSError as e:
+                print("[WARN] INV flush failed:", e)
+                break
+
+API_PAGE_SIZE = 50            # default / max blocks per /api/chain page
+API_PAGE_MAX  = 500
+
+def _block_summary(b: Block, with_txs: bool = False) -> dict:
+    row = dict(b.header(), txs=len(b.transactions))
+    if with_txs:
+        row["transactions"] = b.transactions
+    return row
+
+# ────────────────────────────── Flask app ──────────────────────────────
+def create_app():
+    """
+    Build the web UI. Flask is imported here rather than at module level
+    so a headless node never loads it.
+    """
+    from flask import Flask, Response, request, redirect, url_for, jsonify, stream_with_context
+
+    app = Flask(__name__)
+    # one shared event source for every /events client
+    hub = EventHub(blockchain).start()
+    # pages are compiled once; rendered bodies are cached per chain tip
+    pages = {name: app.jinja_env.from_string(src)
+             for name, src in (("index", PAGE), ("chain", CHAIN_PAGE), ("tally", TALLY_PAGE))}
+    cache = TipCache(blockchain)
+    blockchain.add_listener(cache.clear)
+
+    def cached(key: str, render, mimetype: str = "text/html"):
+        """
+        Serve render(chain) for the current tip: 304 if the client's ETag
+        matches, else the cached body, rendering it on a miss.
+        """
+        tip = cache.tip()
+        if request.if_none_match.contains(TipCache.etag(key, tip)):
+            cache.not_modified += 1
+            resp = Response(status=304)
+        else:
+            body = cache.lookup(key, tip)
+            if body is None:
+                with blockchain.lock:
+                    chain = list(blockchain.chain)
+                tip = chain[-1].hash      # the tip may have moved meanwhile
+                body = render(chain)
+                cache.store(key, tip, body)
+            resp = Response(body, mimetype=mimetype)
+        resp.set_etag(TipCache.etag(key, tip))
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
+    @app.route("/")
+    def index():
+        return cached("index", lambda chain: pages["index"].render(node=NODE_ID, length=len(chain)))
+
+    @app.route("/vote", methods=["POST"])
+    def submit_vote():
+        """
+        Queue a vote (form fields or JSON body: a, b, broadcast) and
+        return 202 with its transaction ID; the background miner puts it
+        in a block. Poll /tx/<id> for its status.
+        """
+        data = request.get_json(silent=True) or request.form
+        try:
+            votesA = int(data["a"])
+            votesB = int(data["b"])
+        except (KeyError, TypeError, ValueError):
+            return jsonify(error="a and b must be integers"), 400
+        broadcast_now = data.get("broadcast", "y") in ("y", True)
+
+        tx = {"vote": {"A": votesA, "B": votesB}, "timestamp": time.time()}
+        error = vote_error(tx["vote"])
+        if error:
+            return jsonify(error=error), 400
+        tx_id = transaction_id(tx)
+        if not broadcast_now:
+            _held_txs.add(tx_id)
+        try:
+            blockchain.add_transaction(tx)
+        except ValueError as e:
+            _held_txs.discard(tx_id)
+            return jsonify(error=f"Transaction rejected: {e}"), 400
+        if broadcast_now:
+            announce_transaction(tx_id)
+        _mine_wakeup.set()
+
+        status_url = url_for('tx_status', tx_id=tx_id)
+        return jsonify(tx_id=tx_id, status="pending", status_url=status_url), 202, {"Location": status_url}
+
+    @app.route("/votes/bulk", methods=["POST"])
+    def bulk_votes():
+        """
+        Stream in NDJSON (default) or CSV vote records (?format=csv or a
+        text/csv body) and stream back one NDJSON result line per record,
+        then a summary line; ?errors_only=1 leaves out accepted records.
+        """
+        fmt = request.args.get("format") or ("csv" if request.mimetype == "text/csv" else "ndjson")
+        if fmt not in ingest.FORMATS:
+            return jsonify(error=f"format must be one of {', '.join(ingest.FORMATS)}"), 400
+
+        def accepted(tx_ids):
+            for tx_id in tx_ids:
+                announce_transaction(tx_id)
+            _mine_wakeup.set()
+
+        results = ingest.ingest(blockchain, request.stream, fmt, on_accept=accepted,
+                                errors_only=request.args.get("errors_only") == "1")
+        return Response(stream_with_context(json.dumps(r) + "\n" for r in results),
+                        mimetype="application/x-ndjson")
+
+    @app.route("/tx/<tx_id>")
+    def tx_status(tx_id):
+        """pending | requeued | mining | mined (height, confirmations) | orphaned"""
+        status = blockchain.get_transaction_status(tx_id)
+        if status is None:
+            return jsonify(tx_id=tx_id, status="unknown"), 404
+        return jsonify(status)
+
+    @app.route("/broadcast")
+    def do_broadcast():
+        """
+        Broadcast every queued block in the order it was mined.
+        """
+        flush_pending_broadcast()
+        return redirect(url_for('index'))
+
+    @app.route("/chain")
+    def view_chain():
+        def render(chain):
+            chain_rows = [
+                {
+                    "index": b.index,
+                    "hash":  b.hash,
+                    "txs":   len(b.transactions),
+                    "time":  time.strftime('%H:%M:%S', time.localtime(b.timestamp))
+                }
+                for b in chain
+            ]
+            return pages["chain"].render(node=NODE_ID, chain=chain_rows)
+        return cached("chain", render)
+
+    @app.route("/tally")
+    def view_tally():
+        return cached("tally", lambda chain: pages["tally"].render(
+            node=NODE_ID, tally=blockchain.get_votes_tally(chain)))
+
+    @app.route("/api/chain")
+    def api_chain():
+        """
+        Blocks by height, one page at a time. Query: cursor (first height
+        to return; default tip for order=desc, 0 for asc), limit (max
+        API_PAGE_MAX), order=desc|asc, txs=1 to include transactions.
+        Follow next_cursor until it is null.
+        """
+        try:
+            limit = min(max(int(request.args.get("limit", API_PAGE_SIZE)), 1), API_PAGE_MAX)
+            cursor = request.args.get("cursor")
+            cursor = int(cursor) if cursor is not None else None
+        except ValueError:
+            return jsonify(error="cursor and limit must be integers"), 400
+        order = request.args.get("order", "desc")
+        if order not in ("desc", "asc"):
+            return jsonify(error="order must be desc or asc"), 400
+        with_txs = request.args.get("txs") == "1"
+
+        def render(chain):
+            tip = len(chain) - 1
+            if order == "desc":
+                start = tip if cursor is None else min(cursor, tip)
+                heights = range(start, max(start - limit, -1), -1)
+                following = start - limit if start - limit >= 0 else None
+            else:
+                start = 0 if cursor is None else max(cursor, 0)
+                heights = range(start, min(start + limit, tip + 1))
+                following = start + limit if start + limit <= tip else None
+            return json.dumps({
+                "tip": {"height": tip, "hash": chain[-1].hash},
+                "blocks": [_block_summary(chain[h], with_txs) for h in heights],
+                "next_cursor": following
+            })
+        key = f"api/chain?cursor={cursor}&limit={limit}&order={order}&txs={int(with_txs)}"
+        return cached(key, render, "application/json")
+
+    @app.route("/api/tally")
+    def api_tally():
+        return cached("api/tally", lambda chain: json.dumps({
+            "tip": {"height": len(chain) - 1, "hash": chain[-1].hash},
+            "tally": blockchain.get_votes_tally(chain)
+        }), "application/json")
+
+    @app.route("/proof/<tx_id>")
+    def view_proof(tx_id):
+        """Merkle inclusion proof for a confirmed vote."""
+        proof = blockchain.get_vote_proof(tx_id)
+        if proof is None:
+            return jsonify(error="transaction not on chain"), 404
+        return jsonify(proof)
+
+    @app.route("/events")
+    def event_stream():
+        """
+        Server-Sent Events: a snapshot first, then reorg / tip / tally
+        frames as the chain changes (see events.py).
+        """
+        def stream():
+            sub = hub.subscribe()
+            try:
+                yield "retry: 2000\n" + hub.snapshot_frame()
+                while True:
+                    frame = sub.get()
+                    yield frame if frame is not None else ": keepalive\n\n"
+            finally:
+                sub.close()
+        return Response(stream(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.route("/inventory")
+    def view_inventory():
+        """Seen-cache hit/miss counters."""
+        return jsonify(blocks=seen_blocks.stats(),
+                       requests=requested_blocks.stats(),
+                       events=hub.stats(),
+                       response_cache=cache.stats())
+
+    @app.route("/trace")
+    def view_trace():
+        """Trace ring buffer as Chrome trace JSON (chrome://tracing, Perfetto)."""
+        return Response(tracing.TRACER.dumps(), mimetype="application/json",
+                        headers={"Content-Disposition": f"attachment; filename=trace-{NODE_ID}.json"})
+
+    @app.route("/metrics")
+    def view_metrics():
+        """Prometheus text exposition of every metric in this process."""
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+    return app
+
+def _register_gauges():
+    """Gauges read at scrape time from the node's current state."""
+    def height():
+        return len(light_headers) - 1 if light_headers is not None else len(blockchain.chain) - 1
+    REGISTRY.gauge("node_chain_height", "Height of the local chain tip").set_function(height)
+    REGISTRY.gauge("node_mempool_transactions", "Transactions waiting to be mined").set_function(
+        lambda: len(blockchain.pending_index))
+    REGISTRY.gauge("node_sync_lag_blocks", "Blocks between the best tip peers announced and ours"
+                   ).set_function(lambda: max(0, best_remote_height - height()))
+    REGISTRY.gauge("node_peers", "Peers in the tracker roster").set_function(lambda: len(peer_ids))
+    REGISTRY.gauge("node_pending_broadcast_blocks", "Mined blocks not yet broadcast"
+                   ).set_function(lambda: len(pending_broadcast) + len(_offline_blocks))
+
+def _saw_remote_height(height: int) -> None:
+    global best_remote_height
+    if height > best_remote_height:
+        best_remote_height = height
 
 # ────────────────────────────── Chain reorg helper ──────────────────────────────
-def reorganize_chain(new_blk: Block):
+def _drop_detached(detached: set[str]):
+    """
+    Take blocks a reorg detached out of pending_broadcast and the offline
+    queue: they are never broadcast. Votes from those held blocks that
+    went back to the mempool stay held. Caller holds blockchain.lock.
+    """
+    with blockchain.transaction_lock:
+        for blk in pending_broadcast:
+            if blk.hash in detached:
+                _held_txs.update(t for t in map(transaction_id, blk.transactions)
+                                 if t in blockchain.pending_index)
+    pending_broadcast[:] = [blk for blk in pending_broadcast if blk.hash not in detached]
+    _offline_blocks[:] = [blk for blk in _offline_blocks if blk.hash not in detached]
+
+@tracing.traced("reorganize_chain")
+def reorganize_chain(new_blks: list[Block]) -> bool:
     """
-    Reorganize local chain so that `new_blk` can be appended.
-    Any local blocks beyond the fork point are moved to pending_broadcast.
-    Returns True if reorg done, False if no common ancestor.
+    Reorganize local chain onto a peer's branch: `new_blks` is a linked
+    run of blocks whose first one forks from a block we hold. Local blocks
+    beyond the fork point are detached and their transactions returned to
+    the mempool; nothing is re‑mined here.
+    Returns True if reorg done, False if no common ancestor, the branch is
+    invalid there, or it is no longer than our chain (more of it is needed;
+    on a tie we keep the branch we saw first).
     """
-    # --- DEBUG: before any changes ---
+    first = new_blks[0]
     with blockchain.lock:
         # 1️⃣ find common ancestor (fork point)
         fork_idx = None
         for i in range(len(blockchain.chain) - 1, -1, -1):
-            if blockchain.chain[i].hash == new_blk.previous_hash:
+            if blockchain.chain[i].hash == first.previous_hash:
                 fork_idx = i
                 break
-        if fork_idx is None:
-            fork_idx = 0
-
-        # 2️⃣ detach local tail (blocks after fork point) in-place so other references see the change
-        local_tail = blockchain.chain[fork_idx + 1:]
-        del blockchain.chain[fork_idx + 1:]
-
-        # 3️⃣ insert the incoming block
-        blockchain.chain.append(new_blk)
-
-        # 4️⃣ re‑mine and append orphaned blocks so they follow the new tip
-        reattached = 0
-        for old_blk in local_tail:
-            # assign new sequential index to avoid duplicates
-            old_blk.index = blockchain.get_latest_block().index + 1
-            old_blk.previous_hash = blockchain.get_latest_block().hash
-            old_blk.nonce = 0
-            old_blk.hash = old_blk.calculate_hash()
-            try:
-                old_blk.mine_block(blockchain.difficulty)
-                blockchain.chain.append(old_blk)
-                reattached += 1
-            except TimeoutError:
-                print(f"[WARN] re‑mining block #{old_blk.index} timed out; queued")
-                pending_broadcast.append(old_blk)
-
-        if reattached:
-            print(f"[INFO] Re‑attached {reattached} orphaned blocks on new tip")
-
-        print("[INFO] Reorg complete: chain now matches broadcasting peer plus re‑attached blocks")
-        print("[DEBUG] Chain FINAL after re‑attach:")
-        show_chain()
-        return True
+        if fork_idx is None or fork_idx + 1 + len(new_blks) <= len(blockchain.chain):
+            return False
+        # the branch must be valid where it attaches, targets included
+        error = blockchain.extension_error(new_blks, after=fork_idx)
+        if error:
+            print(f"[WARN] branch does not fit at fork point #{fork_idx}: {error}")
+            return False
+
+        # 2️⃣ detach the local tail in place; its transactions go back to the mempool
+        local_tail = blockchain.detach_after(fork_idx)
+        record_reorg(len(local_tail))
+
+        # 3️⃣ append the branch, dropping re‑queued votes it confirms
+        blockchain.chain.extend(new_blks)
+        for blk in new_blks:
+            seen_blocks.add(blk.hash)
+        blockchain.prune_pending()
+
+        # 4️⃣ detached blocks are never broadcast; their votes back in the
+        # mempool are announced again, unless held
+        _drop_detached({blk.hash for blk in local_tail})
+        with blockchain.transaction_lock:
+            requeued = [t for blk in local_tail for t in map(transaction_id, blk.transactions)
+                        if t in blockchain.pending_index and t not in _held_txs]
+        blockchain.notify_changed()
+
+        tracing.instant("reorg", {"fork": fork_idx, "detached": len(local_tail)})
+        print(f"[INFO] Reorg complete: detached {len(local_tail)} blocks after #{fork_idx}; "
+              "their votes are back in the mempool")
+        if tracing.VERBOSE:
+            print("[DEBUG] Chain FINAL after reorg:")
+            show_chain()
+    for tx_id in requeued:
+        announce_transaction(tx_id)
+    # the miner packs the re‑queued votes into one block on the new tip
+    _mine_wakeup.set()
+    return True
+
+def request_chain(net_if: 'NetworkInterface', peer: str, tip_hash: str):
+    """Ask `peer` for its whole chain: its branch forks below anything we can fetch block by block."""
+    if requested_blocks.check_and_add(f"chain:{tip_hash}"):
+        return        # already asked for this branch
+    req = {"type": "REQ_CHAIN", "src": NODE_ID, "dst": peer, "ts": time.time()}
+    net_if.send(json.dumps(req).encode())
+    print(f"[INFO] requested the full chain from {peer}")
 
 class NetworkInterface():
     """
-    DO NOT EDIT.
-    
-    Provided interface to the network. In addition to typical send/recv methods,
-    it also provides a method to receive an initial message from the network, which
-    contains the costs to neighbors. 
+    A node's connection to the network: the tracker connection plus, unless
+    p2p_port is None, direct PeerLinks to up to max_peers peers from the
+    tracker's roster.
+
+    send() and send_message() gossip broadcasts over the links and unicast
+    to a linked peer directly, falling back to the tracker for everything
+    else (and for peers the links can't reach). If the tracker connection
+    drops, _reconnect() redials it with jittered exponential backoff and
+    re-registers. Messages from the tracker (listen_for_messages) and from
+    the links both arrive in dispatch(), which records metrics and hands
+    them to handle_message(). A light client (light=True) keeps verified
+    headers only and checks its votes against Merkle proofs.
     """
-    def __init__(self, network_port, network_ip, node_id):
+    def __init__(self, network_port, network_ip, node_id, p2p_port=None, max_peers=8,
+                 light=False):
         """
         Constructor for the NetworkInterface class.
 
@@ -290,28 +704,88 @@ class NetworkInterface():
                 The IP address of the network.
             node_id : str
                 The unique identifier for this peer.
+            p2p_port : int | None
+                Port to accept direct peer links on (0 = any free port).
+                None keeps all traffic on the tracker connection.
+            max_peers : int
+                Number of outbound direct links to maintain.
+            light : bool
+                Register as a light client, which the tracker keeps out
+                of everyone's roster.
         """
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.connect((network_ip, network_port))
+        self.send_lock = threading.Lock()
+        self.sock = None
+        self.connected = threading.Event()
+        self.closing = False
+        self._resume = False        # set after a reconnect until we have resynced
+        self.home_addr = (network_ip, network_port)
+        self._connect_tracker(network_ip, network_port)
+
+        # Direct links: the tracker only tells us where peers listen
+        self.links = None
+        payload = { "node_id": node_id }
+        if light:
+            payload["light"] = True
+        if p2p_port is not None:
+            self.links = PeerLinks(node_id, self.dispatch,
+                                   listen_port=p2p_port, max_outbound=max_peers)
+            self.links.start()
+            payload["listen"] = ["", self.links.port]   # tracker fills in our IP
 
         # Immediately self‑register with the tracker
-        register_msg = {
+        self.register_msg = {
             "type": "REGISTER",
             "src":  node_id,
             "dst":  "tracker",
             "ts":   time.time(),
-            "payload": { "node_id": node_id }
+            "payload": payload
         }
-        self.send(json.dumps(register_msg).encode())
+        self.send(json.dumps(self.register_msg).encode())
 
         # Tracker will answer with PEER_LIST soon; no blocking read here
-        
+
+    def _connect_tracker(self, ip, port):
+        """Open (or replace) the tracker connection."""
+        sock = socket.create_connection((ip, port))
+        with self.send_lock:
+            old, self.sock = self.sock, sock
+            self.tracker_addr = (ip, port)
+        if old is not None:
+            old.close()
+        self.connected.set()
+
+    def _reconnect(self):
+        """
+        Reconnect to the tracker after the connection dropped, using
+        jittered exponential backoff, then re‑register under the same ID.
+        The PEER_LIST reply triggers a catch‑up from our current tip, and
+        blocks mined while offline are broadcast.
+        """
+        self.connected.clear()
+        print("[WARN] lost tracker connection; reconnecting")
+        delay = RECONNECT_BASE_DELAY
+        while not self.closing:
+            time.sleep(random.uniform(delay / 2, delay))
+            try:
+                self._connect_tracker(*self.home_addr)
+                break
+            except OSError:
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        if self.closing:
+            return
+        self._resume = True
+        self.send(json.dumps(self.register_msg).encode())
+        print(f"[INFO] reconnected to tracker at {self.home_addr[0]}:{self.home_addr[1]}")
+        _flush_offline_blocks()
+
     def initial_message(self): 
         return ""
     
     def send(self, message):
         """
-        Send a message to all direct neigbors.
+        Send an encoded message: a broadcast over every direct link, a
+        unicast over the link to its destination, and through the tracker
+        when no link covers it.
 
         Parameters:
             message : bytes
@@ -320,10 +794,42 @@ class NetworkInterface():
         Returns:
             None
         """
+        if self.links is not None:
+            route = peek_routing(message)
+            dst = route["dst"]
+            if dst in ("*", "broadcast"):
+                # gossip over direct links; fall back to the tracker too if
+                # some peer can't be reached that way
+                if self.links.broadcast(message) and not self.links.partial(peer_ids):
+                    if route["type"] == "HEADERS":
+                        # the tracker still needs new tips: for its header
+                        # cache and for light clients, which have no links
+                        message = json.dumps(dict(json.loads(message), linked=True)).encode()
+                    else:
+                        return
+            elif dst != "tracker" and self.links.send(dst, message):
+                return
+
         message_len = len(message)
         packet = message_len.to_bytes(4, byteorder='big') + message
-        self.sock.sendall(packet)
+        with self.send_lock:
+            try:
+                self.sock.sendall(packet)
+            except OSError:
+                # the listener notices the drop and reconnects
+                print("[WARN] tracker unreachable; message dropped")
     
+    def send_message(self, msg: dict):
+        """
+        Send a message dict. A unicast over a direct link is encoded for
+        that link (binary block/header records if both ends support it);
+        everything else goes through send() as JSON.
+        """
+        if (self.links is not None and msg["dst"] not in ("*", "broadcast", "tracker")
+                and self.links.send(msg["dst"], msg)):
+            return
+        self.send(json.dumps(msg).encode())
+
     def recv(self, length):
         """
         Receive a message from neighbors. Behaves exactly like socket.recv()
@@ -338,169 +844,555 @@ class NetworkInterface():
         """
         return self.sock.recv(length)
     
+    def _initial_sync(self, attempt: int = 0):
+        """If we have only the genesis block, request headers from a peer (see INITIAL_SYNC_RETRY)."""
+        others = [p for p in peer_ids if p != NODE_ID]
+        if len(blockchain.chain) == 1 and others:
+            target_peer = others[attempt % len(others)]
+            req = {
+                "type": "GET_HEADERS",
+                "src":  NODE_ID,
+                "dst":  target_peer,
+                "ts":   time.time(),
+                "payload": { "from_index": 0 }
+            }
+            self.send(json.dumps(req).encode())
+            print(f"[INFO] Requested full headers from {target_peer} for initial sync")
+            if attempt + 1 < INITIAL_SYNC_ATTEMPTS:
+                timer = threading.Timer(INITIAL_SYNC_RETRY, self._initial_sync, args=(attempt + 1,))
+                timer.daemon = True
+                timer.start()
+
+    def _resume_sync(self):
+        """After a reconnect, ask a peer only for headers past our tip."""
+        others = [p for p in peer_ids if p != NODE_ID]
+        if not others:
+            return
+        tip = blockchain.get_latest_block()
+        req = {
+            "type": "GET_HEADERS",
+            "src":  NODE_ID,
+            "dst":  others[0],
+            "ts":   time.time(),
+            "payload": { "from_hash": tip.hash, "from_index": tip.index + 1 }
+        }
+        self.send(json.dumps(req).encode())
+        print(f"[INFO] Requested headers after #{tip.index} from {others[0]}")
+
+    # ── light client ----------------------------------------------------------
+    def _handle_light(self, msg: dict):
+        """
+        Light-client dispatch: follow the roster, keep the verified header
+        chain current and check PROOF replies. Blocks, transactions and
+        requests for either are ignored.
+        """
+        global peer_ids, roster_epoch
+        mtype = msg.get("type")
+
+        if mtype == "PEER_LIST":
+            peer_ids = msg["payload"]["nodes"]
+            roster_epoch = msg["payload"].get("epoch", 0)
+            genesis = msg["payload"].get("genesis")
+            if genesis and Blockchain.genesis_from_dict(genesis).hash != light_headers.genesis_hash:
+                print("[ERR] tracker's genesis block differs from ours; not syncing")
+                return
+            headers = msg["payload"].get("headers")
+            if not headers:
+                self._light_sync()
+            elif self._light_extend(headers) is None:
+                self._light_sync(rewind=True)
+
+        elif mtype in ("PEER_JOINED", "PEER_LEFT"):
+            nid = msg["payload"]["node_id"]
+            if mtype == "PEER_JOINED":
+                peer_ids = peer_ids + [nid] if nid not in peer_ids else peer_ids
+            else:
+                peer_ids = [p for p in peer_ids if p != nid]
+            roster_epoch = msg["payload"]["epoch"]
+            if len(light_headers) == 1:
+                self._light_sync()
+
+        elif mtype == "HEADERS":
+            if msg["dst"] in ("*", NODE_ID) and msg["headers"]:
+                _saw_remote_height(msg["headers"][-1]["index"])
+                if self._light_extend(msg["headers"]) is None:
+                    source = msg.get("source") or msg["src"]
+                    self._light_sync(source if source != "tracker" else None, rewind=True)
+
+        elif mtype == "PROOF":
+            self._check_proof(msg["src"], msg["payload"])
+
+    def _light_extend(self, headers: list) -> bool | None:
+        """Add headers to the verified header chain (PoW and links checked)."""
+        global _light_rewind
+        result = light_headers.extend(headers)
+        if result:
+            _light_rewind = 0
+            print(f"[INFO] header tip #{light_headers.tip()['index']}")
+        elif result is False:
+            print("[WARN] rejected headers that fail verification or are not longer")
+        return result
+
+    def _light_sync(self, peer: str | None = None, rewind: bool = False):
+        """
+        Ask a full node for every header past our tip. With `rewind` (the
+        last headers didn't link), ask from further back each time, so
+        extend() can replace a forked suffix of our header chain.
+        """
+        global _light_rewind
+        others = [p for p in peer_ids if p != NODE_ID]
+        if peer is None and not others:
+            return
+        if rewind:
+            _light_rewind = max(1, _light_rewind * 2)
+        req = {
+            "type": "GET_HEADERS",
+            "src":  NODE_ID,
+            "dst":  peer or others[0],
+            "ts":   time.time(),
+            "payload": { "from_index": max(0, len(light_headers) - _light_rewind) }
+        }
+        self.send(json.dumps(req).encode())
+
+    def request_proof(self, tx_id: str):
+        """Ask a full node for the Merkle proof of one vote."""
+        others = [p for p in peer_ids if p != NODE_ID]
+        if not others:
+            print("[WARN] no full node to ask for a proof")
+            return
+        req = {
+            "type": "GET_PROOF",
+            "src":  NODE_ID,
+            "dst":  random.choice(others),
+            "ts":   time.time(),
+            "payload": { "tx_id": tx_id }
+        }
+        self.send(json.dumps(req).encode())
+
+    def _check_proof(self, src: str, payload: dict):
+        """Verify a PROOF reply against our own header for that block."""
+        tx_id, proof = payload["tx_id"], payload.get("proof")
+        if proof is None:
+            print(f"[INFO] {src} has no confirmed vote {tx_id[:12]}")
+            return
+        index = proof["header"]["index"]
+        header = light_headers.headers_from(index)[:1]
+        if not header or header[0]["index"] != index:
+            print(f"[WARN] no header #{index} yet; syncing, check again shortly")
+            self._light_sync(src)
+            return
+        if not verify_vote_proof(proof, header[0]):
+            print(f"[WARN] proof from {src} for {tx_id[:12]} failed verification")
+            return
+        confirmations = light_headers.tip()["index"] - index + 1
+        print(f"[INFO] vote {tx_id[:12]} verified in block #{index} "
+              f"({confirmations} confirmations, {len(proof['path'])}-step Merkle path)")
+
+    def _relay_along_tree(self, msg: dict):
+        """
+        Topology mode: pass a broadcast on to our tree children for its
+        source, i.e. every tree neighbor except the one on the path back
+        to the source. Sources outside our tree component get no relay.
+        """
+        src = msg.get("src")
+        if src == NODE_ID or src not in tree_adj:
+            return
+        if src not in _tree_children:
+            # walk the tree from the source; our parent is the hop we heard from
+            parent = {src: None}
+            todo = [src]
+            while todo:
+                cur = todo.pop()
+                for nxt in tree_adj.get(cur, []):
+                    if nxt not in parent:
+                        parent[nxt] = cur
+                        todo.append(nxt)
+            _tree_children[src] = ([n for n in tree_adj.get(NODE_ID, []) if n != parent[NODE_ID]]
+                                   if NODE_ID in parent else [])
+        for child in _tree_children[src]:
+            fwd = dict(msg, dst=child, relay=True)
+            self.send(json.dumps(fwd).encode())
+
     def listen_for_messages(self):
         while True:
+            # ---- framed read: 4-byte length prefix ----
             try:
-                # ---- framed read: 4-byte length prefix ----
-                hdr = self.recv(4)
-                if not hdr:
-                    break
-                msg_len = int.from_bytes(hdr, "big")
-                data = self.recv(msg_len)
-                if not data:
+                data = recv_frame(self.sock)
+            except OSError:
+                data = b""
+            if not data:
+                if self.closing:
                     break
+                self._reconnect()
+                continue
 
-                # ---- decode JSON ----
-                try:
-                    msg = json.loads(data.decode())
-                except json.JSONDecodeError:
-                    print("[WARN] received non-JSON payload")
-                    continue
-
-                mtype = msg.get("type")
-                if mtype == "PEER_LIST":
-                    global peer_ids
-                    peer_ids = msg["payload"]["nodes"]
-                    print(f"[INFO] peers → {peer_ids}")
-                    # --- Auto‑sync for fresh nodes -------------------
-                    # If we have only the genesis block, request headers
-                    if len(blockchain.chain) == 1 and peer_ids:
-                        target_peer = peer_ids[0]
-                        req = {
-                            "type": "GET_HEADERS",
-                            "src":  NODE_ID,
-                            "dst":  target_peer,
-                            "ts":   time.time(),
-                            "payload": { "from_index": 0 }
-                        }
-                        self.send(json.dumps(req).encode())
-                        print(f"[INFO] Requested full headers from {target_peer} for initial sync")
-
-                elif mtype == "BLOCK_MINED":
-                    try:
-                        blk = dict_to_block(msg["block"])
-                        remote_len = msg.get("length", blk.index + 1)  # sender’s chain length
-                        if blk.is_valid(blockchain.difficulty):
-                            with blockchain.lock:
-                                expected = blockchain.get_latest_block().index + 1
-                                if blk.index == expected and blk.previous_hash == blockchain.get_latest_block().hash:
-                                    blockchain.chain.append(blk)
-                                    print(f"[INFO] added block #{blk.index} from peer")
-                                else:
-                                    if remote_len > len(blockchain.chain):
-                                        # Attempt reorg only if their chain is longer
-                                        if reorganize_chain(blk):
-                                            print(f"[INFO] reorganized chain; added block #{blk.index}")
-                                        else:
-                                            print("[WARN] fork with unknown ancestor; waiting for headers")
-                                    else:
-                                        print(f"[INFO] ignored shorter chain from {msg['src']} "
-                                              f"(len {remote_len} vs {len(blockchain.chain)})")
-                                        # Send polite rejection
-                                        rej = {
-                                            "type":   "REJECT_BLOCK",
-                                            "src":    NODE_ID,
-                                            "dst":    msg["src"],
-                                            "ts":     time.time(),
-                                            "reason": "shorter_chain",
-                                            "your_length": remote_len,
-                                            "my_length":   len(blockchain.chain)
-                                        }
-                                        self.send(json.dumps(rej).encode())
-                        else:
-                            print("[WARN] invalid PoW in block")
-                    except Exception as e:
-                        print("[ERR]", e)
-
-                elif mtype == "GET_HEADERS":
-                    # Peer wants headers starting from a given index
-                    if msg["dst"] in ("*", NODE_ID):
-                        loc_index = msg["payload"]["from_index"]
-                        with blockchain.lock:
-                            headers = [
-                                block_to_header(b)
-                                for b in blockchain.chain
-                                if b.index >= loc_index
-                            ]
-                        reply = {
-                            "type": "HEADERS",
-                            "src":  NODE_ID,
-                            "dst":  msg["src"],
-                            "ts":   time.time(),
-                            "headers": headers
-                        }
-                        self.send(json.dumps(reply).encode())
-
-                elif mtype == "HEADERS":
-                    if msg["dst"] in ("*", NODE_ID):
-                        last = msg["headers"][-1]
-                        remote_tip = last["index"]
-                        if remote_tip > blockchain.get_latest_block().index:
-                            # ask for full blocks we are missing
-                            need_from = blockchain.get_latest_block().index + 1
-                            req = {
-                                "type": "GET_BLOCKS",
-                                "src":  NODE_ID,
-                                "dst":  msg["src"],
-                                "ts":   time.time(),
-                                "from_index": need_from
-                            }
-                            self.send(json.dumps(req).encode())
-
-                elif mtype == "GET_BLOCKS":
-                    if msg["dst"] in ("*", NODE_ID):
-                        start = msg["from_index"]
-                        with blockchain.lock:
-                            blks = [
-                                block_to_dict(b)
-                                for b in blockchain.chain
-                                if b.index >= start
-                            ]
-                        reply = {
-                            "type": "BLOCKS",
-                            "src":  NODE_ID,
-                            "dst":  msg["src"],
-                            "ts":   time.time(),
-                            "blocks": blks
-                        }
-                        self.send(json.dumps(reply).encode())
-
-                elif mtype == "BLOCKS":
-                    if msg["dst"] in ("*", NODE_ID):
-                        try:
-                            new_blks = [dict_to_block(bd) for bd in msg["blocks"]]
-                            with blockchain.lock:
-                                if new_blks[0].index == blockchain.get_latest_block().index + 1:
-                                    blockchain.chain.extend(new_blks)
-                                    print(f"[INFO] extended chain by {len(new_blks)} blocks")
-                        except Exception as e:
-                            print("[ERR] importing blocks:", e)
-                elif mtype == "REQ_CHAIN":
-                    if msg["dst"] in ("*", NODE_ID):
-                        send_full_chain(self, msg["src"], NODE_ID)
-
-                elif mtype == "CHAIN":
-                    if msg["dst"] in ("*", NODE_ID):
-                        try:
-                            new_chain = Blockchain.deserialize_chain(msg["chain"])
-                            if blockchain.replace_chain(new_chain):
-                                print("[INFO] Replaced local chain with longer one")
-                        except Exception as e:
-                            print("[ERR] failed to import chain:", e)
-                elif mtype == "REJECT_BLOCK":
-                    if msg["dst"] in ("*", NODE_ID):
-                        print(f"[INFO] block rejected by {msg['src']} – reason: {msg.get('reason')}")
-                else:
-                    print("[RECV]", msg)
+            # ---- decode JSON ----
+            try:
+                msg = json.loads(data.decode())
+            except json.JSONDecodeError:
+                print("[WARN] received non-JSON payload")
+                continue
 
+            try:
+                self.dispatch(msg, len(data), "tracker")
             except Exception as e:
                 print("listener error:", e)
-                break
+
+    def dispatch(self, msg: dict, size: int, via: str = "p2p"):
+        """
+        handle_message() with its per-type count and frame bytes recorded,
+        and for a sample of messages (see HANDLER_SAMPLE) its latency and a
+        trace span named after the message type. Entry point for both the
+        tracker connection and PeerLinks.
+        """
+        try:
+            cell = getattr(_dispatch_local, via)[msg["type"]]
+        except (AttributeError, KeyError, TypeError):
+            cell = _message_cell(msg.get("type"), via)
+        count = cell[0] = cell[0] + 1
+        cell[1] += size
+        if count % HANDLER_SAMPLE != 1:
+            return self.handle_message(msg)
+        start = time.perf_counter_ns()
+        try:
+            self.handle_message(msg)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            cell[2].observe(elapsed / 1e9)
+            tracing.complete(cell[3], start, elapsed, via)
+
+    def handle_message(self, msg: dict):
+        """
+        Dispatch one decoded message, whether it came through the tracker
+        or over a direct peer link.
+        """
+        global peer_ids, roster_epoch, tree_adj
+        mtype = msg.get("type")
+        if tree_adj and (msg.get("dst") == "*" or msg.get("relay")):
+            self._relay_along_tree(msg)
+
+        if mtype == "REDIRECT":
+            # federated trackers: our ID is owned by another tracker
+            host, port = msg["payload"]["addr"]
+            if host in ("", "0.0.0.0"):
+                host = self.tracker_addr[0]
+            print(f"[INFO] tracker redirects us to {msg['payload']['tracker']} at {host}:{port}")
+            self._connect_tracker(host, int(port))
+            self.send(json.dumps(self.register_msg).encode())
+
+        elif mtype == "PING":
+            pong = {
+                "type": "PONG",
+                "src":  NODE_ID,
+                "dst":  "tracker",
+                "ts":   time.time(),
+                "payload": {}
+            }
+            self.send(json.dumps(pong).encode())
+
+        elif light_headers is not None:
+            self._handle_light(msg)
+
+        elif mtype == "PEER_LIST":
+            peer_ids = msg["payload"]["nodes"]
+            roster_epoch = msg["payload"].get("epoch", 0)
+            print(f"[INFO] peers → {peer_ids}")
+            if self.links is not None:
+                self.links.set_addresses(msg["payload"].get("addrs", {}))
+            if msg["payload"].get("genesis") and not blockchain.reset_genesis(msg["payload"]["genesis"]):
+                print("[ERR] tracker's genesis block differs from our chain's; not syncing")
+                return
+            if msg["payload"].get("headers"):
+                # tracker header cache: no GET_HEADERS round trip needed
+                self.handle_message({
+                    "type":    "HEADERS",
+                    "src":     "tracker",
+                    "dst":     NODE_ID,
+                    "source":  msg["payload"].get("source"),
+                    "headers": msg["payload"]["headers"]
+                })
+            elif self._resume:
+                self._resume_sync()
+            else:
+                self._initial_sync()
+            self._resume = False
+
+        elif mtype in ("PEER_JOINED", "PEER_LEFT"):
+            epoch = msg["payload"]["epoch"]
+            nid = msg["payload"]["node_id"]
+            if epoch <= roster_epoch:
+                return                # stale or duplicate delta
+            if epoch > roster_epoch + 1:
+                # missed a delta: ask the tracker for a snapshot
+                req = {
+                    "type": "GET_PEER_LIST",
+                    "src":  NODE_ID,
+                    "dst":  "tracker",
+                    "ts":   time.time(),
+                    "payload": { "epoch": roster_epoch }
+                }
+                self.send(json.dumps(req).encode())
+                return
+            # rebind rather than mutate: mined blocks hold a
+            # reference to the peer_ids list they were built with
+            if mtype == "PEER_JOINED":
+                if nid not in peer_ids:
+                    peer_ids = peer_ids + [nid]
+                if self.links is not None:
+                    self.links.add_address(nid, msg["payload"].get("addr"))
+            else:
+                peer_ids = [p for p in peer_ids if p != nid]
+                if self.links is not None:
+                    self.links.remove_address(nid)
+            roster_epoch = epoch
+            print(f"[INFO] peers → {peer_ids}")
+            self._initial_sync()
+
+        elif mtype == "TREE":
+            adj: dict[str, list[str]] = {}
+            for a, b, _cost in msg["payload"]["edges"]:
+                adj.setdefault(a, []).append(b)
+                adj.setdefault(b, []).append(a)
+            tree_adj = adj
+            _tree_children.clear()
+            print(f"[INFO] relay tree neighbors → {tree_adj.get(NODE_ID, [])}")
+
+        elif mtype == "BLOCK_MINED":
+            # drop repeat sightings of blocks we hold before hashing / validating
+            if _have_block(msg["block"]):
+                return
+            try:
+                blk = dict_to_block(msg["block"])
+                remote_len = msg.get("length", blk.index + 1)  # sender’s chain length
+                _saw_remote_height(remote_len - 1)
+                if blk.is_valid():
+                    with blockchain.lock:
+                        if _have_block(msg["block"]):
+                            return    # another copy was accepted meanwhile
+                        expected = blockchain.get_latest_block().index + 1
+                        if blk.index == expected and blk.previous_hash == blockchain.get_latest_block().hash:
+                            error = blockchain.extension_error([blk])
+                            if error:
+                                print(f"[WARN] rejected block from {msg['src']}: {error}")
+                            else:
+                                blockchain.chain.append(blk)
+                                seen_blocks.add(blk.hash)
+                                blockchain.prune_pending()
+                                blockchain.notify_changed()
+                                print(f"[INFO] added block #{blk.index} from peer")
+                        else:
+                            if remote_len > len(blockchain.chain):
+                                # Attempt reorg only if their chain is longer
+                                if reorganize_chain([blk]):
+                                    print(f"[INFO] reorganized chain; added block #{blk.index}")
+                                else:
+                                    print("[WARN] fork with unknown ancestor")
+                                    request_chain(self, msg["src"], blk.hash)
+                            else:
+                                print(f"[INFO] ignored shorter chain from {msg['src']} "
+                                      f"(len {remote_len} vs {len(blockchain.chain)})")
+                                # Send polite rejection
+                                rej = {
+                                    "type":   "REJECT_BLOCK",
+                                    "src":    NODE_ID,
+                                    "dst":    msg["src"],
+                                    "ts":     time.time(),
+                                    "reason": "shorter_chain",
+                                    "your_length": remote_len,
+                                    "my_length":   len(blockchain.chain)
+                                }
+                                self.send(json.dumps(rej).encode())
+                else:
+                    print("[WARN] invalid PoW in block")
+            except Exception as e:
+                print("[ERR]", e)
+
+        elif mtype == "GET_HEADERS":
+            # Peer wants headers starting from a given index
+            if msg["dst"] in ("*", NODE_ID):
+                loc_index = msg["payload"]["from_index"]
+                with blockchain.lock:
+                    # resume request: start right after the asker's tip if we have it
+                    from_hash = msg["payload"].get("from_hash")
+                    if from_hash:
+                        for b in reversed(blockchain.chain):
+                            if b.hash == from_hash:
+                                loc_index = b.index + 1
+                                break
+                    headers = [
+                        block_to_header(b)
+                        for b in blockchain.chain
+                        if b.index >= loc_index
+                    ]
+                reply = {
+                    "type": "HEADERS",
+                    "src":  NODE_ID,
+                    "dst":  msg["src"],
+                    "ts":   time.time(),
+                    "headers": headers
+                }
+                self.send_message(reply)
+
+        elif mtype == "HEADERS":
+            if msg["dst"] in ("*", NODE_ID) and msg["headers"]:
+                first = msg["headers"][0]
+                if first["index"] == 0 and first["hash"] != blockchain.chain[0].hash:
+                    print(f"[WARN] headers from {msg['src']} start from a different genesis")
+                    return
+                last = msg["headers"][-1]
+                remote_tip = last["index"]
+                _saw_remote_height(remote_tip)
+                tip = blockchain.get_latest_block()
+                if _have_block(last):
+                    return        # already have this tip
+                if ((msg["dst"] == "*" or msg.get("relay")) and len(msg["headers"]) == 1
+                        and last["previous_hash"] == tip.hash):
+                    return        # BLOCK_MINED for it follows
+                if requested_blocks.check_and_add(last["hash"]):
+                    return        # request already in flight
+                # headers served by the tracker name a peer that has the blocks
+                source = msg.get("source") or msg["src"]
+                if remote_tip > tip.index and source not in (NODE_ID, "tracker"):
+                    # ask for full blocks we are missing
+                    need_from = blockchain.get_latest_block().index + 1
+                    req = {
+                        "type": "GET_BLOCKS",
+                        "src":  NODE_ID,
+                        "dst":  source,
+                        "ts":   time.time(),
+                        "from_index": need_from
+                    }
+                    self.send(json.dumps(req).encode())
+
+        elif mtype == "GET_PROOF":
+            if msg["dst"] == NODE_ID:
+                tx_id = msg["payload"]["tx_id"]
+                reply = {
+                    "type": "PROOF",
+                    "src":  NODE_ID,
+                    "dst":  msg["src"],
+                    "ts":   time.time(),
+                    "payload": { "tx_id": tx_id, "proof": blockchain.get_vote_proof(tx_id) }
+                }
+                self.send_message(reply)
+
+        elif mtype == "GET_BLOCKS":
+            if msg["dst"] in ("*", NODE_ID):
+                start = msg["from_index"]
+                with blockchain.lock:
+                    blks = [
+                        block_to_dict(b)
+                        for b in blockchain.chain
+                        if b.index >= start
+                    ]
+                reply = {
+                    "type": "BLOCKS",
+                    "src":  NODE_ID,
+                    "dst":  msg["src"],
+                    "ts":   time.time(),
+                    "blocks": blks
+                }
+                self.send_message(reply)
+
+        elif mtype == "BLOCKS":
+            if msg["dst"] in ("*", NODE_ID):
+                try:
+                    # skip blocks we already hold before converting any
+                    with blockchain.lock:
+                        fresh = [bd for bd in msg["blocks"] if not _have_block(bd)]
+                    if not fresh:
+                        return
+                    new_blks = [dict_to_block(bd) for bd in fresh]
+                    with blockchain.lock:
+                        tip = blockchain.get_latest_block()
+                        if (new_blks[0].index == tip.index + 1
+                                and new_blks[0].previous_hash == tip.hash):
+                            error = blockchain.extension_error(new_blks)
+                            if error:
+                                print(f"[WARN] rejected blocks from {msg['src']}: {error}")
+                                return
+                            blockchain.chain.extend(new_blks)
+                            for b in new_blks:
+                                seen_blocks.add(b.hash)
+                            blockchain.prune_pending()
+                            blockchain.notify_changed()
+                            print(f"[INFO] extended chain by {len(new_blks)} blocks")
+                        elif new_blks[-1].index > tip.index:
+                            # a longer branch that forks below our tip
+                            if reorganize_chain(new_blks):
+                                print(f"[INFO] reorganized onto {len(new_blks)} blocks from {msg['src']}")
+                            else:
+                                request_chain(self, msg["src"], new_blks[-1].hash)
+                except Exception as e:
+                    print("[ERR] importing blocks:", e)
+        elif mtype == "REQ_CHAIN":
+            if msg["dst"] in ("*", NODE_ID):
+                send_full_chain(self, msg["src"], NODE_ID)
+
+        elif mtype == "CHAIN":
+            if msg["dst"] in ("*", NODE_ID):
+                try:
+                    new_chain = Blockchain.deserialize_chain(msg["chain"])
+                    with blockchain.lock:
+                        replaced = blockchain.replace_chain(new_chain)
+                        if replaced:
+                            _drop_detached({b.hash for b in pending_broadcast + _offline_blocks} -
+                                           {b.hash for b in blockchain.chain})
+                    if replaced:
+                        print("[INFO] Replaced local chain with longer one")
+                        _mine_wakeup.set()    # orphaned votes are back in the mempool
+                except Exception as e:
+                    print("[ERR] failed to import chain:", e)
+        elif mtype == "INV":
+            # fetch only the transactions we don't have (or recently asked for) yet
+            window = int(time.time() // TX_REQUEST_TIMEOUT)
+            wanted = [t for t in msg.get("txids", [])
+                      if not blockchain.has_transaction(t)
+                      and not requested_txs.check_and_add(f"{t}:{window}")]
+            if wanted:
+                req = {
+                    "type":  "GET_TXS",
+                    "src":   NODE_ID,
+                    "dst":   msg["src"],
+                    "ts":    time.time(),
+                    "txids": wanted
+                }
+                self.send(json.dumps(req).encode())
+
+        elif mtype == "GET_TXS":
+            if msg["dst"] in ("*", NODE_ID):
+                reply = {
+                    "type": "TXS",
+                    "src":  NODE_ID,
+                    "dst":  msg["src"],
+                    "ts":   time.time(),
+                    "transactions": blockchain.get_pending_transactions(msg["txids"])
+                }
+                self.send(json.dumps(reply).encode())
+
+        elif mtype == "TXS":
+            if msg["dst"] in ("*", NODE_ID):
+                added = 0
+                for tx in msg.get("transactions", []):
+                    try:
+                        blockchain.add_transaction(tx)
+                        added += 1
+                    except ValueError:
+                        pass        # invalid, or already known
+                if added:
+                    print(f"[INFO] mempool +{added} txs from {msg['src']}")
+
+        elif mtype == "REJECT_BLOCK":
+            if msg["dst"] in ("*", NODE_ID):
+                print(f"[INFO] block rejected by {msg['src']} – reason: {msg.get('reason')}")
+        else:
+            print("[RECV]", msg)
 
     def close(self):
         """
         Close the socket connection with the network.
         """
+        self.closing = True
         self.sock.close()
 
 # ───────────────── Block <-> JSON helpers ─────────────────
@@ -512,7 +1404,9 @@ def block_to_dict(block: Block) -> dict:
         "timestamp": block.timestamp,
         "transactions": block.transactions,
         "nodes": block.nodes,
+        "merkle_root": block.merkle_root,
         "nonce": block.nonce,
+        "bits": block.bits,
         "hash": block.hash
     }
 
@@ -520,7 +1414,7 @@ def dict_to_block(d: dict) -> Block:
     """Convert dict to Block and verify its hash integrity."""
     blk = Block(
         d["index"], d["previous_hash"], d["timestamp"],
-        d["transactions"], d["nodes"], d["nonce"]
+        d["transactions"], d["nodes"], d["nonce"], d["bits"]
     )
     if blk.calculate_hash() != d["hash"]:
         raise ValueError("Hash mismatch in received block")
@@ -531,6 +1425,21 @@ def block_to_header(block: Block) -> dict:
     """Lightweight dict for HEADERS messages."""
     return block.header()
 
+def _persist_loop(path: str):
+    """Rewrite the chain file whenever the tip has changed (JSON if it ends in .json)."""
+    fmt = "json" if path.endswith(".json") else "bin"
+    saved_tip = None
+    while True:
+        time.sleep(CHAIN_SAVE_INTERVAL)
+        with blockchain.lock:
+            blocks = list(blockchain.chain)
+        if blocks[-1].hash != saved_tip:
+            try:
+                codec.save_chain(blocks, path, fmt)
+                saved_tip = blocks[-1].hash
+            except OSError as e:
+                print("[WARN] saving chain failed:", e)
+
 def send_full_chain(net_if: 'NetworkInterface', dst_id: str, node_id: str):
     """Send entire chain to a peer that asked for it."""
     msg = {
@@ -584,6 +1493,92 @@ def show_chain():
     print("––––––––––––––––––––––––––––––––––––––––––––––\n")
 # -------------------------------------------------------------------------
 
+def light_console(net_if: 'NetworkInterface'):
+    """Light-client commands from stdin: check <tx_id> | tip."""
+    for line in sys.stdin:
+        cmd = line.split()
+        if not cmd:
+            continue
+        if cmd[0] == "check" and len(cmd) == 2:
+            net_if.request_proof(cmd[1])
+        elif cmd[0] == "tip":
+            tip = light_headers.tip()
+            print(f"[INFO] {len(light_headers)} headers, tip #{tip['index']} {tip['hash'][:12]}…")
+        else:
+            print("commands: check <tx_id> | tip")
+    # stdin closed: keep following headers
+    threading.Event().wait()
+
+def _send_block(net_if: 'NetworkInterface', node_id: str, blk: Block):
+    """HEADERS then BLOCK_MINED for one block, with our current chain length."""
+    head_msg = {
+        "type":  "HEADERS",
+        "src":   node_id,
+        "dst":   "*",
+        "ts":    time.time(),
+        "headers": [block_to_header(blk)]
+    }
+    net_if.send(json.dumps(head_msg).encode())
+
+    msg = {
+        "type":  "BLOCK_MINED",
+        "src":   node_id,
+        "dst":   "*",
+        "ts":    time.time(),
+        "length": len(blockchain.chain),
+        "block": block_to_dict(blk)
+    }
+    net_if.send(json.dumps(msg).encode())
+
+def broadcast_stored_blocks(net_if: 'NetworkInterface', node_id: str) -> int:
+    """Send every block queued in pending_broadcast (the console's 'broadcast')."""
+    sent = 0
+    while pending_broadcast:
+        blk = pending_broadcast.pop(0)
+        _send_block(net_if, node_id, blk)
+        print(f"[INFO] broadcast stored block #{blk.index}")
+        sent += 1
+    return sent
+
+def vote_and_mine(votesA: int, votesB: int, broadcast: bool = True) -> tuple[dict, Block | None]:
+    """
+    The console's vote: add one transaction and mine the mempool into a
+    block at once. Returns the transaction and the block (None if mining
+    failed). A vote left in the mempool by a failed attempt is announced
+    to peers only if `broadcast`; otherwise it is held like a /vote with
+    "broadcast=n", and its block queued when the miner gets to it.
+
+    Raises:
+        ValueError: If the transaction is rejected
+    """
+    tx = {"vote": {"A": votesA, "B": votesB},
+          "timestamp": time.time()}
+    error = vote_error(tx["vote"])
+    if error:
+        raise ValueError(error)
+    tx_id = transaction_id(tx)
+    blockchain.add_transaction(tx)
+
+    new_blk = blockchain.add_block(nodes=peer_ids)
+    if new_blk:
+        seen_blocks.add(new_blk.hash)
+        return tx, new_blk
+    if broadcast:
+        announce_transaction(tx_id)
+    else:
+        _held_txs.add(tx_id)
+    _mine_wakeup.set()        # the background miner tries again
+    return tx, new_blk
+
+def publish_block(net_if: 'NetworkInterface', node_id: str, blk: Block, broadcast: bool):
+    """Broadcast a block mined by vote_and_mine(), or queue it for 'broadcast'."""
+    if broadcast:
+        _send_block(net_if, node_id, blk)
+        print(f"[INFO] broadcast block #{blk.index}")
+    else:
+        pending_broadcast.append(blk)
+        print(f"[INFO] queued block #{blk.index} for later broadcast")
+
 def send_user_blocks(net_if: 'NetworkInterface', node_id: str):
     """Prompt user for votes, mine a block, broadcast it."""
     while True:
@@ -594,28 +1589,7 @@ def send_user_blocks(net_if: 'NetworkInterface', node_id: str):
                 show_chain()
                 continue
             if rawA.lower() == "broadcast":
-                # send all queued blocks
-                while pending_broadcast:
-                    blk = pending_broadcast.pop(0)
-                    head_msg = {
-                        "type": "HEADERS",
-                        "src":  node_id,
-                        "dst":  "*",
-                        "ts":   time.time(),
-                        "headers": [block_to_header(blk)]
-                    }
-                    net_if.send(json.dumps(head_msg).encode())
-
-                    msg = {
-                        "type":  "BLOCK_MINED",
-                        "src":   node_id,
-                        "dst":   "*",
-                        "ts":    time.time(),
-                        "length": len(blockchain.chain),
-                        "block": block_to_dict(blk)
-                    }
-                    net_if.send(json.dumps(msg).encode())
-                    print(f"[INFO] broadcast stored block #{blk.index}")
+                broadcast_stored_blocks(net_if, node_id)
                 continue
             votesA = int(rawA)
 
@@ -632,63 +1606,217 @@ def send_user_blocks(net_if: 'NetworkInterface', node_id: str):
             net_if.close()
             sys.exit(0)
 
-        tx = {"vote": {"A": votesA, "B": votesB},
-              "timestamp": time.time()}
-
         try:
-            blockchain.add_transaction(tx)
+            # the broadcast choice comes after mining, so hold the vote until then
+            _, new_blk = vote_and_mine(votesA, votesB, broadcast=False)
         except ValueError as e:
             print("Tx rejected:", e)
             continue
-
-        new_blk = blockchain.add_block(nodes=peer_ids)
         if not new_blk:
-            print("[WARN] mining failed")
+            print("[WARN] mining failed; the vote stays in the mempool, held")
             continue
 
         # Ask user if they want to broadcast right now
         choice = input("Broadcast this block now? (y/n): ").strip().lower()
-        if choice != "y":
-            pending_broadcast.append(new_blk)
-            print(f"[INFO] queued block #{new_blk.index} for later broadcast")
+        publish_block(net_if, node_id, new_blk, choice == "y")
+
+# ────────────────────────── Control mode (--control) ──────────────────────────
+# For scripted runs (simulate.py): JSON commands, one per line on stdin,
+# and one "EVT {json}" line on stdout per event. Every event has the
+# node ID and a wall-clock "t"; other stdout lines are ordinary logs.
+#
+#   {"cmd": "vote", "a": 10, "b": 20, "broadcast": true, "mine": true}
+#       mine=true mines the vote at once like the console; mine=false
+#       leaves it to the background miner (votes batch into blocks)
+#   {"cmd": "broadcast"}       send the queued blocks
+#   {"cmd": "status"}          height, tip, block hashes, tally, mempool
+#   {"cmd": "quit"}
+#
+# Events: ready, vote, mined, chain (blocks attached since the last one,
+# blocks detached by a reorg), broadcast, status, error.
+_emit_lock = threading.Lock()
+
+def emit(event: str, **data):
+    line = json.dumps({"evt": event, "node": NODE_ID, "t": time.time(), **data})
+    with _emit_lock:
+        sys.stdout.write(f"EVT {line}\n")
+        sys.stdout.flush()
+
+def _chain_events():
+    """Blockchain listener: one 'chain' event per change, with the tx IDs of new blocks."""
+    changes = threading.Event()
+    known: list[str] = []
+
+    def report():
+        while True:
+            changes.wait()
+            changes.clear()
+            with blockchain.lock:
+                chain = list(blockchain.chain)
+            t = time.time()
+            fork = min(len(chain), len(known)) - 1
+            while fork >= 0 and chain[fork].hash != known[fork]:
+                fork -= 1
+            detached = len(known) - fork - 1
+            attached = chain[fork + 1:]
+            if not detached and not attached:
+                continue
+            known[fork + 1:] = [b.hash for b in attached]
+            emit("chain", seen=t, height=len(chain) - 1, tip=chain[-1].hash,
+                 fork=fork, detached=detached,
+                 blocks=[{"index": b.index, "hash": b.hash,
+                          "txs": [transaction_id(tx) for tx in b.transactions]} for b in attached])
+
+    blockchain.add_listener(changes.set)
+    threading.Thread(target=report, daemon=True).start()
+    changes.set()
+
+def control_loop(net_if: 'NetworkInterface', node_id: str):
+    """Serve --control commands until stdin closes or 'quit'."""
+    _chain_events()
+    net_if.connected.wait(10)
+    emit("ready")
+    for line in sys.stdin:
+        if not line.strip():
             continue
-
-        head_msg = {
-            "type":  "HEADERS",
-            "src":   node_id,
-            "dst":   "*",
-            "ts":    time.time(),
-            "headers": [block_to_header(new_blk)]
-        }
-        net_if.send(json.dumps(head_msg).encode())
-
-        msg = {
-            "type":  "BLOCK_MINED",
-            "src":   node_id,
-            "dst":   "*",
-            "ts":    time.time(),
-            "length": len(blockchain.chain),
-            "block": block_to_dict(new_blk)
-        }
-        net_if.send(json.dumps(msg).encode())
-        print(f"[INFO] broadcast block #{new_blk.index}")
+        cmd = None
+        try:
+            cmd = json.loads(line)
+            op = cmd.get("cmd")
+            if op == "vote":
+                broadcast = cmd.get("broadcast", True)
+                if cmd.get("mine", True):
+                    tx, blk = vote_and_mine(int(cmd["a"]), int(cmd["b"]), broadcast)
+                    emit("vote", tx_id=transaction_id(tx), ref=cmd.get("ref"))
+                    if blk is None:
+                        emit("error", error="mining failed", ref=cmd.get("ref"))
+                        continue
+                    publish_block(net_if, node_id, blk, broadcast)
+                    emit("mined", index=blk.index, hash=blk.hash, broadcast=broadcast,
+                         ref=cmd.get("ref"))
+                else:
+                    # as POST /vote: queue it and let the background miner batch it
+                    tx = {"vote": {"A": int(cmd["a"]), "B": int(cmd["b"])},
+                          "timestamp": time.time()}
+                    error = vote_error(tx["vote"])
+                    if error:
+                        raise ValueError(error)
+                    tx_id = transaction_id(tx)
+                    if not broadcast:
+                        _held_txs.add(tx_id)
+                    try:
+                        blockchain.add_transaction(tx)
+                    except ValueError:
+                        _held_txs.discard(tx_id)
+                        raise
+                    if broadcast:
+                        announce_transaction(tx_id)
+                    _mine_wakeup.set()
+                    emit("vote", tx_id=tx_id, ref=cmd.get("ref"))
+            elif op == "broadcast":
+                emit("broadcast", blocks=broadcast_stored_blocks(net_if, node_id))
+            elif op == "status":
+                with blockchain.lock:
+                    hashes = [b.hash for b in blockchain.chain]
+                emit("status", height=len(hashes) - 1, tip=hashes[-1], hashes=hashes,
+                     tally=blockchain.get_votes_tally(), mempool=len(blockchain.pending_index),
+                     pending_broadcast=len(pending_broadcast), peers=peer_ids)
+            elif op == "quit":
+                break
+            else:
+                emit("error", error=f"unknown command {op!r}")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            emit("error", error=str(e), line=line.strip(),
+                 ref=cmd.get("ref") if isinstance(cmd, dict) else None)
+    net_if.close()
 
     
 if __name__ == '__main__':
-    if len(sys.argv) < 4:
-        print("Usage: python3 decentralized_node.py <tracker_ip> <tracker_port> <node_id> [flask_port]")
-        sys.exit(1)
-
-    tracker_ip   = sys.argv[1]
-    tracker_port = int(sys.argv[2])
-    NODE_ID      = sys.argv[3]
-    flask_port   = int(sys.argv[4]) if len(sys.argv) > 4 else 7000
-
-    net_interface = NetworkInterface(tracker_port, tracker_ip, NODE_ID)
+    parser = argparse.ArgumentParser(
+        usage="python3 decentralized_node.py <tracker_ip> <tracker_port> <node_id> [flask_port] [options]")
+    parser.add_argument("tracker_ip")
+    parser.add_argument("tracker_port", type=int)
+    parser.add_argument("node_id")
+    parser.add_argument("flask_port", type=int, nargs="?", default=7000)
+    parser.add_argument("--p2p-port", type=int, default=0,
+                        help="port for direct peer links (default: any free port)")
+    parser.add_argument("--max-peers", type=int, default=8,
+                        help="outbound direct links to keep open")
+    parser.add_argument("--no-p2p", action="store_true",
+                        help="route all traffic through the tracker")
+    parser.add_argument("--genesis", metavar="FILE",
+                        help="genesis block (JSON) to start the chain from")
+    parser.add_argument("--chain-file", metavar="PATH",
+                        help="load the chain from PATH at start and keep it saved there "
+                             "(binary codec, or JSON if PATH ends in .json)")
+    parser.add_argument("--headless", action="store_true",
+                        help="no web UI or browser; read votes from stdin if it is a terminal")
+    parser.add_argument("--light", action="store_true",
+                        help="light client: sync verified headers only and check votes "
+                             "with Merkle proofs (stdin: check <tx_id> | tip); implies "
+                             "--headless --no-p2p")
+    parser.add_argument("--control", action="store_true",
+                        help="scripted mode: JSON commands on stdin, EVT lines on stdout "
+                             "(see simulate.py); implies --headless")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="also serve /metrics on PORT (for --headless / --light nodes)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="log every transaction, tally and chain dump as text "
+                             "(otherwise they are only trace events; see /trace, SIGUSR1)")
+    args = parser.parse_args()
+    tracing.VERBOSE = tracing.VERBOSE or args.verbose
+    tracing.TRACER.install_signal()
+
+    if args.genesis:
+        blockchain = Blockchain(difficulty=1, genesis=load_genesis(args.genesis))
+    if args.light:
+        light_headers = HeaderChain(blockchain.chain[0].hash, verify_work=True,
+                                    target_block_time=blockchain.target_block_time)
+        light_headers.extend([blockchain.chain[0].header()])
+    elif args.chain_file:
+        if os.path.exists(args.chain_file):
+            try:
+                stored = codec.load_chain(args.chain_file)
+                if len(stored) > 1 and blockchain.replace_chain(stored):
+                    print(f"[INFO] loaded {len(stored)} blocks from {args.chain_file}")
+            except (OSError, codec.CodecError, BlockValidationError) as e:
+                # _persist_loop overwrites it with the chain we sync instead
+                print(f"[WARN] ignoring chain file {args.chain_file}: {e}")
+        threading.Thread(target=_persist_loop, args=(args.chain_file,), daemon=True).start()
+
+    _register_gauges()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    tracker_ip   = args.tracker_ip
+    tracker_port = args.tracker_port
+    NODE_ID      = args.node_id
+    flask_port   = args.flask_port
+
+    net_interface = NetworkInterface(tracker_port, tracker_ip, NODE_ID,
+                                     p2p_port=None if args.no_p2p or args.light else args.p2p_port,
+                                     max_peers=args.max_peers, light=args.light)
     threading.Thread(target=net_interface.listen_for_messages, daemon=True).start()
+    threading.Thread(target=_tx_flush_loop, args=(net_interface,), daemon=True).start()
+    if not args.light:
+        threading.Thread(target=_miner_loop, daemon=True).start()
+
+    if args.light:
+        light_console(net_interface)
+    elif args.control:
+        control_loop(net_interface, NODE_ID)
+    elif args.headless:
+        # Flask and webbrowser are never imported in this mode
+        if sys.stdin.isatty():
+            send_user_blocks(net_interface, NODE_ID)
+        else:
+            threading.Event().wait()
+    else:
+        import webbrowser
+        app = create_app()
 
-    # optional: open browser automatically
-    threading.Timer(1.0, lambda:
-        webbrowser.open(f"http://127.0.0.1:{flask_port}/")).start()
+        # optional: open browser automatically
+        threading.Timer(1.0, lambda:
+            webbrowser.open(f"http://127.0.0.1:{flask_port}/")).start()
 
-    app.run(host="0.0.0.0", port=flask_port, debug=False)
+        app.run(host="0.0.0.0", port=flask_port, debug=False)
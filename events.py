@@ -0,0 +1,197 @@
+# Server‑Sent Events for live dashboards
+# One EventHub per node follows the chain through Blockchain listeners and
+# turns each change into a few SSE frames: a reorg notice if blocks were
+# detached, the new tip, and a tally delta. The hub works out the change
+# once from the blocks that were added or removed (never by rescanning
+# the chain) and encodes each frame once. Every subscriber then gets the
+# same string.
+#
+# Each subscriber has a bounded buffer. A client that falls behind loses
+# its buffered frames and gets a single "snapshot" frame (tip plus full
+# tally) instead, then picks up live frames again. Every frame carries a
+# sequence number as its SSE id; a snapshot says which sequence number it
+# includes, so a client ignores older deltas that arrive after it.
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+SUBSCRIBER_BUFFER = 64        # frames buffered per client before it is dropped to a snapshot
+KEEPALIVE_INTERVAL = 15.0     # seconds of silence before a comment line is sent
+
+
+def sse_frame(event: str, data: Dict, seq: int | None = None) -> str:
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """One client's bounded frame buffer."""
+
+    def __init__(self, hub: "EventHub", maxlen: int):
+        self.hub = hub
+        self.maxlen = maxlen
+        self.frames: deque[str] = deque()
+        self.lagging = False
+        self.drops = 0
+        self._cond = threading.Condition()
+
+    def push(self, frame: str) -> None:
+        with self._cond:
+            if self.lagging:
+                return                # the snapshot it will get covers this
+            if len(self.frames) >= self.maxlen:
+                self.frames.clear()
+                self.lagging = True
+                self.drops += 1
+            else:
+                self.frames.append(frame)
+            self._cond.notify()
+
+    def get(self, timeout: float = KEEPALIVE_INTERVAL) -> str | None:
+        """Next frame, a snapshot frame if we fell behind, or None on timeout."""
+        with self._cond:
+            if not self.frames and not self.lagging:
+                self._cond.wait(timeout)
+            if self.lagging:
+                self.lagging = False
+            elif self.frames:
+                return self.frames.popleft()
+            else:
+                return None
+        return self.hub.snapshot_frame()
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """
+    Shared event source for every SSE client of one node.
+
+    Register chain_changed() with Blockchain.add_listener(); it only sets
+    an Event, and a hub thread works out what changed. A burst of changes
+    (e.g. a long sync) therefore becomes one set of frames.
+    """
+
+    def __init__(self, blockchain, buffer: int = SUBSCRIBER_BUFFER):
+        self.blockchain = blockchain
+        self.buffer = buffer
+        self.lock = threading.Lock()
+        self.subscribers: List[Subscription] = []
+        self.seq = 0
+        self.published = 0
+        # chain state the last frames describe: hash and tally per block
+        self._hashes: List[str] = []
+        self._block_tallies: List[Dict[str, int]] = []
+        self.tally: Dict[str, int] = {}
+        self._changed = threading.Event()
+        self._sync()
+
+    def start(self) -> "EventHub":
+        self.blockchain.add_listener(self.chain_changed)
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    # ── subscribers ---------------------------------------------------------
+    def subscribe(self) -> Subscription:
+        sub = Subscription(self, self.buffer)
+        with self.lock:
+            self.subscribers = self.subscribers + [sub]
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s is not sub]
+
+    def stats(self) -> Dict:
+        with self.lock:
+            subs = self.subscribers
+        return {"subscribers": len(subs), "seq": self.seq, "frames_published": self.published,
+                "snapshot_drops": sum(s.drops for s in subs)}
+
+    def publish(self, event: str, data: Dict) -> None:
+        self._publish([(event, data)])
+
+    def _publish(self, events: List[tuple], apply=None) -> None:
+        """
+        Number, encode and fan out frames. `apply` (state update) runs
+        under the same lock as the numbering, so a snapshot never
+        includes a change without also covering its frames' seq.
+        """
+        with self.lock:
+            if apply is not None:
+                apply()
+            frames = []
+            for event, data in events:
+                self.seq += 1
+                frames.append(sse_frame(event, data() if callable(data) else data, self.seq))
+            subs = self.subscribers
+            self.published += len(frames)
+        for frame in frames:
+            for sub in subs:
+                sub.push(frame)
+
+    def snapshot_frame(self) -> str:
+        """Tip and full tally as of the latest sequence number."""
+        with self.lock:
+            data = {"seq": self.seq, "height": len(self._hashes) - 1,
+                    "tip": self._hashes[-1] if self._hashes else None, "tally": dict(self.tally)}
+            return sse_frame("snapshot", data, self.seq)
+
+    # ── chain tracking ----------------------------------------------------------
+    def chain_changed(self) -> None:
+        self._changed.set()
+
+    def _run(self) -> None:
+        while True:
+            self._changed.wait()
+            self._changed.clear()
+            try:
+                self._sync()
+            except Exception as e:
+                print("[WARN] event hub:", e)
+
+    def _sync(self) -> None:
+        """Compare the chain with what was last published and publish the difference."""
+        with self.blockchain.lock:
+            chain = list(self.blockchain.chain)
+        # fork point: last height where our view and the chain agree
+        fork = min(len(chain), len(self._hashes)) - 1
+        while fork >= 0 and chain[fork].hash != self._hashes[fork]:
+            fork -= 1
+        detached = len(self._hashes) - fork - 1
+        attached = chain[fork + 1:]
+        if not detached and not attached:
+            return
+
+        delta: Dict[str, int] = {}
+        for block_tally in self._block_tallies[fork + 1:]:
+            for cand, n in block_tally.items():
+                delta[cand] = delta.get(cand, 0) - n
+        tallies = [block.tally() for block in attached]
+        for block_tally in tallies:
+            for cand, n in block_tally.items():
+                delta[cand] = delta.get(cand, 0) + n
+        delta = {cand: n for cand, n in delta.items() if n}
+
+        def apply():
+            del self._hashes[fork + 1:]
+            del self._block_tallies[fork + 1:]
+            self._hashes.extend(block.hash for block in attached)
+            self._block_tallies.extend(tallies)
+            for cand, n in delta.items():
+                self.tally[cand] = self.tally.get(cand, 0) + n
+
+        tip = chain[-1]
+        events = []
+        if detached and fork >= 0:
+            events.append(("reorg", {"fork_height": fork, "detached": detached,
+                                     "attached": len(attached), "tip": tip.hash}))
+        events.append(("tip", {"height": tip.index, "hash": tip.hash, "new_blocks": len(attached),
+                               "txs": sum(len(b.transactions) for b in attached), "ts": time.time()}))
+        if delta:
+            events.append(("tally", lambda: {"delta": delta, "tally": dict(self.tally)}))
+        self._publish(events, apply)
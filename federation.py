@@ -0,0 +1,297 @@
+# Federated multi‑tracker mode
+# Several trackers share one network: each node belongs to the tracker
+# picked by a consistent‑hash ring over node IDs, trackers exchange roster
+# deltas with each other, and a broadcast crosses each tracker‑to‑tracker
+# link once instead of once per remote peer.
+
+import bisect
+import hashlib
+import json
+import queue
+import socket
+import threading
+import time
+
+from network import Tracker, SelectorTracker, Node, peek_routing, network_log
+
+
+class HashRing:
+    """Consistent‑hash ring with `vnodes` virtual points per member."""
+
+    def __init__(self, members: list[str], vnodes: int = 64):
+        self._ring = sorted((self._hash(f"{m}#{i}"), m)
+                            for m in members for i in range(vnodes))
+        self._keys = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big")
+
+    def owner(self, key: str) -> str:
+        i = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._ring[i][1]
+
+
+class FederationMixin:
+    """
+    Adds federation to a tracker class (threaded or selectors).
+
+    Every tracker dials every other one and only *sends* on that outbound
+    socket; frames from other trackers arrive on the ordinary accepted
+    connections, which identify themselves with TRACKER_HELLO. Roster
+    changes travel as FED_JOINED / FED_LEFT deltas, with a FED_SNAPSHOT
+    whenever a tracker‑to‑tracker link (re)connects.
+    """
+
+    def __init__(self, port: int, tracker_id: str, trackers: dict[str, tuple[str, int]],
+                 **kwargs):
+        """
+        Args:
+            tracker_id: This tracker's ID; must be a key of `trackers`
+            trackers: tracker ID ➜ (host, port) for every federation member
+        """
+        super().__init__(port, **kwargs)
+        self.tracker_id = tracker_id
+        self.trackers = trackers
+        self.ring = HashRing(list(trackers))
+        self.remote: dict[str, tuple[str, list | None]] = {}   # node ➜ (tracker, addr)
+        self.remote_light: set[str] = set()      # remote light clients: routable, not listed
+        self._fed_out: dict[str, Node] = {}      # outbound link per tracker
+        self._fed_lock = threading.Lock()
+
+    # ── tracker‑to‑tracker links ----------------------------------------------
+    def serve_forever(self):
+        threading.Thread(target=self._federate, daemon=True).start()
+        super().serve_forever()
+
+    def _federate(self) -> None:
+        """Keep an outbound link to every other tracker, retrying each second."""
+        while True:
+            with self._fed_lock:
+                # a link whose writer exited hit a send error, and an evicted
+                # one is on its way out: redial both
+                for tid in [t for t, n in self._fed_out.items()
+                            if n.evicted or not n.writer.is_alive()]:
+                    del self._fed_out[tid]
+                missing = [tid for tid in self.trackers
+                           if tid != self.tracker_id and tid not in self._fed_out]
+            for tid in missing:
+                addr = self.trackers[tid]
+                try:
+                    sock = socket.create_connection(addr, timeout=2)
+                    sock.settimeout(None)
+                except OSError:
+                    continue
+                # outbound links are send‑only and get their own writer
+                # thread in both tracker modes, so a slow tracker never
+                # blocks this one's accept/relay loop
+                link = Node(None)
+                link.tracker_id = tid
+                link.connection = sock
+                link.connection_lock = threading.Lock()
+                link.send_queue = queue.Queue()
+                link.writer = threading.Thread(target=Tracker._writer_thread,
+                                               args=(self, link), daemon=True)
+                link.writer.start()
+                self._fed_put(link, self.encode_frame({
+                    "type": "TRACKER_HELLO",
+                    "src":  self.tracker_id,
+                    "dst":  tid,
+                    "ts":   time.time(),
+                    "payload": {}
+                }))
+                # snapshot and link registration under self.lock so no
+                # local join/leave delta can slip in between
+                with self.lock:
+                    self._fed_put(link, self.encode_frame({
+                        "type": "FED_SNAPSHOT",
+                        "src":  self.tracker_id,
+                        "dst":  tid,
+                        "ts":   time.time(),
+                        "payload": { "nodes": {nid: p.listen_addr for nid, p in self.peers.items()},
+                                     "light": [nid for nid, p in self.peers.items() if p.light] }
+                    }))
+                    with self._fed_lock:
+                        self._fed_out[tid] = link
+                network_log(f"federated with tracker {tid} at {addr[0]}:{addr[1]}")
+            time.sleep(1)
+
+    def _fed_put(self, link: Node, frame: bytes) -> None:
+        """
+        Queue a frame on an outbound tracker link, under the same send_hwm
+        as a peer's queue. A link past it is shut down like an evicted
+        peer; _federate then redials it and sends a fresh snapshot.
+        """
+        if link.evicted:
+            return
+        with link.connection_lock:
+            overflow = link.queued + len(frame) > self.send_hwm
+            if not overflow:
+                link.queued += len(frame)
+        if not overflow:
+            link.send_queue.put(frame)
+            return
+        link.evicted = True
+        self.evictions.inc()
+        network_log(f"dropping link to tracker {link.tracker_id}: "
+                    f"more than {self.send_hwm} bytes unsent")
+        try:
+            link.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        link.send_queue.put(None)     # its writer may be idle: let it exit
+
+    def _fed_send(self, tid: str, frame: bytes) -> None:
+        with self._fed_lock:
+            link = self._fed_out.get(tid)
+        if link is not None:
+            self._fed_put(link, frame)
+
+    def _fed_broadcast(self, frame: bytes) -> None:
+        with self._fed_lock:
+            links = list(self._fed_out.values())
+        for link in links:
+            self._fed_put(link, frame)
+
+    def _fed_delta(self, kind: str, nid: str, addr: list | None, light: bool = False) -> None:
+        self._fed_broadcast(self.encode_frame({
+            "type": kind,
+            "src":  self.tracker_id,
+            "dst":  "*",
+            "ts":   time.time(),
+            "payload": { "node_id": nid, "addr": addr, "light": light }
+        }))
+
+    # ── roster ------------------------------------------------------------------
+    def _roster(self) -> tuple[list[str], dict]:
+        nodes, addrs = super()._roster()
+        for nid, (_, addr) in self.remote.items():
+            if nid in self.remote_light:
+                continue
+            nodes.append(nid)
+            if addr:
+                addrs[nid] = addr
+        return nodes, addrs
+
+    def _remote_join(self, tid: str, nid: str, addr: list | None, light: bool = False) -> None:
+        if nid in self.peers or self.remote.get(nid, (None,))[0] == tid:
+            return
+        self.remote[nid] = (tid, addr)
+        if light:
+            self.remote_light.add(nid)
+            return
+        self.epoch += 1
+        self._broadcast_delta("PEER_JOINED", nid, addr)
+
+    def _remote_leave(self, nid: str) -> None:
+        if nid in self.remote_light:
+            self.remote_light.discard(nid)
+            self.remote.pop(nid, None)
+        elif self.remote.pop(nid, None) is not None:
+            self.epoch += 1
+            self._broadcast_delta("PEER_LEFT", nid)
+
+    def _apply_remote(self, tid: str, kind: str, payload: dict) -> None:
+        with self.lock:
+            if kind == "FED_SNAPSHOT":
+                nodes = payload["nodes"]
+                for nid in [n for n, (t, _) in self.remote.items() if t == tid and n not in nodes]:
+                    self._remote_leave(nid)
+                light = set(payload.get("light", ()))
+                for nid, addr in nodes.items():
+                    self._remote_join(tid, nid, addr, nid in light)
+            elif kind == "FED_JOINED":
+                self._remote_join(tid, payload["node_id"], payload.get("addr"), payload.get("light", False))
+            elif kind == "FED_LEFT":
+                self._remote_leave(payload["node_id"])
+
+    def _register(self, node: Node, nid: str, listen: list | None = None) -> bool:
+        with self.lock:
+            ok = super()._register(node, nid, listen)
+            if ok:
+                self._fed_delta("FED_JOINED", nid, node.listen_addr, node.light)
+        return ok
+
+    def _drop_peer(self, node: Node):
+        if node.tracker_id is not None:
+            # a tracker went away: forget every peer it owned
+            with self.lock:
+                for nid in [n for n, (t, _) in self.remote.items() if t == node.tracker_id]:
+                    self._remote_leave(nid)
+            if node.send_queue is not None:
+                node.send_queue.put(None)
+            return
+        with self.lock:
+            was_local = node.node_id is not None and self.peers.get(node.node_id) is node
+            super()._drop_peer(node)
+            if was_local:
+                self._fed_delta("FED_LEFT", node.node_id, None)
+
+    # ── frame handling ----------------------------------------------------------
+    def _dispatch_frame(self, node: Node, frame: bytes) -> bool:
+        try:
+            route = peek_routing(frame[4:])
+        except json.JSONDecodeError:
+            return False
+
+        if node.tracker_id is not None:
+            if route["type"] in ("FED_SNAPSHOT", "FED_JOINED", "FED_LEFT"):
+                self._apply_remote(node.tracker_id, route["type"], json.loads(frame[4:])["payload"])
+            else:
+                if route["type"] == "HEADERS" and self.headers is not None:
+                    if self.headers.extend(json.loads(frame[4:]).get("headers") or []):
+                        self.header_source = route["src"]
+                # already crossed the federation once: deliver locally only
+                Tracker._forward(self, frame, route["dst"] or "*", sender=route["src"],
+                                 light_only=self._light_only(route, frame))
+            return True
+
+        if node.node_id is None:
+            if route["type"] == "TRACKER_HELLO":
+                node.tracker_id = route["src"]
+                return True
+            if route["type"] == "REGISTER":
+                nid = json.loads(frame[4:])["payload"]["node_id"]
+                owner = self.ring.owner(nid)
+                if owner != self.tracker_id:
+                    self._send(node, {
+                        "type": "REDIRECT",
+                        "src":  "tracker",
+                        "dst":  nid,
+                        "ts":   time.time(),
+                        "payload": { "tracker": owner, "addr": list(self.trackers[owner]) }
+                    })
+                    return False
+
+        return super()._dispatch_frame(node, frame)
+
+    def _forward(self, frame: bytes, dst: str, sender: str, light_only: bool = False) -> None:
+        super()._forward(frame, dst, sender, light_only)
+        if dst in ("*", "broadcast"):
+            self._fed_broadcast(frame)
+        elif dst not in self.peers and dst in self.remote:
+            self._fed_send(self.remote[dst][0], frame)
+
+
+class FederatedTracker(FederationMixin, Tracker):
+    pass
+
+
+class FederatedSelectorTracker(FederationMixin, SelectorTracker):
+    pass
+
+
+FEDERATED_MODES = {
+    "threaded":  FederatedTracker,
+    "selectors": FederatedSelectorTracker,
+}
+
+
+def parse_federation(spec: str) -> dict[str, tuple[str, int]]:
+    """Parse "t0=host:port,t1=host:port,..." into {tracker_id: (host, port)}."""
+    trackers = {}
+    for item in spec.split(","):
+        tid, addr = item.split("=", 1)
+        host, port = addr.rsplit(":", 1)
+        trackers[tid.strip()] = (host.strip(), int(port))
+    return trackers
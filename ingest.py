@@ -0,0 +1,173 @@
+# Streaming bulk vote ingestion
+# Reads NDJSON or CSV vote records line by line from a file‑like stream
+# (e.g. a Flask request.stream), validates them in chunks and feeds them
+# into the mempool with Blockchain.add_transactions. Results come back as
+# a generator, one dict per record, so neither the upload nor the response
+# is ever held in memory as a whole.
+#
+# A record carries the two vote counts and a `ref` (booth / row
+# identifier). The ref becomes part of the transaction, so two booths
+# reporting the same counts within one timestamp tick are still two
+# distinct votes, and is required: records without one would collide as
+# duplicates.
+#
+#   NDJSON: {"a": 12, "b": 7, "ref": "booth-17"}
+#   CSV:    a,b,ref   (header row required)
+
+import csv
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from LinkedList import vote_error
+
+INGEST_CHUNK = 1000           # records validated and added per batch
+MAX_RECORD_BYTES = 4096       # longer lines are rejected without being kept
+FORMATS = ("ndjson", "csv")
+
+
+class RecordError(ValueError):
+    """A record that can't be turned into a vote transaction."""
+    pass
+
+
+# ── line reading -------------------------------------------------------------
+def read_lines(stream, max_bytes: int = MAX_RECORD_BYTES) -> Iterator[str | None]:
+    """
+    Yield decoded lines from a binary stream with a readline() method.
+    An over‑long line is skipped to its end and yielded as None.
+    """
+    while True:
+        raw = stream.readline(max_bytes + 1)
+        if not raw:
+            return
+        if len(raw) > max_bytes and not raw.endswith(b"\n"):
+            while raw and not raw.endswith(b"\n"):
+                raw = stream.readline(max_bytes + 1)
+            yield None
+            continue
+        yield raw.decode("utf-8", errors="replace")
+
+
+# ── record parsing -------------------------------------------------------------
+def _vote(a, b, ref) -> Dict:
+    try:
+        a, b = int(a), int(b)
+    except (TypeError, ValueError):
+        raise RecordError("a and b must be integers")
+    if ref in (None, ""):
+        raise RecordError("ref is required")
+    tx = {"vote": {"A": a, "B": b}, "timestamp": time.time(), "ref": str(ref)}
+    error = vote_error(tx["vote"])
+    if error:
+        raise RecordError(error)
+    return tx
+
+
+def parse_ndjson(lines: Iterable[str | None]) -> Iterator[Tuple[int, Dict | RecordError | None]]:
+    """
+    Yields:
+        (line number, transaction or RecordError); blank lines yield None
+    """
+    for lineno, line in enumerate(lines, 1):
+        if line is None:
+            yield lineno, RecordError("record too long")
+            continue
+        if not line.strip():
+            yield lineno, None
+            continue
+        try:
+            rec = json.loads(line)
+            yield lineno, _vote(rec["a"], rec["b"], rec.get("ref"))
+        except (json.JSONDecodeError, KeyError, TypeError):
+            yield lineno, RecordError("expected a JSON object with a and b")
+        except RecordError as e:
+            yield lineno, e
+
+
+def parse_csv(lines: Iterable[str | None]) -> Iterator[Tuple[int, Dict | RecordError | None]]:
+    """Like parse_ndjson, for CSV with an a,b,ref header row (line 1)."""
+    lines = iter(lines)
+    header = next(lines, None)
+    columns = [c.strip().lower() for c in next(csv.reader([header]))] if header else []
+    if not {"a", "b", "ref"} <= set(columns):
+        yield 1, RecordError("CSV header must name columns a, b and ref")
+        return
+    ia, ib, iref = columns.index("a"), columns.index("b"), columns.index("ref")
+
+    for lineno, line in enumerate(lines, 2):
+        if line is None:
+            yield lineno, RecordError("record too long")
+            continue
+        if not line.strip():
+            yield lineno, None
+            continue
+        row = next(csv.reader([line]))
+        try:
+            yield lineno, _vote(row[ia], row[ib], row[iref])
+        except IndexError:
+            yield lineno, RecordError("missing column")
+        except RecordError as e:
+            yield lineno, e
+
+
+# ── ingestion ------------------------------------------------------------------
+def ingest(blockchain, stream, fmt: str = "ndjson", chunk_size: int = INGEST_CHUNK,
+           on_accept: Callable[[List[str]], None] | None = None,
+           errors_only: bool = False) -> Iterator[Dict]:
+    """
+    Validate and add every record in `stream` to the mempool.
+
+    Args:
+        blockchain: The Blockchain whose mempool receives the votes
+        stream: Binary file‑like object with readline()
+        fmt: "ndjson" or "csv"
+        chunk_size: Records per add_transactions() batch
+        on_accept: Called with the tx IDs accepted from each chunk
+            (e.g. to announce them and wake the miner)
+        errors_only: Yield only rejected records and the summary
+
+    Yields:
+        {"line": n, "tx_id": ...} per accepted record,
+        {"line": n, "error": ...} per rejected one, then
+        {"accepted": count, "rejected": count}
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}; expected one of {FORMATS}")
+    parse = parse_ndjson if fmt == "ndjson" else parse_csv
+    accepted = rejected = 0
+    chunk: List[Tuple[int, Dict]] = []
+    errors: List[Dict] = []
+
+    def flush():
+        nonlocal accepted, rejected
+        results = blockchain.add_transactions([tx for _, tx in chunk]) if chunk else []
+        out, ok = [], []
+        for (lineno, _), (tx_id, error) in zip(chunk, results):
+            if error is None:
+                ok.append(tx_id)
+                if not errors_only:
+                    out.append({"line": lineno, "tx_id": tx_id})
+            else:
+                out.append({"line": lineno, "error": error})
+        accepted += len(ok)
+        rejected += len(chunk) - len(ok) + len(errors)
+        out.extend(errors)
+        out.sort(key=lambda r: r["line"])
+        chunk.clear()
+        errors.clear()
+        if ok and on_accept is not None:
+            on_accept(ok)
+        return out
+
+    for lineno, item in parse(read_lines(stream)):
+        if item is None:
+            continue
+        if isinstance(item, RecordError):
+            errors.append({"line": lineno, "error": str(item)})
+        else:
+            chunk.append((lineno, item))
+        if len(chunk) + len(errors) >= chunk_size:
+            yield from flush()
+    yield from flush()
+    yield {"accepted": accepted, "rejected": rejected}
@@ -0,0 +1,140 @@
+# Seen-inventory cache for block and transaction hashes
+# Lets a node remember what it has already processed so duplicate
+# announcements are dropped before any JSON → Block conversion.
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over hex digests.
+
+    Keys are already SHA-256 hex strings, so the k bit positions are sliced
+    straight out of the digest instead of re-hashing (other strings are
+    hashed once first). The slices come from the tail: block hashes start
+    with proof-of-work zeros, so their leading digits barely vary.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        Args:
+            capacity: Expected number of distinct keys
+            error_rate: Target false-positive probability at `capacity`
+        """
+        bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.size = max(8, bits)
+        self.k = max(1, min(8, round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = key if len(key) >= 64 else hashlib.sha256(key.encode()).hexdigest()
+        end = len(digest)
+        for i in range(self.k):
+            yield int(digest[end - (i + 1) * 8:end - i * 8], 16) % self.size
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7))
+                   for pos in self._positions(key))
+
+
+class SeenCache:
+    """
+    Bounded LRU of recently seen hashes with an optional Bloom filter
+    behind it.
+
+    The LRU answers exactly for the most recent `capacity` keys. When
+    `bloom_capacity` is set, every key is also added to a Bloom filter so
+    keys that have aged out of the LRU are still recognised (with the
+    filter's false-positive rate). The filter is rotated every
+    `bloom_capacity` insertions: the previous one is kept for lookups, so
+    it never fills past its design rate and remembers at least the last
+    `bloom_capacity` keys. A Bloom hit is still only probable; callers for
+    which a false positive matters must confirm it. Thread-safe.
+    """
+
+    def __init__(self, capacity: int = 4096, bloom_capacity: int = 0,
+                 bloom_error_rate: float = 0.001):
+        self.capacity = capacity
+        self._entries: OrderedDict[str, None] = OrderedDict()
+        self._bloom_capacity = bloom_capacity
+        self._bloom_error_rate = bloom_error_rate
+        self._bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity else None
+        self._old_bloom: BloomFilter | None = None
+        self._bloom_count = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bloom_hits = 0
+
+    def _lookup(self, key: str) -> bool:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+        if self._bloom is not None and (key in self._bloom or
+                                        (self._old_bloom is not None and key in self._old_bloom)):
+            self.hits += 1
+            self.bloom_hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def _insert(self, key: str) -> None:
+        self._entries[key] = None
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        if self._bloom is not None:
+            if self._bloom_count >= self._bloom_capacity:
+                self._old_bloom = self._bloom
+                self._bloom = BloomFilter(self._bloom_capacity, self._bloom_error_rate)
+                self._bloom_count = 0
+            self._bloom.add(key)
+            self._bloom_count += 1
+
+    def seen(self, key: str) -> bool:
+        """Return True if `key` was seen before (counts a hit or miss)."""
+        with self._lock:
+            return self._lookup(key)
+
+    def add(self, key: str) -> None:
+        """Record `key` as seen without touching the counters."""
+        with self._lock:
+            self._insert(key)
+
+    def check_and_add(self, key: str) -> bool:
+        """
+        Atomically test and record `key`.
+
+        Returns:
+            bool: True if `key` had already been seen (a duplicate)
+        """
+        with self._lock:
+            if self._lookup(key):
+                return True
+            self._insert(key)
+            return False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size, e.g. for a status route."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size":       len(self._entries),
+                "capacity":   self.capacity,
+                "bloom":      self._bloom is not None,
+                "hits":       self.hits,
+                "misses":     self.misses,
+                "bloom_hits": self.bloom_hits,
+                "hit_rate":   self.hits / total if total else 0.0
+            }
@@ -0,0 +1,311 @@
+# Low‑overhead metrics in the Prometheus text format
+# Counters, gauges and fixed‑bucket histograms kept in one process‑wide
+# REGISTRY, cheap enough for hot paths like message dispatch and relay.
+# Nothing is formatted until something scrapes render(): the node serves
+# it on /metrics, and the tracker and headless nodes can serve it with
+# serve_metrics().
+#
+# Counters and histograms take no lock. Each thread adds into its own
+# cell (ThreadTotals), so no update is ever lost, and a scrape sums the
+# cells; a thread's cell is folded into a base total when it exits. A lock
+# here would cost several times the update itself.
+#
+# A labelled metric hands out one child per label value; callers on hot
+# paths keep the child instead of looking it up on every update.
+
+import itertools
+import threading
+import weakref
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# default buckets, in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ── per-thread totals --------------------------------------------------------------
+class _Token:
+    """Lives in one thread's locals; its finalizer runs when the thread exits."""
+
+
+class ThreadTotals:
+    """
+    Running totals that threads add into without a lock. cell() is the
+    calling thread's own list: `width` numbers to add into, then `extra`
+    (whatever a caller wants kept next to them). When the thread exits,
+    its numbers are folded into a base total, so there is never more than
+    one cell per live thread however many threads come and go.
+    """
+
+    def __init__(self, width: int, extra: Sequence = ()):
+        self.width = width
+        self.extra = list(extra)
+        self._base = [0] * width
+        self._cells: Dict[int, list] = {}       # live thread's key ➜ its cell
+        self._keys = itertools.count()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def cell(self) -> list:
+        try:
+            return self._local.cell
+        except AttributeError:
+            pass
+        cell = [0] * self.width + self.extra
+        token, key = _Token(), next(self._keys)
+        with self._lock:
+            self._cells[key] = cell
+        self._local.cell, self._local.token = cell, token
+        weakref.finalize(token, self._fold, key)
+        return cell
+
+    def _fold(self, key: int) -> None:
+        with self._lock:
+            cell = self._cells.pop(key)
+            for i in range(self.width):
+                self._base[i] += cell[i]
+
+    def totals(self) -> list:
+        """The base plus every live thread's numbers, slot by slot."""
+        with self._lock:
+            totals = list(self._base)
+            for cell in self._cells.values():
+                for i in range(self.width):
+                    totals[i] += cell[i]
+        return totals
+
+    def total(self, i: int) -> float:
+        """Slot i of totals()."""
+        with self._lock:
+            return self._base[i] + sum(cell[i] for cell in self._cells.values())
+
+
+# ── metric types ---------------------------------------------------------------
+class _Metric:
+    """Shared parts: name, help, label names and the per‑label children."""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> "_Metric":
+        """The child for one combination of label values (created on first use)."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self) -> "_Metric":
+        return type(self)(self.name, self.documentation)
+
+    def _series(self) -> List[Tuple[str, str, float]]:
+        """(suffix, label text, value) for every sample of this metric."""
+        if not self.labelnames:
+            return self._samples(())
+        series = []
+        for key, child in sorted(self._children.items()):
+            series.extend(child._samples(key, self.labelnames))
+        return series
+
+    def _samples(self, key, names=()) -> List[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{suffix}{labels} {_number(value)}"
+                     for suffix, labels, value in self._series())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._totals = ThreadTotals(1)
+        self._function: Callable[[], float] | None = None
+
+    def inc(self, amount: float = 1) -> None:
+        self._totals.cell()[0] += amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Report function() instead of the stored count: for a hot path
+        that keeps its own totals and would rather not call inc()."""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._totals.total(0)
+
+    def _samples(self, key, names=()):
+        return [("", _label_text(names, key), self.value)]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Report function() instead of a stored value (e.g. a queue length)."""
+        self._function = function
+
+    def get(self) -> float:
+        if self._function is not None:
+            try:
+                return self._function()
+            except Exception:
+                return float("nan")
+        return self.value
+
+    def _samples(self, key, names=()):
+        return [("", _label_text(names, key), self.get())]
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed, cumulative upper‑bound buckets."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per bucket counts, the last one for +Inf, then the sum
+        self._totals = ThreadTotals(len(self.buckets) + 2)
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        cell = self._totals.cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Non‑cumulative bucket counts (last is +Inf) and the sum."""
+        totals = self._totals.totals()
+        return totals[:-1], float(totals[-1])
+
+    def _samples(self, key, names=()):
+        counts, total = self.snapshot()
+        samples, cumulative = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            samples.append(("_bucket", _label_text(names, key, f'le="{_number(bound)}"'), cumulative))
+        samples.append(("_sum", _label_text(names, key), total))
+        samples.append(("_count", _label_text(names, key), cumulative))
+        return samples
+
+
+# ── registry -------------------------------------------------------------------
+class Registry:
+    """
+    Named metrics of one process. The factories are get‑or‑create, so any
+    module can declare the metric it updates without import‑order worries.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already registered with another type or labels")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ── standalone exporter ---------------------------------------------------------
+def serve_metrics(port: int, registry: Registry = REGISTRY, host: str = "") -> ThreadingHTTPServer:
+    """
+    Serve registry.render() on http://host:port/metrics from a daemon
+    thread, for processes without a web UI (the tracker, headless nodes).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,240 @@
+# Network emulation for the tracker relay (--emulate)
+# Frames the tracker relays from one peer to another are held back as if
+# they had crossed a real link between the two: propagation latency plus
+# jitter, and a bandwidth cap that serializes frames on the link. Each
+# directed link is a FIFO delay queue, so frames never overtake each
+# other on it (as on a TCP connection) and an INV queued behind a large
+# block waits for the block. Scheduled partitions drop every frame
+# between the sides, including frames still in flight, until they heal.
+#
+# Link parameters come from a JSON config, or from the costs in a
+# topology file (parse_topology): a pair's latency is its shortest path
+# cost times ms_per_cost, so peers without a direct link pay for the hops.
+# Tracker‑originated frames (rosters, PINGs) are not delayed.
+#
+#   {"default":    {"latency_ms": 20, "jitter_ms": 5, "bandwidth_kbps": 8000},
+#    "topology":   "topology.dat", "ms_per_cost": 10,
+#    "links":      {"A-B": {"latency_ms": 120}, "C>D": {"bandwidth_kbps": 256}},
+#    "partitions": [{"at": 30, "heal": 60, "groups": [["A", "B"], ["C"]]}],
+#    "seed": 1}
+#
+# "A-B" sets both directions, "C>D" only C to D. Partition times are
+# seconds after the emulator starts; peers not named in any group form
+# one more group together.
+
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+
+from metrics import REGISTRY
+from network import check_topology_format, parse_topology, network_log
+
+DEFAULT_LINK = {"latency_ms": 0.0, "jitter_ms": 0.0, "bandwidth_kbps": 0.0}   # 0 = unlimited
+MS_PER_COST = 10.0            # latency per unit of topology cost
+DELAY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Link:
+    """One directed link: its parameters and when it is next free."""
+    __slots__ = ("latency", "jitter", "bandwidth", "free_at", "last_arrival")
+
+    def __init__(self, latency_ms: float, jitter_ms: float, bandwidth_kbps: float):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.bandwidth = bandwidth_kbps * 1000 / 8          # bytes per second
+        self.free_at = 0.0          # end of the last frame's transmission
+        self.last_arrival = 0.0     # FIFO: nothing arrives before this
+
+    def arrival(self, now: float, size: int, rng: random.Random) -> float:
+        """Queue a frame of `size` bytes sent at `now`; returns when it arrives."""
+        start = max(now, self.free_at)
+        self.free_at = start + (size / self.bandwidth if self.bandwidth else 0.0)
+        delay = self.latency + (rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        self.last_arrival = max(self.free_at + max(0.0, delay), self.last_arrival)
+        return self.last_arrival
+
+
+class LinkEmulator:
+    """
+    Delay queues for every (sender, recipient) pair the tracker relays
+    between. schedule() is called by the relay; due frames are handed to
+    a deliver callback by run() (threaded Tracker) or collected with
+    pop_due() by an event loop (SelectorTracker).
+    """
+
+    def __init__(self, default: dict | None = None, links: dict | None = None,
+                 path_costs: dict[str, dict[str, int]] | None = None, ms_per_cost: float = MS_PER_COST,
+                 partitions: list | None = None, seed: int | None = None):
+        """
+        Parameters:
+            default : dict | None
+                latency_ms / jitter_ms / bandwidth_kbps for any link not
+                otherwise configured.
+            links : dict | None
+                (src, dst) ➜ overrides for that directed link.
+            path_costs : dict | None
+                Shortest path cost between topology nodes; a pair in it
+                gets latency_ms = cost * ms_per_cost.
+            partitions : list | None
+                {"at", "heal", "groups"} entries (seconds from now).
+        """
+        self.default = {**DEFAULT_LINK, **(default or {})}
+        self.overrides = links or {}
+        self.path_costs = path_costs or {}
+        self.ms_per_cost = ms_per_cost
+        self.rng = random.Random(seed)
+        self.started = time.monotonic()
+        self.partitions = sorted(partitions or [], key=lambda p: p["at"])
+        self._links: dict[tuple[str, str], Link] = {}
+        self._queue: list = []                    # (arrival, seq, src, dst, peer, frame)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._cut: dict[str, int] | None = None   # node ➜ side while partitioned
+        self._cut_label = None
+        self.delay = REGISTRY.histogram("tracker_emulated_delay_seconds",
+                                        "Delay added to relayed frames by link emulation",
+                                        buckets=DELAY_BUCKETS)
+        self.dropped = REGISTRY.counter("tracker_emulated_dropped_total",
+                                        "Relayed frames dropped by an emulated partition")
+
+    # ── construction ------------------------------------------------------------
+    @classmethod
+    def from_config(cls, config: dict | str, ms_per_cost: float = MS_PER_COST) -> "LinkEmulator":
+        """
+        Build from a config dict, the path of a JSON config (format above),
+        or the path of a topology file (its costs times ms_per_cost).
+        """
+        if isinstance(config, str) and not config.endswith(".json"):
+            config = {"topology": config, "ms_per_cost": ms_per_cost}
+        elif isinstance(config, str):
+            with open(config) as f:
+                config = json.load(f)
+        links = {}
+        for spec, params in config.get("links", {}).items():
+            if ">" in spec:
+                src, dst = spec.split(">")
+                links[(src, dst)] = params
+            else:
+                a, b = spec.split("-")
+                links[(a, b)] = links[(b, a)] = params
+        costs = None
+        if config.get("topology"):
+            check_topology_format(config["topology"])
+            costs = path_costs(parse_topology(config["topology"]))
+        return cls(config.get("default"), links, costs, config.get("ms_per_cost", MS_PER_COST),
+                   config.get("partitions"), config.get("seed"))
+
+    def link(self, src: str, dst: str) -> Link:
+        found = self._links.get((src, dst))
+        if found is None:
+            params = dict(self.default)
+            cost = self.path_costs.get(src, {}).get(dst)
+            if cost is not None:
+                params["latency_ms"] = cost * self.ms_per_cost
+            params.update(self.overrides.get((src, dst), {}))
+            found = self._links[(src, dst)] = Link(params["latency_ms"], params["jitter_ms"],
+                                                   params["bandwidth_kbps"])
+        return found
+
+    # ── partitions ---------------------------------------------------------------
+    def partition(self, groups: list[list[str]], duration: float | None = None) -> None:
+        """Split the network now (until heal(), or for `duration` seconds)."""
+        at = time.monotonic() - self.started
+        with self._cond:
+            self.partitions = sorted(self.partitions + [
+                {"at": at, "heal": at + duration if duration else float("inf"), "groups": groups}],
+                key=lambda p: p["at"])
+
+    def heal(self) -> None:
+        """End every partition that is in effect now."""
+        at = time.monotonic() - self.started
+        with self._cond:
+            self.partitions = [dict(p, heal=min(p.get("heal", float("inf")), at))
+                               if p["at"] <= at else p for p in self.partitions]
+
+    def _sides(self, now: float) -> dict[str, int] | None:
+        """node ➜ group index for the partition in effect at `now` (None: none)."""
+        at = now - self.started
+        current = None
+        for p in self.partitions:
+            if p["at"] <= at < p.get("heal", float("inf")):
+                current = p
+        if current is not self._cut_label:
+            self._cut_label = current
+            self._cut = ({nid: i for i, group in enumerate(current["groups"]) for nid in group}
+                         if current else None)
+            network_log(f"emulated partition {current['groups']}" if current
+                        else "emulated partition healed")
+        return self._cut
+
+    def reachable(self, src: str, dst: str, now: float) -> bool:
+        sides = self._sides(now)
+        if sides is None:
+            return True
+        rest = len(self._cut_label["groups"])
+        return sides.get(src, rest) == sides.get(dst, rest)
+
+    # ── relay -----------------------------------------------------------------------
+    def schedule(self, src: str, dst: str, peer, frame: bytes) -> bool:
+        """Queue a relayed frame on the src ➜ dst link; False if a partition drops it."""
+        now = time.monotonic()
+        with self._cond:
+            if not self.reachable(src, dst, now):
+                self.dropped.inc()
+                return False
+            arrival = self.link(src, dst).arrival(now, len(frame), self.rng)
+            self.delay.observe(arrival - now)
+            heapq.heappush(self._queue, (arrival, next(self._seq), src, dst, peer, frame))
+            self._cond.notify()
+        return True
+
+    def next_due(self) -> float | None:
+        """Seconds until the next frame is due (None: nothing queued)."""
+        with self._cond:
+            return max(0.0, self._queue[0][0] - time.monotonic()) if self._queue else None
+
+    def pop_due(self) -> list[tuple]:
+        """(peer, frame) for every frame whose arrival time has passed."""
+        out = []
+        now = time.monotonic()
+        with self._cond:
+            while self._queue and self._queue[0][0] <= now:
+                _, _, src, dst, peer, frame = heapq.heappop(self._queue)
+                if self.reachable(src, dst, now):
+                    out.append((peer, frame))
+                else:
+                    self.dropped.inc()
+        return out
+
+    def run(self, deliver) -> None:
+        """Deliver due frames with deliver(peer, frame) forever (a daemon thread)."""
+        while True:
+            with self._cond:
+                wait = max(0.0, self._queue[0][0] - time.monotonic()) if self._queue else None
+                # wake for scheduled partitions too, so they are logged on time
+                self._cond.wait(min(wait, 1.0) if wait is not None else 1.0)
+            for peer, frame in self.pop_due():
+                deliver(peer, frame)
+
+
+def path_costs(topology: dict) -> dict[str, dict[str, int]]:
+    """All‑pairs shortest path costs over a parse_topology() graph (Dijkstra from each node)."""
+    graph = {nid: dict(node.costs) for nid, node in topology.items()}
+    costs = {}
+    for source in graph:
+        dist = {source: 0}
+        heap = [(0, source)]
+        while heap:
+            d, nid = heapq.heappop(heap)
+            if d > dist.get(nid, float("inf")):
+                continue
+            for other, c in graph.get(nid, {}).items():
+                if d + c < dist.get(other, float("inf")):
+                    dist[other] = d + c
+                    heapq.heappush(heap, (d + c, other))
+        del dist[source]
+        costs[source] = dist
+    return costs
@@ -1,12 +1,69 @@
 import socket
+import selectors
 import threading
+import argparse
+import queue
 import sys
 import time
 import json
 
+from inventory import SeenCache
+from LinkedList import HeaderChain, Blockchain, load_genesis
+from metrics import REGISTRY, ThreadTotals, serve_metrics
+
 # ───────────────────────── Tracker globals & helpers ─────────────────────────
 
 LOG_LEVEL  = "INFO"
+ROUTING_KEYS = ("type", "src", "dst")
+PEEK_BYTES   = 256          # routing fields are expected within this prefix
+_json_decoder = json.JSONDecoder()
+
+MAX_FRAME_TYPES = 64        # frame types counted separately; the rest share "other"
+FRAME_SAMPLE = 16           # frames per type and thread for each size histogram sample
+FRAME_SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)
+
+
+def peek_routing(data: bytes) -> dict:
+    """
+    Read only the routing fields (`type`, `src`, `dst`) of a JSON frame.
+
+    Every sender puts those keys first, so scanning the top‑level keys of
+    the first PEEK_BYTES bytes is enough and the (possibly multi‑megabyte)
+    rest of the frame is never decoded. Falls back to a full json.loads if
+    the fields aren't all found in the prefix.
+
+    Raises:
+        json.JSONDecodeError: If the frame isn't valid JSON, or a routing
+            field is neither a string nor null
+    """
+    head = data[:PEEK_BYTES].decode("utf-8", errors="ignore")
+    found = {}
+    try:
+        idx = head.index("{") + 1
+        while len(found) < len(ROUTING_KEYS):
+            while head[idx] in " \t\r\n,":
+                idx += 1
+            if head[idx] != '"':
+                break
+            key, idx = json.decoder.scanstring(head, idx + 1)
+            idx = head.index(":", idx) + 1
+            while head[idx] in " \t\r\n":
+                idx += 1
+            value, idx = _json_decoder.raw_decode(head, idx)
+            if key in ROUTING_KEYS:
+                found[key] = value
+    except (ValueError, IndexError):
+        pass
+
+    if len(found) < len(ROUTING_KEYS):
+        msg = json.loads(data)
+        if not isinstance(msg, dict):
+            raise json.JSONDecodeError("frame is not a JSON object", head, 0)
+        found = {k: msg.get(k) for k in ROUTING_KEYS}
+    for key, value in found.items():
+        if value is not None and not isinstance(value, str):
+            raise json.JSONDecodeError(f"routing field {key!r} is not a string", head, 0)
+    return found
 
 class Node:
     """
@@ -19,143 +76,763 @@ class Node:
         Constructor for the Node class.
         
         Parameters:
-            node_id : str
-                Unique identifier for the node in the network.
+            node_id : str | None
+                Unique identifier for the node in the network (None for a
+                tracker connection until its REGISTER arrives).
         """
         self.node_id = node_id
         self.port = None
         self.connection = None
         self.connection_lock = None
-        self.node_id = None     # assigned after REGISTER
-        self.neighbors: list[str] = []   # list of current peer IDs (no costs)
+        self.neighbors: list[str] = []   # current neighbor IDs
+        self.costs: dict[str, int] = {}  # neighbor ID ➜ link cost (topology only)
+        self.listen_addr: list | None = None   # [host, port] for direct peer links
+        self.tracker_id: str | None = None     # set if this connection is a federated tracker
+        self.light = False                     # header‑only client: kept out of the roster
+        # per-connection buffers, only used by SelectorTracker
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        # outgoing frames drained by a writer thread (threaded Tracker)
+        self.send_queue: queue.Queue | None = None
+        self.queued = 0                   # bytes waiting in send_queue
+        # liveness: monotonic time of the last frame received
+        self.last_seen = time.monotonic()
+        self.evicted = False
 
     def add_neighbor(self, neighbor_id, cost=None):
         """
         Add a neighbor ID to this node’s neighbor list (ignores self &
-        avoids duplicates). `cost` is unused and kept for signature
-        compatibility.
+        avoids duplicates), recording the link cost when one is given.
         """
         if neighbor_id != self.node_id and neighbor_id not in self.neighbors:
             self.neighbors.append(neighbor_id)
+        if cost is not None:
+            self.costs[neighbor_id] = int(cost)
 
     def __repr__(self):
         return f"Node {self.node_id}. Neighbors: {self.neighbors}. Port: {self.port}."
 
+# ───────────────────────── Topology spanning tree ─────────────────────────
+class SpanningTree:
+    """
+    Minimum‑cost spanning forest over the live peers of a weighted
+    topology (as loaded by parse_topology). Broadcasts follow the tree
+    edges: each node relays to its tree neighbors except the one the
+    message came from.
+
+    Updates are incremental: a join runs Kruskal over the current tree
+    edges plus the newcomer's links, and a leave keeps the surviving tree
+    edges and only adds the cheapest links needed to reconnect the pieces.
+    """
+
+    def __init__(self, topology: dict[str, Node]):
+        self.graph = {nid: dict(node.costs) for nid, node in topology.items()}
+        self.live: set[str] = set()
+        self.adj: dict[str, dict[str, int]] = {}   # tree edges, both directions
+        self._root: dict[str, str] = {}            # union‑find parents
+
+    def _find(self, nid: str) -> str:
+        while self._root[nid] != nid:
+            self._root[nid] = self._root[self._root[nid]]
+            nid = self._root[nid]
+        return nid
+
+    def _kruskal(self, kept: list, candidates: list) -> None:
+        """Rebuild self.adj from `kept` edges plus the cheapest `candidates`."""
+        self._root = {nid: nid for nid in self.live}
+        self.adj = {nid: {} for nid in self.live}
+        for cost, a, b in kept + sorted(candidates):
+            ra, rb = self._find(a), self._find(b)
+            if ra != rb:
+                self._root[ra] = rb
+                self.adj[a][b] = cost
+                self.adj[b][a] = cost
+
+    def _tree_edges(self) -> list:
+        return [(c, a, b) for a, nbrs in self.adj.items() for b, c in nbrs.items() if a < b]
+
+    def add(self, nid: str) -> None:
+        if nid in self.live:
+            return
+        self.live.add(nid)
+        links = [(c, nid, other) for other, c in self.graph.get(nid, {}).items()
+                 if other in self.live]
+        # MST(G + v) only uses edges of the old tree or edges touching v
+        self._kruskal([], self._tree_edges() + links)
+
+    def remove(self, nid: str) -> None:
+        if nid not in self.live:
+            return
+        self.live.discard(nid)
+        kept = [(c, a, b) for c, a, b in self._tree_edges() if nid not in (a, b)]
+        tree = {(a, b) for _, a, b in kept}
+        candidates = [(c, a, b) for a in self.live for b, c in self.graph.get(a, {}).items()
+                      if a < b and b in self.live and (a, b) not in tree]
+        self._kruskal(kept, candidates)
+
+    def neighbors(self, nid: str) -> list[str]:
+        return list(self.adj.get(nid, {}))
+
+    def connected(self, a: str, b: str) -> bool:
+        return a in self._root and b in self._root and self._find(a) == self._find(b)
+
+    def edges(self) -> list[list]:
+        return [[a, b, c] for c, a, b in self._tree_edges()]
+
+    def cost(self) -> int:
+        return sum(c for c, _, _ in self._tree_edges())
+
 # ────────────────────────────── Tracker class ──────────────────────────────
 class Tracker:
     """
     Single‑instance tracker that maintains the live roster of peers and
     broadcasts updates. It wraps all previous global state in one place.
     """
-    def __init__(self, port: int, difficulty: int = 3, genesis_hash: str | None = None):
+    def __init__(self, port: int, difficulty: int = 3, genesis_hash: str | None = None,
+                 genesis: dict | None = None,
+                 topology: str | None = None, header_cache: bool = False,
+                 heartbeat_interval: float = 10.0, heartbeat_timeout: float = 30.0,
+                 send_hwm: int = 4 << 20, emulator=None):
         self.port           = port
         self.difficulty     = difficulty
-        self.genesis_hash   = genesis_hash or ("0" * 64)
+        # genesis block handed to every node in its first PEER_LIST, so the
+        # whole network shares one chain root (None: nodes use the built‑in one)
+        self.genesis        = genesis
+        self.genesis_hash   = (Blockchain.genesis_from_dict(genesis).hash if genesis
+                               else genesis_hash)
         self.peers: dict[str, Node] = {}          # node_id ➜ Node
-        self.lock = threading.Lock()              # protects self.peers
+        self.epoch = 0                            # bumped on every join/leave
+        self.lock = threading.RLock()             # protects self.peers / epoch
         self.server_socket: socket.socket | None = None
 
+        # liveness: PING every peer each heartbeat_interval seconds (0 = off)
+        # and evict peers silent for heartbeat_timeout or whose unsent data
+        # passes send_hwm bytes, so one hung peer can't soak up the relay
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout  = heartbeat_timeout
+        self.send_hwm           = send_hwm
+
+        # optional topology mode: broadcasts follow a min‑cost spanning tree
+        self.tree: SpanningTree | None = None
+        if topology:
+            check_topology_format(topology)
+            self.tree = SpanningTree(parse_topology(topology))
+
+        # optional header cache: built from the HEADERS frames we relay so
+        # joining nodes get the header chain without asking a peer
+        self.headers: HeaderChain | None = HeaderChain(self.genesis_hash) if header_cache else None
+        self.header_source: str | None = None     # peer that supplied the tip
+        self._header_requests = SeenCache(256)
+
+        # optional link emulation (netem.LinkEmulator): relayed frames are
+        # delivered after per‑link latency / bandwidth delays, or dropped
+        # across a partition
+        self.emulator = emulator
+
+        # relay metrics (--metrics-port), registered here so that nodes,
+        # which import this module too, don't export them. Every frame
+        # received and relayed is added into a plain per-thread cell that
+        # the counters sum at scrape time; the size histogram takes one
+        # frame in FRAME_SAMPLE per type and thread. Metric calls on every
+        # frame cost more than the 2% the relay path allows.
+        self.frames = REGISTRY.counter("tracker_frames_received_total",
+                                       "Frames received from peers, by type", ["type"])
+        self.frame_bytes_total = REGISTRY.counter("tracker_frame_bytes_received_total",
+                                                  "Frame bytes received from peers, by type",
+                                                  ["type"])
+        self.frame_bytes = REGISTRY.histogram("tracker_frame_bytes",
+                                              f"Sizes of one frame in {FRAME_SAMPLE} received "
+                                              "from peers, by type",
+                                              ["type"], buckets=FRAME_SIZE_BUCKETS)
+        self.relayed = REGISTRY.counter("tracker_frames_relayed_total",
+                                        "Peer frames relayed (one per recipient)")
+        self.relayed_bytes = REGISTRY.counter("tracker_bytes_relayed_total",
+                                              "Peer frame bytes relayed (all recipients)")
+        self.evictions = REGISTRY.counter("tracker_evictions_total",
+                                          "Peers evicted (silent or over the send HWM)")
+        REGISTRY.gauge("tracker_peers", "Peers connected to this tracker").set_function(
+            lambda: len(self.peers))
+        # type ➜ per-thread [frames, bytes, histogram] cells,
+        # and per-thread [frames, bytes] relayed
+        self._frame_totals: dict[str, ThreadTotals] = {}
+        self._relay_totals = ThreadTotals(2)
+        self._totals_lock = threading.Lock()
+        self._local = threading.local()     # this thread's {type: cell} and relay cell
+        self.relayed.set_function(lambda: self._relay_totals.total(0))
+        self.relayed_bytes.set_function(lambda: self._relay_totals.total(1))
+
     # ── helper -------------------------------------------------------------
+    def _count_frame(self, ftype, size: int) -> None:
+        try:
+            cell = self._local.frames[ftype]
+        except (AttributeError, KeyError):
+            cell = self._frame_cell(ftype)
+        count = cell[0] = cell[0] + 1
+        cell[1] += size
+        if count % FRAME_SAMPLE == 1:
+            cell[2].observe(size)
+
+    def _frame_cell(self, ftype) -> list:
+        """This thread's _count_frame() cell for a frame type, created on first use."""
+        cells = getattr(self._local, "frames", None)
+        if cells is None:
+            cells = self._local.frames = {}
+        name = str(ftype)
+        if name not in self._frame_totals and len(self._frame_totals) >= MAX_FRAME_TYPES:
+            name = "other"
+        cell = cells.get(name)
+        if cell is None:
+            with self._totals_lock:
+                totals = self._frame_totals.get(name)
+                if totals is None:
+                    totals = self._frame_totals[name] = ThreadTotals(
+                        2, (self.frame_bytes.labels(name),))
+                    self.frames.labels(name).set_function(lambda: totals.total(0))
+                    self.frame_bytes_total.labels(name).set_function(lambda: totals.total(1))
+            cell = cells[name] = totals.cell()
+        return cell
+
+    def _count_relay(self, copies: int, size: int) -> None:
+        try:
+            cell = self._local.relay
+        except AttributeError:
+            cell = self._local.relay = self._relay_totals.cell()
+        cell[0] += copies
+        cell[1] += copies * size
+
     @staticmethod
     def send_msg(sock: socket.socket, msg: dict) -> None:
+        sock.sendall(Tracker.encode_frame(msg))
+
+    @staticmethod
+    def _recv_exact(sock: socket.socket, n: int) -> bytes:
+        """Read exactly n bytes (b"" if the peer closed first)."""
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = sock.recv(n - len(buf))
+            if not chunk:
+                return b""
+            buf += chunk
+        return bytes(buf)
+
+    @staticmethod
+    def encode_frame(msg: dict) -> bytes:
         raw = json.dumps(msg, separators=(",", ":")).encode()
-        sock.sendall(len(raw).to_bytes(4, "big") + raw)
+        return len(raw).to_bytes(4, "big") + raw
+
+    def _send(self, peer: Node, msg: dict) -> None:
+        """Encode one tracker‑originated message and queue it for a peer."""
+        self._send_raw(peer, self.encode_frame(msg))
+
+    def _send_raw(self, peer: Node, frame: bytes) -> None:
+        """
+        Queue an already length‑prefixed frame for a peer. The peer's
+        writer thread does the blocking sendall, so a slow peer only
+        backs up its own queue (overridden by SelectorTracker).
+        """
+        if peer.send_queue is None:
+            return
+        with peer.connection_lock:
+            overflow = peer.queued + len(frame) > self.send_hwm
+            if not overflow:
+                peer.queued += len(frame)
+        if overflow:
+            self._evict(peer, f"more than {self.send_hwm} bytes unsent")
+            return
+        peer.send_queue.put(frame)
+
+    def _writer_thread(self, node: Node):
+        while True:
+            frame = node.send_queue.get()
+            if frame is None:
+                break       # queued by _drop_peer after the last frame
+            try:
+                node.connection.sendall(frame)
+            except OSError:
+                break       # the reader thread notices and drops the peer
+            with node.connection_lock:
+                node.queued -= len(frame)
+        node.connection.close()
+
+    # ── liveness -----------------------------------------------------------
+    def _evict(self, peer: Node, reason: str) -> None:
+        """
+        Force a peer off. Shutting the socket down wakes both its reader
+        (which then runs _drop_peer) and a writer stuck in sendall
+        (overridden by SelectorTracker).
+        """
+        if peer.evicted:
+            return
+        peer.evicted = True
+        self.evictions.inc()
+        network_log(f"evicting {peer.node_id}: {reason}")
+        try:
+            peer.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _heartbeat(self) -> None:
+        """PING every peer and evict the ones that have gone quiet."""
+        now = time.monotonic()
+        with self.lock:
+            peers = list(self.peers.items())
+        for nid, peer in peers:
+            if now - peer.last_seen > self.heartbeat_timeout:
+                self._evict(peer, f"silent for {now - peer.last_seen:.0f}s")
+            else:
+                self._send(peer, {
+                    "type": "PING",
+                    "src":  "tracker",
+                    "dst":  nid,
+                    "ts":   time.time(),
+                    "payload": {}
+                })
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            time.sleep(self.heartbeat_interval)
+            self._heartbeat()
 
     # ── roster maintenance -------------------------------------------------
-    def _refresh_neighbor_lists(self):
-        ids = list(self.peers.keys())
-        for nid, peer in self.peers.items():
-            peer.neighbors = [other for other in ids
-                              if other != nid and other not in peer.neighbors]
-            # de‑duplicate in case topology + refresh overlap
-            peer.neighbors = list(dict.fromkeys(peer.neighbors))
-
-    def _broadcast_peer_list(self):
-        self._refresh_neighbor_lists()
-        roster_msg = {
+    # The roster is self.peers itself; each join/leave bumps self.epoch and
+    # sends one PEER_JOINED / PEER_LEFT delta per peer. Full PEER_LIST
+    # snapshots go only to a newly registered peer or to one that reports
+    # an epoch gap with GET_PEER_LIST. Deltas are queued while holding
+    # self.lock so every peer sees them in epoch order. Light clients still
+    # receive traffic but are never listed: they hold no blocks to sync from.
+    def _roster(self) -> tuple[list[str], dict]:
+        """Current node IDs and their direct‑link addresses. Caller holds self.lock."""
+        return ([nid for nid, p in self.peers.items() if not p.light],
+                {nid: p.listen_addr for nid, p in self.peers.items() if p.listen_addr and not p.light})
+
+    def _roster_msg(self, dst: str) -> dict:
+        nodes, addrs = self._roster()
+        return {
             "type": "PEER_LIST",
             "src":  "tracker",
-            "dst":  "*",
+            "dst":  dst,
             "ts":   time.time(),
-            "payload": { "nodes": list(self.peers.keys()) }
+            "payload": { "nodes": nodes, "epoch": self.epoch, "addrs": addrs }
         }
-        for peer in self.peers.values():
-            self.send_msg(peer.connection, roster_msg)
+
+    def _send_snapshot(self, peer: Node) -> None:
+        with self.lock:
+            self._send(peer, self._roster_msg(peer.node_id))
+
+    def _broadcast_delta(self, kind: str, node_id: str, addr: list | None = None) -> None:
+        """Send a PEER_JOINED / PEER_LEFT delta to every peer but `node_id`. Caller holds self.lock."""
+        payload = { "node_id": node_id, "epoch": self.epoch }
+        if addr:
+            payload["addr"] = addr
+        frame = self.encode_frame({
+            "type": kind,
+            "src":  "tracker",
+            "dst":  "*",
+            "ts":   time.time(),
+            "payload": payload
+        })
+        for nid, peer in list(self.peers.items()):
+            if nid != node_id:
+                self._send_raw(peer, frame)
+
+    def _register(self, node: Node, nid: str, listen: list | None = None) -> bool:
+        if listen:
+            # a blank/wildcard host means "the address you see me on"
+            host, port = listen
+            if host in ("", "0.0.0.0"):
+                host = node.connection.getpeername()[0]
+            node.listen_addr = [host, int(port)]
+        with self.lock:
+            old = self.peers.get(nid)
+            if old is not None:
+                # same ID reconnecting (e.g. after a half‑open drop): the
+                # new connection takes over and the old one is closed
+                # without a PEER_LEFT
+                self._evict(old, "replaced by a new connection")
+            node.node_id = nid
+            self.peers[nid] = node
+            if not node.light:
+                self.epoch += 1
+            welcome = self._roster_msg(nid)
+            if self.genesis is not None:
+                welcome["payload"]["genesis"] = self.genesis
+            if self.headers is not None and len(self.headers):
+                welcome["payload"]["headers"] = self.headers.headers_from(0)
+                welcome["payload"]["source"] = self._header_source(nid)
+            self._send(node, welcome)
+            if node.light:
+                return True
+            self._broadcast_delta("PEER_JOINED", nid, node.listen_addr)
+            if self.tree is not None:
+                self.tree.add(nid)
+                self._broadcast_tree()
+        return True
+
+    def _broadcast_tree(self) -> None:
+        """Send the current spanning tree to every peer. Caller holds self.lock."""
+        frame = self.encode_frame({
+            "type": "TREE",
+            "src":  "tracker",
+            "dst":  "*",
+            "ts":   time.time(),
+            "payload": { "edges": self.tree.edges() }
+        })
+        for nid, peer in self.peers.items():
+            peer.neighbors = self.tree.neighbors(nid)
+            self._send_raw(peer, frame)
+        network_log(f"spanning tree: {len(self.tree.live)} peers, total cost {self.tree.cost()}")
+
+    # ── header cache -------------------------------------------------------
+    def _header_source(self, exclude: str) -> str | None:
+        """A live peer other than `exclude` to fetch full blocks from."""
+        nodes = self._roster()[0]
+        if self.header_source in nodes and self.header_source != exclude:
+            return self.header_source
+        return next((n for n in nodes if n != exclude), None)
+
+    def _snoop_headers(self, node: Node, msg: dict) -> None:
+        headers = msg.get("headers") or []
+        result = self.headers.extend(headers)
+        if result:
+            self.header_source = node.node_id
+            network_log(f"header cache tip #{self.headers.tip()['index']} from {node.node_id}", "DEBUG")
+        elif result is None and not self._header_requests.check_and_add(headers[-1]["hash"]):
+            # gap or unknown fork point: fetch the missing headers from the sender
+            start = headers[0]["index"]
+            self._send(node, {
+                "type": "GET_HEADERS",
+                "src":  "tracker",
+                "dst":  node.node_id,
+                "ts":   time.time(),
+                "payload": { "from_index": len(self.headers) if start > len(self.headers) else 0 }
+            })
+
+    def _answer_headers(self, node: Node, msg: dict) -> None:
+        start = msg["payload"].get("from_index", 0)
+        if msg["payload"].get("from_hash"):
+            known = self.headers.index_of(msg["payload"]["from_hash"])
+            if known is not None:
+                start = known + 1       # resume right after the asker's tip
+        self._send(node, {
+            "type":    "HEADERS",
+            "src":     "tracker",
+            "dst":     node.node_id,
+            "ts":      time.time(),
+            "source":  self._header_source(node.node_id),
+            "headers": self.headers.headers_from(start)
+        })
 
     # ── message forwarding -------------------------------------------------
-    def _forward(self, msg: dict, sender: str) -> None:
-        dst = msg.get("dst", "*")
-        if dst in ("*", "broadcast"):
-            for nid, peer in self.peers.items():
-                if nid != sender:
-                    self.send_msg(peer.connection, msg)
-        elif dst in self.peers:
-            self.send_msg(self.peers[dst].connection, msg)
+    @staticmethod
+    def _light_only(route: dict, frame: bytes) -> bool:
+        """
+        True for a broadcast HEADERS frame its sender marked "linked": its
+        full peers have it over direct links already, and only light
+        clients, which have none, still need it from us.
+        """
+        return (route["type"] == "HEADERS" and route["dst"] in ("*", "broadcast")
+                and bool(json.loads(frame[4:]).get("linked")))
+
+    def _forward(self, frame: bytes, dst: str, sender: str, light_only: bool = False) -> None:
+        """Relay the original frame bytes unchanged; nothing is re‑encoded."""
+        if light_only:
+            targets = [peer for nid, peer in list(self.peers.items()) if peer.light and nid != sender]
+        elif dst in ("*", "broadcast") and self.tree is not None:
+            # first hop only: the sender's tree neighbors re‑relay further,
+            # peers outside the sender's tree component get it directly
+            targets = [peer for nid, peer in list(self.peers.items())
+                       if nid != sender and (nid in self.tree.adj.get(sender, ()) or
+                                             not self.tree.connected(nid, sender))]
+        elif dst in ("*", "broadcast"):
+            targets = [peer for nid, peer in list(self.peers.items()) if nid != sender]
+        else:
+            peer = self.peers.get(dst)
+            targets = [peer] if peer is not None else []
+        if self.emulator is not None:
+            for peer in targets:
+                self.emulator.schedule(sender, peer.node_id, peer, frame)
+        else:
+            for peer in targets:
+                self._send_raw(peer, frame)
+        if targets:
+            self._count_relay(len(targets), len(frame))
+
+    def _deliver(self, peer: Node, frame: bytes) -> None:
+        """Hand over a frame the emulator held back, unless the peer has left since."""
+        if self.peers.get(peer.node_id) is peer and not peer.evicted:
+            self._send_raw(peer, frame)
 
     def _drop_peer(self, node: Node):
-        """Remove peer on disconnect and broadcast new roster."""
+        """Remove peer on disconnect and tell the others it left."""
         with self.lock:
-            if node.node_id and node.node_id in self.peers:
+            if node.node_id and self.peers.get(node.node_id) is node:
                 del self.peers[node.node_id]
-        self._broadcast_peer_list()
+                if not node.light:
+                    self.epoch += 1
+                    self._broadcast_delta("PEER_LEFT", node.node_id)
+                    if self.tree is not None:
+                        self.tree.remove(node.node_id)
+                        self._broadcast_tree()
+        if node.send_queue is not None:
+            node.send_queue.put(None)
+
+    def _handle_frame(self, node: Node, frame: bytes) -> bool:
+        """
+        Act on one length‑prefixed frame from `node`. Shared by both
+        tracker modes; only the routing fields are parsed unless the frame
+        is a REGISTER. A frame that fails while being handled is logged
+        and closes only the sender's connection.
+
+        Returns:
+            bool: False if the connection should be closed
+        """
+        node.last_seen = time.monotonic()
+        try:
+            return self._dispatch_frame(node, frame)
+        except Exception as e:
+            network_log(f"closing {node.node_id or 'unregistered peer'}: "
+                        f"malformed frame ({type(e).__name__}: {e})")
+            return False
+
+    def _dispatch_frame(self, node: Node, frame: bytes) -> bool:
+        try:
+            route = peek_routing(frame[4:])
+        except json.JSONDecodeError:
+            return False
+        self._count_frame(route["type"], len(frame))
+
+        # first packet must be REGISTER
+        if node.node_id is None:
+            if route["type"] != "REGISTER":
+                return False
+            msg = json.loads(frame[4:])
+            node.light = bool(msg["payload"].get("light"))
+            return self._register(node, msg["payload"]["node_id"],
+                                  msg["payload"].get("listen"))
+
+        # graceful leave
+        if route["type"] == "LEAVE":
+            return False
+
+        # heartbeat reply; receiving it already refreshed last_seen
+        if route["type"] == "PONG":
+            return True
+
+        # peer missed a roster delta and wants a fresh snapshot
+        if route["type"] == "GET_PEER_LIST":
+            self._send_snapshot(node)
+            return True
+
+        # header cache: snoop relayed HEADERS, answer GET_HEADERS ourselves
+        if self.headers is not None:
+            if route["type"] == "HEADERS":
+                self._snoop_headers(node, json.loads(frame[4:]))
+                if route["dst"] == "tracker":
+                    return True
+            elif route["type"] == "GET_HEADERS" and route["dst"] == "tracker":
+                self._answer_headers(node, json.loads(frame[4:]))
+                return True
+
+        # all other traffic
+        self._forward(frame, route["dst"] or "*", sender=node.node_id,
+                      light_only=self._light_only(route, frame))
+        return True
 
     # ── per‑connection thread --------------------------------------------
     def _node_thread(self, node: Node):
-        while True:
-            try:
-                hdr = node.connection.recv(4)
-                if not hdr:
-                    break
-                data = node.connection.recv(int.from_bytes(hdr, "big"))
-                if not data:
+        try:
+            while True:
+                try:
+                    hdr = self._recv_exact(node.connection, 4)
+                    if not hdr:
+                        break
+                    data = self._recv_exact(node.connection, int.from_bytes(hdr, "big"))
+                    if not data:
+                        break
+                except OSError:
                     break
-                msg = json.loads(data)
-            except (ConnectionResetError, json.JSONDecodeError):
-                break
 
-            # first packet must be REGISTER
-            if node.node_id is None:
-                if msg.get("type") != "REGISTER":
+                if not self._handle_frame(node, hdr + data):
                     break
-                nid = msg["payload"]["node_id"]
-                with self.lock:
-                    if nid in self.peers:
-                        break  # duplicate ID
-                    node.node_id = nid
-                    self.peers[nid] = node
-                self._broadcast_peer_list()
-                continue
-
-            # graceful leave
-            if msg.get("type") == "LEAVE":
-                self._drop_peer(node)
-                return
-
-            # all other traffic
-            self._forward(msg, sender=node.node_id)
-
-        self._drop_peer(node)
+        finally:
+            self._drop_peer(node)   # the writer closes the socket once drained
 
     # ── main accept loop ---------------------------------------------------
-    def serve_forever(self):
+    def _listen(self) -> None:
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind(('', self.port))
-        self.server_socket.listen()
+        self.server_socket.listen(socket.SOMAXCONN)
+        self.port = self.server_socket.getsockname()[1]   # resolves port 0
         print(f"[tracker] Listening on 0.0.0.0:{self.port}")
 
+    def serve_forever(self):
+        self._listen()
+        if self.heartbeat_interval > 0:
+            threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+        if self.emulator is not None:
+            threading.Thread(target=self.emulator.run, args=(self._deliver,), daemon=True).start()
+
         try:
             while True:
                 conn, addr = self.server_socket.accept()
-                node = Node("temp")
+                node = Node(None)
                 node.connection = conn
                 node.connection_lock = threading.Lock()
+                node.send_queue = queue.Queue()
+                threading.Thread(target=self._writer_thread,
+                                 args=(node,),
+                                 daemon=True).start()
                 threading.Thread(target=self._node_thread,
                                  args=(node,),
                                  daemon=True).start()
         finally:
             self.server_socket.close()
 
+# ──────────────────────── Event‑loop tracker (selectors) ────────────────────────
+class SelectorTracker(Tracker):
+    """
+    Tracker that serves every peer from one thread using `selectors`
+    (epoll on Linux). Sockets are non‑blocking; each Node keeps its own
+    read buffer for partial frames and write buffer for data the kernel
+    hasn't accepted yet, so a stalled peer only grows its own buffer
+    instead of blocking the relay for everyone else.
+    """
+    RECV_CHUNK = 65536
+
+    def __init__(self, port: int, **kwargs):
+        super().__init__(port, **kwargs)
+        self.selector = selectors.DefaultSelector()
+        # peers whose socket failed mid‑send; closed once the current
+        # event is handled so a broadcast never re‑enters _drop_peer
+        self._dead: list[Node] = []
+
+    def _send_raw(self, peer: Node, frame: bytes) -> None:
+        """Append a frame to the peer's write buffer and try to flush it."""
+        if peer.connection is None or peer.evicted:
+            return
+        if len(peer.outbuf) + len(frame) > self.send_hwm:
+            self._evict(peer, f"more than {self.send_hwm} bytes unsent")
+            return
+        was_empty = not peer.outbuf
+        peer.outbuf += frame
+        if was_empty:
+            self._flush(peer)
+            if peer.outbuf and peer.connection is not None:
+                self.selector.modify(peer.connection,
+                                     selectors.EVENT_READ | selectors.EVENT_WRITE, peer)
+
+    def _flush(self, peer: Node) -> None:
+        try:
+            sent = peer.connection.send(peer.outbuf)
+        except BlockingIOError:
+            return
+        except OSError:
+            peer.outbuf.clear()
+            peer.evicted = True     # peer is gone; no need to log an eviction
+            self._dead.append(peer)
+            return
+        del peer.outbuf[:sent]
+
+    def _evict(self, peer: Node, reason: str) -> None:
+        """Queue the peer for closing once the current event is handled."""
+        if peer.evicted or peer.connection is None:
+            return
+        peer.evicted = True
+        self.evictions.inc()
+        network_log(f"evicting {peer.node_id}: {reason}")
+        self._dead.append(peer)
+
+    def _close(self, peer: Node) -> None:
+        if peer.connection is None:
+            return
+        try:
+            self.selector.unregister(peer.connection)
+        except (KeyError, ValueError):
+            pass
+        peer.connection.close()
+        peer.connection = None
+        peer.outbuf.clear()
+        self._drop_peer(peer)
+
+    def _reap(self) -> None:
+        while self._dead:
+            self._close(self._dead.pop())
+
+    def _accept(self) -> None:
+        try:
+            conn, addr = self.server_socket.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        node = Node(None)
+        node.connection = conn
+        self.selector.register(conn, selectors.EVENT_READ, node)
+
+    def _on_readable(self, node: Node) -> None:
+        try:
+            data = node.connection.recv(self.RECV_CHUNK)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close(node)
+            return
+
+        node.inbuf += data
+        while len(node.inbuf) >= 4:
+            size = int.from_bytes(node.inbuf[:4], "big")
+            if len(node.inbuf) < 4 + size:
+                break
+            frame = bytes(node.inbuf[:4 + size])
+            del node.inbuf[:4 + size]
+            if not self._handle_frame(node, frame):
+                self._close(node)
+                return
+
+    def _on_writable(self, node: Node) -> None:
+        self._flush(node)
+        if node.connection is not None and not node.outbuf:
+            self.selector.modify(node.connection, selectors.EVENT_READ, node)
+
+    def serve_forever(self):
+        self._listen()
+        self.server_socket.setblocking(False)
+        self.selector.register(self.server_socket, selectors.EVENT_READ, None)
+
+        tick = min(1.0, self.heartbeat_interval) if self.heartbeat_interval > 0 else 1.0
+        next_beat = time.monotonic() + self.heartbeat_interval
+        try:
+            while True:
+                if self.heartbeat_interval > 0 and time.monotonic() >= next_beat:
+                    next_beat = time.monotonic() + self.heartbeat_interval
+                    self._heartbeat()
+                    self._reap()
+                timeout = tick
+                if self.emulator is not None:
+                    due = self.emulator.next_due()
+                    if due is not None:
+                        timeout = min(tick, due)
+                for key, mask in self.selector.select(timeout=timeout):
+                    node = key.data
+                    if node is None:
+                        self._accept()
+                        continue
+                    if mask & selectors.EVENT_READ and node.connection is not None:
+                        self._on_readable(node)
+                    if mask & selectors.EVENT_WRITE and node.connection is not None:
+                        self._on_writable(node)
+                    self._reap()
+                if self.emulator is not None:
+                    for peer, frame in self.emulator.pop_due():
+                        self._deliver(peer, frame)
+                    self._reap()
+        finally:
+            self.selector.close()
+            self.server_socket.close()
+
 def check_topology_format(filename):
     """
     Validate the format of the topology file. Each line should contain two node IDs and a cost,
@@ -207,16 +884,16 @@ def parse_topology(filename):
                 cost = line.split()[2]
                 if node_id_a not in nodes:
                     new_node = Node(node_id_a)
-                    new_node.add_neighbor(node_id_b)
+                    new_node.add_neighbor(node_id_b, cost)
                     nodes[node_id_a] = new_node
                 else:
-                    nodes[node_id_a].add_neighbor(node_id_b)
+                    nodes[node_id_a].add_neighbor(node_id_b, cost)
                 if node_id_b not in nodes:
                     new_node = Node(node_id_b)
-                    new_node.add_neighbor(node_id_a)
+                    new_node.add_neighbor(node_id_a, cost)
                     nodes[node_id_b] = new_node
                 else:
-                    nodes[node_id_b].add_neighbor(node_id_a)
+                    nodes[node_id_b].add_neighbor(node_id_a, cost)
     return nodes
 
 
@@ -235,16 +912,60 @@ def network_log(message, level = "INFO"):
     elif level == "INFO" and LOG_LEVEL in ["INFO", "DEBUG"]:
         print(f"[network] {message}")
 
+TRACKER_MODES = {
+    "threaded":  Tracker,
+    "selectors": SelectorTracker,
+}
+
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print("Usage: python3 network.py <PORT>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Peer tracker")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--mode", choices=TRACKER_MODES, default="threaded",
+                        help="thread per peer, or a single selectors/epoll loop")
+    parser.add_argument("--topology", metavar="FILE",
+                        help="relay broadcasts along a min-cost spanning tree of FILE (e.g. topology.dat)")
+    parser.add_argument("--genesis", metavar="FILE",
+                        help="genesis block (JSON) to hand to every joining node")
+    parser.add_argument("--header-cache", action="store_true",
+                        help="keep relayed block headers and hand them to joining nodes")
+    parser.add_argument("--heartbeat", type=float, default=10.0, metavar="SECONDS",
+                        help="PING interval; 0 disables heartbeats")
+    parser.add_argument("--heartbeat-timeout", type=float, default=30.0, metavar="SECONDS",
+                        help="evict peers silent for this long")
+    parser.add_argument("--send-hwm", type=int, default=4 << 20, metavar="BYTES",
+                        help="evict peers with more than this much unsent data")
+    parser.add_argument("--federation", metavar="ID=HOST:PORT,...",
+                        help="run as one of several federated trackers (includes this one)")
+    parser.add_argument("--tracker-id", help="this tracker's ID in --federation")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve relay metrics on http://0.0.0.0:PORT/metrics")
+    parser.add_argument("--emulate", metavar="CONFIG",
+                        help="delay relayed frames per link (latency, jitter, bandwidth, "
+                             "partitions): a JSON config, or a topology file whose costs "
+                             "become latencies (see netem.py)")
+    parser.add_argument("--ms-per-cost", type=float, default=10.0, metavar="MS",
+                        help="link latency per unit of topology cost with --emulate FILE.dat")
+    args = parser.parse_args()
 
-    try:
-        PORT = int(sys.argv[1])
-        assert 1024 <= PORT <= 65535
-    except (ValueError, AssertionError):
+    if not 1024 <= args.port <= 65535:
         print("Port must be an int between 1024 and 65535")
         sys.exit(1)
 
-    Tracker(PORT).serve_forever()
\ No newline at end of file
+    options = dict(genesis=load_genesis(args.genesis) if args.genesis else None,
+                   topology=args.topology, header_cache=args.header_cache,
+                   heartbeat_interval=args.heartbeat, heartbeat_timeout=args.heartbeat_timeout,
+                   send_hwm=args.send_hwm)
+    if args.emulate:
+        from netem import LinkEmulator
+        options["emulator"] = LinkEmulator.from_config(args.emulate, args.ms_per_cost)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    if args.federation:
+        from federation import FEDERATED_MODES, parse_federation
+        trackers = parse_federation(args.federation)
+        if args.tracker_id not in trackers:
+            print("--tracker-id must name one of the --federation trackers")
+            sys.exit(1)
+        FEDERATED_MODES[args.mode](args.port, args.tracker_id, trackers, **options).serve_forever()
+    else:
+        TRACKER_MODES[args.mode](args.port, **options).serve_forever()
@@ -0,0 +1,301 @@
+# Direct peer‑to‑peer links between nodes
+# The tracker is only used to learn each peer's listening address; block
+# gossip and unicast sync traffic then flow over these TCP links.
+
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+
+import codec
+from inventory import SeenCache
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    """
+    Read one 4‑byte length‑prefixed frame. Loops until the whole frame has
+    arrived since a single recv() may return only part of a large message.
+
+    Returns:
+        bytes: The frame body, or b"" if the connection closed
+    """
+    hdr = _recv_exact(sock, 4)
+    if not hdr:
+        return b""
+    return _recv_exact(sock, int.from_bytes(hdr, "big"))
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return b""
+        buf += chunk
+    return bytes(buf)
+
+
+class Link:
+    """One established connection to a peer."""
+
+    def __init__(self, node_id: str, sock: socket.socket, initiator: str):
+        self.node_id = node_id
+        self.sock = sock
+        self.initiator = initiator      # node ID that opened the connection
+        self.lock = threading.Lock()    # serialises sendall on this socket
+        self.codec = "json"             # agreed in the HELLO exchange
+
+    def send(self, message: bytes) -> None:
+        with self.lock:
+            self.sock.sendall(len(message).to_bytes(4, "big") + message)
+
+    def close(self) -> None:
+        # shutdown first so a reader blocked in recv() wakes up
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class PeerLinks:
+    """
+    Listens for inbound peer connections and keeps up to `max_outbound`
+    outbound ones, chosen at random from the advertised addresses.
+
+    Broadcast frames (dst "*") received on a link are passed on to every
+    other link once, deduplicated by frame digest, so a message spreads
+    across the overlay even though each node only talks to a few peers.
+    Every decoded message is handed to `on_message(msg, size)`, size
+    being the frame's length in bytes.
+
+    The connecting side lists its `codecs` in HELLO; the accepting side
+    picks the first of its own that both support and answers HELLO_ACK.
+    Unicast block/header payloads then use the binary codec on that link.
+    """
+
+    def __init__(self, node_id: str, on_message, listen_host: str = "0.0.0.0",
+                 listen_port: int = 0, max_outbound: int = 8, max_inbound: int = 32,
+                 codecs: tuple = (codec.WIRE_NAME, "json")):
+        self.node_id = node_id
+        self.codecs = list(codecs)
+        self.on_message = on_message
+        self.max_outbound = max_outbound
+        self.max_inbound = max_inbound
+        self.links: dict[str, Link] = {}
+        self.addrs: dict[str, tuple[str, int]] = {}
+        self.lock = threading.Lock()
+        self._connecting: set[str] = set()
+        self.gossip_seen = SeenCache(capacity=8192)
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((listen_host, listen_port))
+        self.server.listen()
+        self.port = self.server.getsockname()[1]
+
+    def start(self) -> None:
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    # ── address book --------------------------------------------------------
+    def set_addresses(self, addrs: dict) -> None:
+        """Replace the address book from a PEER_LIST snapshot."""
+        with self.lock:
+            self.addrs = {nid: (a[0], int(a[1])) for nid, a in addrs.items()
+                          if nid != self.node_id}
+        self.maintain()
+
+    def add_address(self, nid: str, addr) -> None:
+        if nid != self.node_id and addr:
+            with self.lock:
+                self.addrs[nid] = (addr[0], int(addr[1]))
+            self.maintain()
+
+    def remove_address(self, nid: str) -> None:
+        with self.lock:
+            self.addrs.pop(nid, None)
+        self._drop(nid)
+
+    def partial(self, peer_ids: list[str]) -> bool:
+        """True if some known peer has no advertised address to link to."""
+        with self.lock:
+            return any(p != self.node_id and p not in self.addrs for p in peer_ids)
+
+    # ── connection management ------------------------------------------------
+    def maintain(self) -> None:
+        """Open outbound links until we have max_outbound of them."""
+        with self.lock:
+            outbound = sum(1 for l in self.links.values() if l.initiator == self.node_id)
+            need = self.max_outbound - outbound - len(self._connecting)
+            candidates = [nid for nid in self.addrs
+                          if nid not in self.links and nid not in self._connecting]
+            picks = random.sample(candidates, min(max(need, 0), len(candidates)))
+            self._connecting.update(picks)
+        for nid in picks:
+            threading.Thread(target=self._connect, args=(nid,), daemon=True).start()
+
+    def _connect(self, nid: str) -> None:
+        try:
+            with self.lock:
+                addr = self.addrs.get(nid)
+            if addr is None:
+                return
+            sock = socket.create_connection(addr, timeout=5)
+            sock.settimeout(None)
+            hello = {
+                "type": "HELLO",
+                "src":  self.node_id,
+                "dst":  nid,
+                "ts":   time.time(),
+                "payload": { "node_id": self.node_id, "codecs": self.codecs }
+            }
+            link = Link(nid, sock, self.node_id)
+            link.send(json.dumps(hello).encode())
+            self._adopt(link)
+        except OSError as e:
+            print(f"[WARN] direct link to {nid} failed: {e}")
+        finally:
+            with self.lock:
+                self._connecting.discard(nid)
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handshake, args=(conn,), daemon=True).start()
+
+    def _handshake(self, conn: socket.socket) -> None:
+        try:
+            conn.settimeout(5)
+            hello = json.loads(recv_frame(conn) or b"null")
+            conn.settimeout(None)
+        except (OSError, ValueError):
+            conn.close()
+            return
+        payload = hello.get("payload") if isinstance(hello, dict) else None
+        nid = payload.get("node_id") if isinstance(payload, dict) else None
+        if not isinstance(nid, str) or hello.get("type") != "HELLO" or nid == self.node_id:
+            conn.close()
+            return
+        with self.lock:
+            inbound = sum(1 for l in self.links.values() if l.initiator != self.node_id)
+        if inbound >= self.max_inbound:
+            conn.close()
+            return
+        link = Link(nid, conn, nid)
+        offered = payload.get("codecs")
+        if not isinstance(offered, list):
+            offered = ["json"]
+        link.codec = next((c for c in self.codecs if c in offered), "json")
+        ack = {
+            "type": "HELLO_ACK",
+            "src":  self.node_id,
+            "dst":  nid,
+            "ts":   time.time(),
+            "payload": { "codec": link.codec }
+        }
+        try:
+            link.send(json.dumps(ack).encode())
+        except OSError:
+            conn.close()
+            return
+        self._adopt(link)
+
+    def _adopt(self, link: Link) -> None:
+        """
+        Register a new link and start its reader. If both sides dialled each
+        other at once, both keep the connection opened by the lower node ID.
+        """
+        with self.lock:
+            old = self.links.get(link.node_id)
+            keep_old = old is not None and old.initiator == min(self.node_id, link.node_id)
+            if keep_old:
+                link.close()
+                return
+            self.links[link.node_id] = link
+        if old is not None:
+            old.close()
+        print(f"[INFO] direct link ⇄ {link.node_id}")
+        threading.Thread(target=self._reader, args=(link,), daemon=True).start()
+
+    def _drop(self, nid: str, link: Link | None = None) -> None:
+        with self.lock:
+            cur = self.links.get(nid)
+            if cur is None or (link is not None and cur is not link):
+                return
+            del self.links[nid]
+        cur.close()
+        self.maintain()
+
+    def _reader(self, link: Link) -> None:
+        try:
+            while True:
+                try:
+                    data = recv_frame(link.sock)
+                except OSError:
+                    data = b""
+                if not data:
+                    break
+                try:
+                    msg = codec.decode_message(data)
+                except codec.CodecError as e:
+                    print("[WARN] undecodable frame on direct link:", e)
+                    continue
+                if msg.get("type") == "HELLO_ACK":
+                    link.codec = msg["payload"]["codec"]
+                    continue
+                if msg.get("dst") in ("*", "broadcast"):
+                    if self.gossip_seen.check_and_add(hashlib.sha256(data).hexdigest()):
+                        continue
+                    self.broadcast(data, exclude=link.node_id, mark=False)
+                try:
+                    self.on_message(msg, len(data))
+                except Exception as e:
+                    print("[ERR] handling direct message:", e)
+        finally:
+            self._drop(link.node_id, link)
+
+    # ── sending ---------------------------------------------------------------
+    def send(self, nid: str, message: bytes | dict) -> bool:
+        """
+        Send to one linked peer. A message dict is encoded for that link,
+        binary if both ends agreed on it. Returns False if there is no
+        usable link.
+        """
+        with self.lock:
+            link = self.links.get(nid)
+        if link is None:
+            return False
+        if isinstance(message, dict):
+            message = (codec.encode_message(message) if link.codec == codec.WIRE_NAME
+                       else json.dumps(message).encode())
+        try:
+            link.send(message)
+            return True
+        except OSError:
+            self._drop(nid, link)
+            return False
+
+    def broadcast(self, message: bytes, exclude: str | None = None, mark: bool = True) -> int:
+        """
+        Send to every linked peer except `exclude`.
+
+        Returns:
+            int: Number of links the message went out on
+        """
+        if mark:
+            self.gossip_seen.add(hashlib.sha256(message).hexdigest())
+        with self.lock:
+            links = [l for nid, l in self.links.items() if nid != exclude]
+        sent = 0
+        for link in links:
+            try:
+                link.send(message)
+                sent += 1
+            except OSError:
+                self._drop(link.node_id, link)
+        return sent
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Local cluster simulator: one tracker plus N headless nodes on localhost.
+
+The tracker (network.Tracker, or SelectorTracker with --tracker-mode
+selectors) runs in this process; every node is a real
+decentralized_node.py process in --control mode, driven over its stdin.
+The nodes report chain changes as EVT lines on stdout, and the end-to-end
+numbers come from those events:
+
+  latency      vote sent ➜ first block holding it, on the voting node
+               ("origin") and on every node up at the time ("all")
+  propagation  a block's first appearance anywhere ➜ each other node
+               (nodes that joined later are syncing, not counted)
+  reorgs       chain changes that detached blocks, per node and per block
+               produced; orphaned = blocks seen that the final chain lacks
+  relay        frames and bytes the tracker relayed (direct p2p links
+               bypass it, so they are only counted with the default
+               tracker-only routing)
+  agreement    tips and tallies of all nodes after the run settles
+
+Scenarios 1-6 are the Testing.md cases, each step run to quiescence so a
+rerun gives the same chains; each checks its expected tallies. Scenario
+7 partitions one node away and heals it. --load runs a Poisson workload
+instead: votes at --rate per second for --duration seconds, each to a
+random node, mined by the nodes' background miners (several votes per
+block).
+
+--emulate CONFIG puts the tracker's relay behind emulated links
+(netem.py: latency, jitter, bandwidth, scheduled partitions; partition
+times count from tracker start). The report then also gives the catch-up
+time from the last heal to the last chain change.
+
+    python3 simulate.py                      # all six scenarios
+    python3 simulate.py 3 4 --report out.json
+    python3 simulate.py --load --nodes 5 --rate 20 --duration 30 --seed 7
+    python3 simulate.py --load --emulate wan.json --nodes 4 --rate 2
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import network
+from netem import LinkEmulator
+
+NODE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "decentralized_node.py")
+
+QUIET = 0.5                   # seconds without chain events that count as settled
+STEP_TIMEOUT = 15.0           # seconds any single step may take
+SETTLE_TIMEOUT = 20.0         # seconds for every tip to agree at the end
+
+
+class SimNode:
+    """One decentralized_node.py --control process and what it last reported."""
+
+    def __init__(self, cluster: "Cluster", node_id: str):
+        self.cluster = cluster
+        self.node_id = node_id
+        self.ready = False
+        self.started = None           # time of the ready event
+        self.tip = None
+        self.height = 0
+        self.status = None
+        self.broadcasts = 0           # broadcast events seen
+        self.proc = None
+        self.log = None
+
+    def start(self, p2p: bool, log_path: str | None):
+        cmd = [sys.executable, "-u", NODE_SCRIPT, "127.0.0.1", str(self.cluster.tracker.port),
+               self.node_id, "--headless", "--control"]
+        if not p2p:
+            cmd.append("--no-p2p")
+        self.log = open(log_path, "w") if log_path else None
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT, text=True, bufsize=1)
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            # print() writes its newline separately, so an event can land
+            # in the middle of another thread's log line
+            at = line.find("EVT {")
+            if at >= 0:
+                try:
+                    self.cluster.on_event(self, json.loads(line[at + 4:]))
+                except json.JSONDecodeError:
+                    pass
+                line = line[:at]
+            if self.log and line.strip():
+                self.log.write(line if line.endswith("\n") else line + "\n")
+
+    def send(self, **cmd):
+        self.proc.stdin.write(json.dumps(cmd) + "\n")
+        self.proc.stdin.flush()
+
+    def stop(self):
+        if self.proc is None:
+            return
+        try:
+            self.send(cmd="quit")
+            self.proc.stdin.close()
+            self.proc.wait(3)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.proc.kill()
+            self.proc.wait()
+        if self.log:
+            self.log.close()
+
+
+class Cluster:
+    """An in-process tracker and the nodes attached to it, plus every event they sent."""
+
+    def __init__(self, tracker_mode: str = "threaded", p2p: bool = False,
+                 log_dir: str | None = None, prefix: str = "", emulate: str | None = None):
+        self.p2p = p2p
+        self.log_dir = log_dir
+        self.prefix = prefix
+        # partition steps need an emulator even without --emulate (zero delay)
+        self.emulator = LinkEmulator.from_config(emulate) if emulate else LinkEmulator()
+        self.healed_at: float | None = None
+        self.tracker = network.TRACKER_MODES[tracker_mode](0, emulator=self.emulator)
+        threading.Thread(target=self.tracker.serve_forever, daemon=True).start()
+        while self.tracker.port == 0:
+            time.sleep(0.01)
+        self.nodes: dict[str, SimNode] = {}
+        self.cond = threading.Condition()
+        self.last_change = time.time()
+        self.votes: dict[int, dict] = {}                 # ref ➜ vote record
+        self.seen: dict[str, dict[str, float]] = {}      # block hash ➜ node ➜ first attached
+        self.included: dict[str, dict[str, float]] = {}  # tx_id ➜ node ➜ first in a block
+        self.reorgs: list[dict] = []
+        self.errors: list[dict] = []
+        self._ref = 0
+        self._relay_start = (self.tracker.relayed.value, self.tracker.relayed_bytes.value,
+                             self.emulator.dropped.value)
+
+    # ── events (reader threads) -------------------------------------------------
+    def on_event(self, node: SimNode, evt: dict):
+        kind = evt["evt"]
+        with self.cond:
+            if kind == "ready":
+                node.ready, node.started = True, evt["t"]
+            elif kind == "vote":
+                vote = self.votes.get(evt.get("ref"))
+                if vote is not None:
+                    vote["tx_id"] = evt["tx_id"]
+            elif kind == "mined":
+                vote = self.votes.get(evt.get("ref"))
+                if vote is not None:
+                    vote["mined"] = evt["hash"]
+            elif kind == "chain":
+                self.last_change = time.time()
+                node.tip, node.height = evt["tip"], evt["height"]
+                if evt["detached"] and node.started is not None:
+                    self.reorgs.append({"node": node.node_id, "t": evt["seen"],
+                                        "fork": evt["fork"], "detached": evt["detached"]})
+                for blk in evt["blocks"]:
+                    if blk["index"] == 0:
+                        continue
+                    self.seen.setdefault(blk["hash"], {}).setdefault(node.node_id, evt["seen"])
+                    for tx_id in blk["txs"]:
+                        self.included.setdefault(tx_id, {}).setdefault(node.node_id, evt["seen"])
+            elif kind == "broadcast":
+                node.broadcasts += 1
+            elif kind == "status":
+                node.status = evt
+            elif kind == "error":
+                self.errors.append(evt)
+                vote = self.votes.get(evt.get("ref"))
+                if vote is not None:
+                    vote["error"] = evt["error"]
+            self.cond.notify_all()
+
+    def wait(self, predicate, timeout: float = STEP_TIMEOUT) -> bool:
+        with self.cond:
+            return self.cond.wait_for(predicate, timeout)
+
+    # ── actions --------------------------------------------------------------------
+    def start_node(self, node_id: str, sync: bool = True):
+        """Start a node, wait until it is registered and (sync) has caught up."""
+        node = self.nodes[node_id] = SimNode(self, node_id)
+        log = (os.path.join(self.log_dir, f"{self.prefix}{node_id}.log")
+               if self.log_dir else None)
+        node.start(self.p2p, log)
+        if not self.wait(lambda: node.ready):
+            raise RuntimeError(f"node {node_id} did not start")
+        if sync:
+            best = max((n.height for n in self.nodes.values()), default=0)
+            self.wait(lambda: node.height >= best)
+        self.quiet()
+
+    def vote(self, node_id: str, a: int, b: int, broadcast: bool = True, mine: bool = True,
+             wait: bool = True) -> dict:
+        """Send one vote; with wait, return once it is mined (mine) or accepted."""
+        with self.cond:
+            self._ref += 1
+            ref = self._ref
+            vote = self.votes[ref] = {"node": node_id, "sent": time.time(), "tx_id": None,
+                                      "up": [n for n, s in self.nodes.items() if s.ready]}
+        self.nodes[node_id].send(cmd="vote", a=a, b=b, broadcast=broadcast, mine=mine, ref=ref)
+        if wait:
+            # the node's chain event can arrive after "mined": wait for both
+            done = (lambda: "error" in vote or node_id in self.seen.get(vote.get("mined"), ())) \
+                if mine else (lambda: vote["tx_id"] or "error" in vote)
+            self.wait(done)
+            if "error" in vote:
+                raise RuntimeError(f"vote on {node_id} failed: {vote['error']}")
+        return vote
+
+    def partition(self, groups: list[list[str]]):
+        self.emulator.partition(groups)
+
+    def heal(self):
+        self.emulator.heal()
+        self.healed_at = time.time()
+
+    def broadcast(self, node_id: str):
+        node = self.nodes[node_id]
+        before = node.broadcasts
+        node.send(cmd="broadcast")
+        self.wait(lambda: node.broadcasts > before)
+
+    def quiet(self, period: float = QUIET, timeout: float = STEP_TIMEOUT) -> bool:
+        """Wait until no node has reported a chain change for `period` seconds (from now at least)."""
+        since = time.time()
+        deadline = since + timeout
+        while time.time() < deadline:
+            left = max(self.last_change, since) + period - time.time()
+            if left <= 0:
+                return True
+            time.sleep(min(left, deadline - time.time()) + 0.01)
+        return False
+
+    def agree(self) -> bool:
+        tips = {n.tip for n in self.nodes.values()}
+        return len(tips) == 1
+
+    def drained(self) -> bool:
+        """Every accepted vote is in a block on the node it was sent to."""
+        return all("error" in v or (v["tx_id"] and v["node"] in self.included.get(v["tx_id"], {}))
+                   for v in list(self.votes.values()))
+
+    def settle(self, timeout: float = SETTLE_TIMEOUT) -> bool:
+        """Wait until every vote is mined and every node has reached the same tip and stayed there."""
+        deadline = time.time() + timeout
+        settled = lambda: self.agree() and self.drained()
+        while time.time() < deadline:
+            self.wait(settled, max(0.0, deadline - time.time()))
+            self.quiet(timeout=max(0.0, deadline - time.time()))
+            if settled():
+                return True
+        return False
+
+    def collect_status(self) -> dict[str, dict]:
+        """Fresh status of every node that answers within STEP_TIMEOUT."""
+        for node in self.nodes.values():
+            node.status = None
+            node.send(cmd="status")
+        self.wait(lambda: all(n.status for n in self.nodes.values()))
+        return {nid: n.status for nid, n in self.nodes.items() if n.status}
+
+    def stop(self):
+        for node in self.nodes.values():
+            node.stop()
+
+    # ── report ---------------------------------------------------------------------
+    def _last_heal(self) -> float | None:
+        """Wall time of the latest heal, by heal() or scheduled in the config."""
+        offset = time.time() - time.monotonic() + self.emulator.started
+        healed = [offset + p["heal"] for p in self.emulator.partitions
+                  if p.get("heal", float("inf")) < time.monotonic() - self.emulator.started]
+        return max(healed + ([self.healed_at] if self.healed_at else []), default=None)
+
+    def report(self) -> dict:
+        statuses = self.collect_status()
+        relayed = self.tracker.relayed.value - self._relay_start[0]
+        relayed_bytes = self.tracker.relayed_bytes.value - self._relay_start[1]
+
+        origin, everywhere, unconfirmed = [], [], 0
+        for vote in self.votes.values():
+            confirmed = self.included.get(vote["tx_id"], {})
+            if vote["node"] in confirmed:
+                origin.append(confirmed[vote["node"]] - vote["sent"])
+            if vote["up"] and all(n in confirmed for n in vote["up"]):
+                everywhere.append(max(confirmed[n] for n in vote["up"]) - vote["sent"])
+            else:
+                unconfirmed += 1
+
+        delays, to_all = [], []
+        for hash_, by_node in self.seen.items():
+            first = min(by_node.values())
+            up = [nid for nid, n in self.nodes.items()
+                  if n.started is not None and n.started < first]
+            arrivals = [by_node[n] - first for n in up if n in by_node]
+            delays.extend(d for d in arrivals if d > 0)
+            if len(up) > 1 and len(arrivals) == len(up):
+                to_all.append(max(arrivals))
+
+        # the majority chain is the reference for orphaned blocks
+        chains = [tuple(s["hashes"]) for s in statuses.values()]
+        final = max(set(chains), key=chains.count) if chains else ()
+        produced = len(self.seen)
+        orphaned = len(set(self.seen) - set(final))
+        by_node: dict[str, int] = {}
+        for r in self.reorgs:
+            by_node[r["node"]] = by_node.get(r["node"], 0) + 1
+
+        tallies = {nid: s["tally"] for nid, s in statuses.items()}
+        return {
+            "nodes": len(self.nodes),
+            "votes": len(self.votes),
+            "latency_ms": {"origin": percentiles(origin), "all_nodes": percentiles(everywhere),
+                           "unconfirmed": unconfirmed},
+            "propagation_ms": {"per_node": percentiles(delays), "to_all": percentiles(to_all)},
+            "blocks": {"produced": produced, "orphaned": orphaned, "final_height": len(final) - 1},
+            "reorgs": {"total": len(self.reorgs), "by_node": by_node,
+                       "detached_blocks": sum(r["detached"] for r in self.reorgs),
+                       "per_block": round(len(self.reorgs) / produced, 4) if produced else 0.0},
+            "relay": {"frames": int(relayed), "bytes": int(relayed_bytes),
+                      "dropped": int(self.emulator.dropped.value - self._relay_start[2])},
+            "catch_up_s": (round(max(0.0, self.last_change - healed), 3)
+                           if (healed := self._last_heal()) else None),
+            "agreement": {"tips_agree": len(statuses) == len(self.nodes) and
+                                        len({s["tip"] for s in statuses.values()}) == 1,
+                          "tallies_agree": len({json.dumps(t, sort_keys=True)
+                                                for t in tallies.values()}) == 1,
+                          "heights": {nid: s["height"] for nid, s in statuses.items()},
+                          "tallies": tallies,
+                          "unresponsive": sorted(set(self.nodes) - set(statuses))},
+            "errors": [e["error"] for e in self.errors],
+        }
+
+
+def percentiles(values: list[float]) -> dict:
+    """Nearest-rank p50/p90/p99/max of durations in seconds, as milliseconds."""
+    if not values:
+        return {"n": 0}
+    values = sorted(values)
+    pick = lambda q: round(1000 * values[min(len(values) - 1, int(q * len(values)))], 2)
+    return {"n": len(values), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99),
+            "max": round(1000 * values[-1], 2)}
+
+
+# ── Testing.md scenarios -------------------------------------------------------------
+# Steps: ("start", node), ("vote", node, a, b), ("hold", node, a, b) votes
+# without broadcasting, ("broadcast", node) sends the held blocks,
+# ("partition", groups) and ("heal",) cut and restore relay links. "expect"
+# gives tallies (per node, "*" for all) and heights; agree=False skips the
+# final wait for every tip to match.
+SCENARIOS = {
+    "1": {"title": "3 nodes, one vote per node",
+          "steps": [("start", "A"), ("start", "B"), ("start", "C"),
+                    ("vote", "A", 10, 20), ("vote", "B", 15, 15), ("vote", "C", 5, 25)],
+          "expect": {"tally": {"*": {"A": 30, "B": 60}}}},
+    "2": {"title": "5 nodes, scattered votes",
+          "steps": [("start", n) for n in "ABCDE"] +
+                   [("vote", "A", 10, 20), ("vote", "B", 15, 15), ("vote", "A", 30, 10),
+                    ("vote", "C", 5, 25), ("vote", "B", 20, 25), ("vote", "E", 10, 0)],
+          "expect": {"tally": {"*": {"A": 90, "B": 95}}}},
+    "3": {"title": "3 nodes, C joins after 2 votes",
+          "steps": [("start", "A"), ("start", "B"),
+                    ("vote", "A", 10, 20), ("vote", "B", 35, 8),
+                    ("start", "C"), ("vote", "C", 30, 12), ("vote", "A", 10, 0)],
+          "expect": {"tally": {"*": {"A": 85, "B": 40}}}},
+    "4": {"title": "fork: A and B mine held blocks, A's longer branch wins",
+          "steps": [("start", "A"), ("start", "B"), ("start", "C"),
+                    ("vote", "A", 10, 10), ("vote", "B", 5, 10),
+                    ("hold", "A", 20, 10), ("hold", "A", 5, 15), ("hold", "B", 5, 10),
+                    ("broadcast", "A"), ("broadcast", "B")],
+          "expect": {"tally": {"*": {"A": 45, "B": 55}}, "reorgs": {"B": 1}}},
+    "5": {"title": "longest chain rejects a shorter chain's block",
+          "steps": [("start", "A"), ("start", "B"),
+                    ("vote", "A", 10, 10), ("hold", "A", 21, 23), ("hold", "A", 31, 2),
+                    ("vote", "B", 32, 10)],
+          "expect": {"tally": {"A": {"A": 62, "B": 35}}, "height": {"A": 3}},
+          "agree": False},
+    "6": {"title": "late joiner syncs to the longest chain",
+          "steps": [("start", "A"), ("start", "B"),
+                    ("vote", "A", 10, 20), ("vote", "B", 21, 33), ("start", "C")],
+          "expect": {"tally": {"*": {"A": 31, "B": 53}}}},
+    "7": {"title": "C is partitioned away, mines its own block, then the network heals",
+          "steps": [("start", "A"), ("start", "B"), ("start", "C"),
+                    ("vote", "A", 10, 20), ("partition", [["C"]]),
+                    ("vote", "A", 5, 5), ("vote", "C", 7, 3), ("heal",), ("vote", "B", 1, 1)],
+          "expect": {"tally": {"*": {"A": 23, "B": 29}}}},
+}
+
+
+def check(expect: dict, agree: bool, report: dict) -> list[str]:
+    """Differences between a scenario's expectations and its report."""
+    failures = [f"{nid} did not answer status" for nid in report["agreement"]["unresponsive"]]
+    found = report["agreement"]
+    if agree and not found["tips_agree"]:
+        failures.append("nodes ended on different tips")
+    for nid, tally in expect.get("tally", {}).items():
+        for other in (found["tallies"] if nid == "*" else [nid]):
+            if found["tallies"].get(other) != tally:
+                failures.append(f"{other} tally {found['tallies'].get(other)} != {tally}")
+    for nid, height in expect.get("height", {}).items():
+        if found["heights"].get(nid) != height:
+            failures.append(f"{nid} height {found['heights'].get(nid)} != {height}")
+    for nid, count in expect.get("reorgs", {}).items():
+        if report["reorgs"]["by_node"].get(nid, 0) < count:
+            failures.append(f"{nid} reorgs {report['reorgs']['by_node'].get(nid, 0)} < {count}")
+    return failures
+
+
+def run_scenario(name: str, options: argparse.Namespace) -> dict:
+    spec = SCENARIOS[name]
+    cluster = Cluster(options.tracker_mode, options.p2p, options.logs, prefix=f"s{name}-",
+                      emulate=options.emulate)
+    started = time.time()
+    try:
+        for op, *args in spec["steps"]:
+            if op == "start":
+                cluster.start_node(*args)
+            elif op in ("vote", "hold"):
+                cluster.vote(*args, broadcast=op == "vote")
+            elif op == "broadcast":
+                cluster.broadcast(*args)
+            elif op == "partition":
+                cluster.partition(*args)
+            elif op == "heal":
+                cluster.heal()
+            cluster.quiet()
+        if spec.get("agree", True):
+            cluster.settle()
+        report = cluster.report()
+    finally:
+        cluster.stop()
+    failures = check(spec["expect"], spec.get("agree", True), report)
+    return {"scenario": name, "title": spec["title"], "duration_s": round(time.time() - started, 2),
+            **report, "expected": spec["expect"], "passed": not failures, "failures": failures}
+
+
+def run_load(options: argparse.Namespace) -> dict:
+    """Poisson arrivals at options.rate votes/s, each to a uniformly random node."""
+    rng = random.Random(options.seed)
+    cluster = Cluster(options.tracker_mode, options.p2p, options.logs, prefix="load-",
+                      emulate=options.emulate)
+    names = [f"N{i}" for i in range(1, options.nodes + 1)]
+    started = time.time()
+    try:
+        for nid in names:
+            cluster.start_node(nid)
+        t0 = time.time()
+        at = t0
+        while True:
+            at += rng.expovariate(options.rate)
+            if at - t0 >= options.duration:
+                break
+            time.sleep(max(0.0, at - time.time()))
+            cluster.vote(rng.choice(names), rng.randint(0, 50), rng.randint(0, 50),
+                         mine=False, wait=False)
+        settled = cluster.settle()
+        report = cluster.report()
+    finally:
+        cluster.stop()
+    expected = sum(1 for v in cluster.votes.values() if "error" not in v)
+    failures = [f"{nid} did not answer status" for nid in report["agreement"]["unresponsive"]]
+    if not settled:
+        failures.append("nodes did not converge")
+    if report["latency_ms"]["unconfirmed"]:
+        failures.append(f"{report['latency_ms']['unconfirmed']} of {expected} votes not on every node")
+    return {"scenario": "load", "title": f"{options.nodes} nodes, Poisson {options.rate}/s "
+                                         f"for {options.duration}s, seed {options.seed}",
+            "duration_s": round(time.time() - started, 2), **report,
+            "passed": not failures, "failures": failures}
+
+
+def summary(result: dict) -> str:
+    lat, prop = result["latency_ms"], result["propagation_ms"]
+    fmt = lambda p: (f"p50 {p['p50']} / p90 {p['p90']} / p99 {p['p99']} ms (n={p['n']})"
+                     if p["n"] else "n/a")
+    lines = [f"[{'PASS' if result['passed'] else 'FAIL'}] {result['scenario']}: {result['title']} "
+             f"({result['duration_s']}s)",
+             f"    confirmation  origin {fmt(lat['origin'])}",
+             f"                  all    {fmt(lat['all_nodes'])}, unconfirmed {lat['unconfirmed']}",
+             f"    propagation   {fmt(prop['per_node'])}",
+             f"    blocks        {result['blocks']['produced']} produced, "
+             f"{result['blocks']['orphaned']} orphaned, height {result['blocks']['final_height']}",
+             f"    reorgs        {result['reorgs']['total']} {result['reorgs']['by_node'] or ''}",
+             f"    relay         {result['relay']['frames']} frames, {result['relay']['bytes']} bytes"
+             + (f", {result['relay']['dropped']} dropped" if result['relay']['dropped'] else ""),
+             *([f"    catch-up      {result['catch_up_s']}s from heal to last chain change"]
+               if result["catch_up_s"] is not None else []),
+             f"    agreement     tips {result['agreement']['tips_agree']}, "
+             f"tallies {result['agreement']['tallies']}"]
+    lines.extend(f"    ✗ {f}" for f in result["failures"])
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", metavar="N",
+                        help=f"Testing.md scenarios to run ({', '.join(SCENARIOS)}; default all)")
+    parser.add_argument("--load", action="store_true", help="run the Poisson workload instead")
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=10.0, help="votes per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracker-mode", choices=network.TRACKER_MODES, default="threaded")
+    parser.add_argument("--p2p", action="store_true",
+                        help="let nodes open direct links (their traffic is then not in the relay numbers)")
+    parser.add_argument("--emulate", metavar="CONFIG",
+                        help="emulated links for the relay: netem JSON config or topology file")
+    parser.add_argument("--logs", metavar="DIR", help="write each node's log lines to DIR")
+    parser.add_argument("--report", metavar="FILE", help="write the full results as JSON")
+    args = parser.parse_args()
+
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    if args.logs:
+        os.makedirs(args.logs, exist_ok=True)
+    network.LOG_LEVEL = "WARN"                # the in-process tracker's relay chatter
+
+    results = []
+    for name in ([] if args.load else args.scenarios or list(SCENARIOS)):
+        results.append(run_scenario(name, args))
+        print(summary(results[-1]), flush=True)
+    if args.load:
+        results.append(run_load(args))
+        print(summary(results[-1]))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(r["passed"] for r in results) else 1)
@@ -0,0 +1,111 @@
+import unittest
+
+import codec
+from LinkedList import Block, Blockchain, GENESIS_PREVIOUS_HASH
+
+
+def _block(timestamp=1700000000.25, txs=None):
+    txs = [{"vote": {"A": 3, "B": 1}, "timestamp": 1.5, "ref": "booth-1"}] if txs is None else txs
+    return Block(1, "ab" * 32, timestamp, txs, ["A", "B"], nonce=42)
+
+
+class HeaderTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        header = _block().header()
+        data = codec.encode_header(header)
+        self.assertEqual(len(data), codec.HEADER.size)
+        self.assertEqual(codec.decode_header(data), (header, codec.HEADER.size))
+
+    def test_genesis_previous_hash(self):
+        header = Block(0, GENESIS_PREVIOUS_HASH, 0.0, [], []).header()
+        decoded, _ = codec.decode_header(codec.encode_header(header))
+        self.assertEqual(decoded["previous_hash"], GENESIS_PREVIOUS_HASH)
+
+    def test_truncated(self):
+        data = codec.encode_header(_block().header())
+        with self.assertRaises(codec.CodecError):
+            codec.decode_header(data[:-1])
+
+    def test_unsupported_version(self):
+        data = bytearray(codec.encode_header(_block().header()))
+        data[0] = 99
+        with self.assertRaises(codec.CodecError):
+            codec.decode_header(bytes(data))
+
+
+class BlockTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        block = _block()
+        decoded, offset = codec.decode_block(codec.encode_block(block))
+        self.assertEqual(offset, len(codec.encode_block(block)))
+        self.assertEqual(decoded.header(), block.header())
+        self.assertEqual(decoded.transactions, block.transactions)
+        self.assertEqual(decoded.nodes, block.nodes)
+        self.assertEqual(decoded.calculate_hash(), block.hash)
+
+    def test_empty_block(self):
+        block = _block(txs=[])
+        decoded, _ = codec.decode_block(codec.encode_block(block))
+        self.assertEqual(decoded.transactions, [])
+        self.assertEqual(decoded.calculate_hash(), block.hash)
+
+    def test_integer_timestamp_keeps_hash(self):
+        # the header packs a double: an int timestamp must hash as a float
+        block = _block(timestamp=1700000000)
+        decoded, _ = codec.decode_block(codec.encode_block(block))
+        self.assertEqual(decoded.calculate_hash(), block.hash)
+
+    def test_tampered_transactions(self):
+        data = codec.encode_block(_block())
+        with self.assertRaises(codec.CodecError):
+            codec.decode_block(data.replace(b'"A":3', b'"A":4'))
+
+    def test_truncated(self):
+        data = codec.encode_block(_block())
+        for cut in (codec.HEADER.size + 1, len(data) - 1):
+            with self.assertRaises(codec.CodecError):
+                codec.decode_block(data[:cut])
+
+
+class ChainTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        chain = Blockchain(difficulty=1)
+        chain.add_transaction({"vote": {"A": 1, "B": 0}, "timestamp": 1.0})
+        chain.add_block(nodes=["A"])
+        decoded = codec.decode_chain(codec.encode_chain(chain.chain))
+        self.assertEqual([b.hash for b in decoded], [b.hash for b in chain.chain])
+        self.assertEqual([b.calculate_hash() for b in decoded], [b.hash for b in chain.chain])
+
+    def test_not_a_chain(self):
+        with self.assertRaises(codec.CodecError):
+            codec.decode_chain(b"[]")
+
+
+class MessageTest(unittest.TestCase):
+
+    def test_json_without_records(self):
+        msg = {"type": "INV", "src": "A", "dst": "*", "txids": ["00" * 32]}
+        data = codec.encode_message(msg)
+        self.assertFalse(codec.is_binary(data))
+        self.assertEqual(codec.decode_message(data), msg)
+
+    def test_binary_fields(self):
+        block = _block()
+        d = codec.decode_block_dict(codec.encode_block(block))[0]
+        for field, value in (("headers", [block.header()]), ("blocks", [d, d]), ("block", d)):
+            msg = {"type": "X", "src": "A", "dst": "B", field: value}
+            data = codec.encode_message(msg)
+            self.assertTrue(codec.is_binary(data))
+            self.assertEqual(codec.decode_message(data), msg)
+
+    def test_malformed(self):
+        for data in (b"{not json", b"[1, 2]", codec.FRAME_MAGIC + b"\x03\x00"):
+            with self.assertRaises(codec.CodecError):
+                codec.decode_message(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
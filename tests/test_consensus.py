@@ -0,0 +1,90 @@
+import time
+import unittest
+
+from LinkedList import (MAX_FUTURE_DRIFT, MAX_RETARGET, MEDIAN_TIME_SPAN, RETARGET_WINDOW,
+                        bits_to_target, difficulty_bits, median_time_past, retarget,
+                        target_to_bits, timestamp_error)
+
+BITS = difficulty_bits(3)
+LIMIT = difficulty_bits(1)
+
+
+def _window(seconds_per_block, bits=BITS):
+    """(timestamp, bits) of RETARGET_WINDOW + 1 blocks ending at the parent."""
+    return [(1000.0 + i * seconds_per_block, bits) for i in range(RETARGET_WINDOW + 1)]
+
+
+class TargetTest(unittest.TestCase):
+
+    def test_compact_round_trip(self):
+        for zeros in range(0, 9):
+            with self.subTest(zeros=zeros):
+                bits = difficulty_bits(zeros)
+                self.assertEqual(target_to_bits(bits_to_target(bits)), bits)
+
+
+class RetargetTest(unittest.TestCase):
+
+    def test_short_chain_keeps_parent_target(self):
+        window = _window(1)
+        self.assertEqual(retarget(window, RETARGET_WINDOW - 1, LIMIT, 10), BITS)
+
+    def test_disabled(self):
+        self.assertEqual(retarget(_window(1), 50, LIMIT, 0), BITS)
+
+    def test_on_time_keeps_target(self):
+        self.assertEqual(retarget(_window(10), 50, LIMIT, 10), BITS)
+
+    def test_fast_blocks_get_harder(self):
+        self.assertEqual(retarget(_window(5), 50, LIMIT, 10),
+                         target_to_bits(bits_to_target(BITS) // 2))
+
+    def test_slow_blocks_get_easier(self):
+        self.assertEqual(retarget(_window(20), 50, LIMIT, 10),
+                         target_to_bits(bits_to_target(BITS) * 2))
+
+    def test_adjustment_is_clamped(self):
+        self.assertEqual(retarget(_window(0.01), 50, LIMIT, 10),
+                         target_to_bits(bits_to_target(BITS) // MAX_RETARGET))
+        self.assertEqual(retarget(_window(1000), 50, LIMIT, 10),
+                         target_to_bits(bits_to_target(BITS) * MAX_RETARGET))
+
+    def test_never_easier_than_limit(self):
+        easy = target_to_bits(bits_to_target(LIMIT) // 2)
+        self.assertEqual(retarget(_window(1000, easy), 50, LIMIT, 10), LIMIT)
+
+    def test_only_last_window_counts(self):
+        old = [(0.0, difficulty_bits(6))] * 5
+        self.assertEqual(retarget(old + _window(10), 50, LIMIT, 10), BITS)
+
+
+class TimestampTest(unittest.TestCase):
+
+    def test_median_time_past(self):
+        self.assertEqual(median_time_past([5.0, 1.0, 3.0]), 3.0)
+        self.assertEqual(median_time_past([1.0, 2.0, 3.0, 4.0]), 3.0)
+        # only the last MEDIAN_TIME_SPAN count
+        self.assertEqual(median_time_past([1e9] * 5 + [1.0] * MEDIAN_TIME_SPAN), 1.0)
+
+    def test_after_median(self):
+        earlier = [float(t) for t in range(100, 111)]
+        self.assertIsNone(timestamp_error(106.5, earlier))
+        self.assertIsNotNone(timestamp_error(105.0, earlier))
+        self.assertIsNotNone(timestamp_error(1.0, earlier))
+
+    def test_one_early_clock_cannot_drag_median_back(self):
+        earlier = [float(t) for t in range(100, 110)] + [0.0]
+        self.assertIsNotNone(timestamp_error(104.0, earlier))
+
+    def test_future_drift(self):
+        now = time.time()
+        self.assertIsNone(timestamp_error(now + MAX_FUTURE_DRIFT - 5, [now]))
+        self.assertIsNotNone(timestamp_error(now + MAX_FUTURE_DRIFT + 60, [now]))
+
+    def test_not_a_number(self):
+        self.assertIsNotNone(timestamp_error("soon", [1.0]))
+        self.assertIsNotNone(timestamp_error(None, [1.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
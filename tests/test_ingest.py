@@ -0,0 +1,79 @@
+import io
+import unittest
+
+import ingest
+from LinkedList import Blockchain
+
+
+def _parse(parse, text):
+    return [(n, r if not isinstance(r, ingest.RecordError) else str(r))
+            for n, r in parse(text.splitlines(keepends=True))]
+
+
+class ReadLinesTest(unittest.TestCase):
+
+    def test_overlong_line_is_skipped(self):
+        stream = io.BytesIO(b"short\n" + b"x" * 50 + b"\nnext\n")
+        self.assertEqual(list(ingest.read_lines(stream, max_bytes=10)), ["short\n", None, "next\n"])
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_ndjson(self):
+        records = _parse(ingest.parse_ndjson,
+                         '{"a": 1, "b": 2, "ref": "r1"}\n'
+                         '\n'
+                         '{"a": "1", "b": 0, "ref": 7}\n'
+                         '{"a": 1}\n'
+                         'not json\n')
+        (n1, tx1), (n2, blank), (n3, tx3), (n4, err4), (n5, err5) = records
+        self.assertEqual((n1, tx1["vote"], tx1["ref"]), (1, {"A": 1, "B": 2}, "r1"))
+        self.assertIsNone(blank)
+        self.assertEqual((tx3["vote"], tx3["ref"]), ({"A": 1, "B": 0}, "7"))
+        self.assertEqual((n4, err4), (4, "expected a JSON object with a and b"))
+        self.assertEqual(n5, 5)
+
+    def test_csv(self):
+        records = _parse(ingest.parse_csv, "A, b ,ref\n3,4,booth\n5,x,y\n6,7\n")
+        self.assertEqual(records[0][1]["vote"], {"A": 3, "B": 4})
+        self.assertEqual(records[1:], [(3, "a and b must be integers"), (4, "missing column")])
+
+    def test_csv_header(self):
+        self.assertEqual(_parse(ingest.parse_csv, "a,b\n1,2\n"),
+                         [(1, "CSV header must name columns a, b and ref")])
+
+    def test_shared_vote_checks(self):
+        self.assertEqual(_parse(ingest.parse_ndjson, '{"a": -1, "b": 2, "ref": "r"}\n'),
+                         [(1, "vote counts must not be negative")])
+        self.assertEqual(_parse(ingest.parse_ndjson, '{"a": 1, "b": 2}\n'),
+                         [(1, "ref is required")])
+
+
+class IngestTest(unittest.TestCase):
+
+    def test_results_and_summary(self):
+        chain = Blockchain(difficulty=1)
+        body = b"a,b,ref\n1,2,r1\n1,2,r2\n-1,0,r3\n"
+        accepted = []
+        results = list(ingest.ingest(chain, io.BytesIO(body), "csv", chunk_size=2,
+                                     on_accept=accepted.extend))
+        self.assertEqual([r["line"] for r in results[:-1]], [2, 3, 4])
+        self.assertEqual(results[2]["error"], "vote counts must not be negative")
+        self.assertEqual(results[-1], {"accepted": 2, "rejected": 1})
+        self.assertEqual(accepted, [results[0]["tx_id"], results[1]["tx_id"]])
+        self.assertEqual(len(chain.pending_transactions), 2)
+
+    def test_errors_only(self):
+        chain = Blockchain(difficulty=1)
+        body = b'{"a": 1, "b": 1, "ref": "x"}\n{"a": 1, "b": 1}\n'
+        results = list(ingest.ingest(chain, io.BytesIO(body), errors_only=True))
+        self.assertEqual(results, [{"line": 2, "error": "ref is required"},
+                                   {"accepted": 1, "rejected": 1}])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            next(ingest.ingest(Blockchain(difficulty=1), io.BytesIO(b""), "xml"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import hashlib
+import unittest
+
+from inventory import BloomFilter, SeenCache
+
+
+def _hashes(n, prefix="", zeros=0):
+    return ["0" * zeros + hashlib.sha256(f"{prefix}{i}".encode()).hexdigest()[zeros:]
+            for i in range(n)]
+
+
+class BloomFilterTest(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        keys = _hashes(1000) + ["not-a-digest", ""]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+
+    def test_false_positive_rate_with_pow_prefixes(self):
+        # block hashes share leading zeros; the rate must still hold
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for key in _hashes(1000, zeros=6):
+            bloom.add(key)
+        misses = _hashes(5000, prefix="other", zeros=6)
+        rate = sum(key in bloom for key in misses) / len(misses)
+        self.assertLess(rate, 0.03)
+
+
+class SeenCacheTest(unittest.TestCase):
+
+    def test_check_and_add(self):
+        cache = SeenCache(capacity=4)
+        self.assertFalse(cache.check_and_add("a"))
+        self.assertTrue(cache.check_and_add("a"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_evicts_least_recent(self):
+        cache = SeenCache(capacity=3)
+        for key in "abc":
+            cache.add(key)
+        self.assertTrue(cache.seen("a"))       # refreshes a
+        cache.add("d")
+        self.assertFalse(cache.seen("b"))
+        self.assertTrue(cache.seen("a"))
+        self.assertEqual(len(cache), 3)
+
+    def test_bloom_remembers_aged_out_keys(self):
+        cache = SeenCache(capacity=2, bloom_capacity=100)
+        keys = _hashes(10)
+        for key in keys:
+            cache.add(key)
+        self.assertTrue(cache.seen(keys[0]))
+        self.assertEqual(cache.stats()["bloom_hits"], 1)
+
+    def test_bloom_rotation_keeps_previous_generation(self):
+        cache = SeenCache(capacity=1, bloom_capacity=10)
+        keys = _hashes(30)
+        for key in keys:
+            cache.add(key)
+        # the last bloom_capacity keys are always remembered...
+        self.assertTrue(all(cache.seen(key) for key in keys[-10:]))
+        # ...and two rotations back they are forgotten
+        forgotten = sum(cache.seen(key) for key in keys[:10])
+        self.assertLess(forgotten, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
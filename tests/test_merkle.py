@@ -0,0 +1,72 @@
+import hashlib
+import unittest
+
+from LinkedList import (Blockchain, EMPTY_MERKLE_ROOT, merkle_path, merkle_root,
+                        transaction_id, verify_merkle_path, verify_vote_proof)
+
+
+def _items(n):
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+
+class MerklePathTest(unittest.TestCase):
+
+    def test_every_leaf_verifies(self):
+        # odd counts carry a node up without a sibling
+        for n in (1, 2, 3, 5, 8, 13):
+            items = _items(n)
+            root = merkle_root(items)
+            for position, item in enumerate(items):
+                with self.subTest(n=n, position=position):
+                    self.assertTrue(verify_merkle_path(item, merkle_path(items, position), root))
+
+    def test_wrong_item_or_path(self):
+        items = _items(5)
+        root, path = merkle_root(items), merkle_path(items, 2)
+        self.assertFalse(verify_merkle_path(items[3], path, root))
+        self.assertFalse(verify_merkle_path(items[2], merkle_path(items, 1), root))
+        self.assertFalse(verify_merkle_path(items[2], path, merkle_root(items[:4])))
+
+    def test_malformed_path(self):
+        items = _items(4)
+        root = merkle_root(items)
+        self.assertFalse(verify_merkle_path(items[0], [["zz", "R"]], root))
+        self.assertFalse(verify_merkle_path(items[0], [[None, "R"]], root))
+
+    def test_empty_and_single(self):
+        self.assertEqual(merkle_root([]), EMPTY_MERKLE_ROOT)
+        item = _items(1)[0]
+        self.assertEqual(merkle_path([item], 0), [])
+        self.assertNotEqual(merkle_root([item]), item)   # leaves are domain-separated
+
+
+class VoteProofTest(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = Blockchain(difficulty=1)
+        self.txs = [{"vote": {"A": i, "B": 1}, "timestamp": float(i)} for i in range(3)]
+        for tx in self.txs:
+            self.chain.add_transaction(tx)
+        self.block = self.chain.add_block(nodes=["A", "B"])
+
+    def test_proof_for_each_vote(self):
+        for tx in self.txs:
+            proof = self.chain.get_vote_proof(transaction_id(tx))
+            self.assertEqual(proof["transaction"], tx)
+            self.assertTrue(verify_vote_proof(proof, self.block.header()))
+
+    def test_unknown_transaction(self):
+        self.assertIsNone(self.chain.get_vote_proof("00" * 32))
+
+    def test_forged_proofs(self):
+        proof = self.chain.get_vote_proof(transaction_id(self.txs[0]))
+        header = self.block.header()
+        forged = dict(proof, transaction={"vote": {"A": 99, "B": 1}, "timestamp": 0.0})
+        self.assertFalse(verify_vote_proof(forged, header))
+        self.assertFalse(verify_vote_proof(proof, dict(header, hash="11" * 32)))
+        self.assertFalse(verify_vote_proof(proof, dict(header, merkle_root="22" * 32)))
+        self.assertFalse(verify_vote_proof({"tx_id": proof["tx_id"]}, header))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from LinkedList import Blockchain, transaction_id
+
+
+def _tx(a, b=0):
+    return {"vote": {"A": a, "B": b}, "timestamp": float(a)}
+
+
+class DetachAfterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = Blockchain(difficulty=1)
+        self.mined = [[_tx(1), _tx(2)], [_tx(3)], [_tx(4), _tx(5)]]
+        for txs in self.mined:
+            for tx in txs:
+                self.chain.add_transaction(tx)
+            self.chain.add_block(nodes=["A"])
+        self.waiting = _tx(6)
+        self.chain.add_transaction(self.waiting)
+
+    def test_detaches_the_tail(self):
+        tail = self.chain.chain[2:]
+        detached = self.chain.detach_after(1)
+        self.assertEqual([b.hash for b in detached], [b.hash for b in tail])
+        self.assertEqual(len(self.chain.chain), 2)
+        self.assertTrue(self.chain.is_chain_valid())
+
+    def test_transactions_go_back_first(self):
+        self.chain.detach_after(1)
+        expected = self.mined[1] + self.mined[2] + [self.waiting]
+        self.assertEqual(self.chain.pending_transactions, expected)
+        self.assertEqual(list(self.chain.pending_index), [transaction_id(tx) for tx in expected])
+
+    def test_detached_votes_leave_the_index(self):
+        self.chain.detach_after(1)
+        self.assertIsNone(self.chain.get_vote_proof(transaction_id(_tx(3))))
+        self.assertIsNotNone(self.chain.get_vote_proof(transaction_id(_tx(1))))
+        with self.assertRaises(ValueError):
+            self.chain.add_transaction(_tx(4))       # pending again, so a duplicate
+
+    def test_cached_tally_is_rolled_back(self):
+        self.assertEqual(self.chain.get_votes_tally()["A"], 15)
+        self.chain.detach_after(1)
+        self.assertEqual(self.chain.get_votes_tally()["A"], 3)
+        self.assertEqual(self.chain.get_votes_tally(), self.chain.get_votes_tally(list(self.chain.chain)))
+
+    def test_remined_after_detach(self):
+        self.chain.detach_after(0)
+        block = self.chain.add_block(nodes=["A"])
+        self.assertIsNotNone(block)
+        self.assertEqual(self.chain.get_votes_tally()["A"], 21)
+        self.assertEqual(self.chain.pending_transactions, [])
+
+    def test_nothing_after_tip(self):
+        self.assertEqual(self.chain.detach_after(len(self.chain.chain) - 1), [])
+        self.assertEqual(self.chain.pending_transactions, [self.waiting])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+# Structured tracing into a fixed‑size ring buffer
+# Spans and instant events are stored as raw tuples (name, timestamps,
+# thread, args as passed) in a preallocated list, overwriting the oldest
+# once it wraps. Nothing is formatted when an event is recorded; the
+# buffer is turned into Chrome trace JSON (chrome://tracing, Perfetto)
+# only when someone asks for it: GET /trace on a node, or SIGUSR1 (the
+# file is written to the working directory).
+#
+# The per‑operation log lines that used to be printed on hot paths (full
+# transaction dicts, tallies, chain dumps) are trace events now and only
+# logged as text when VERBOSE is set (--verbose, or TRACE_VERBOSE=1).
+
+import functools
+import itertools
+import json
+import os
+import signal
+import threading
+import time
+from threading import get_ident
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, List
+
+TRACE_CAPACITY = 65536        # events kept (the oldest are overwritten)
+VERBOSE = os.environ.get("TRACE_VERBOSE") == "1"
+
+
+class _Span:
+    """Context manager that records one complete ("X") event on exit."""
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Any):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.tracer.complete(self.name, self.start, perf_counter_ns() - self.start, self.args)
+
+
+class Tracer:
+    """
+    Ring buffer of trace events. Recording is a clock read, a counter
+    step and one list store, safe from any thread without a lock.
+    Args are kept by reference and only converted at export, so pass
+    values that won't be mutated afterwards (IDs, numbers, fresh dicts).
+    """
+
+    def __init__(self, capacity: int = TRACE_CAPACITY):
+        self.capacity = capacity
+        self.enabled = capacity > 0
+        self._events: List[tuple | None] = [None] * capacity
+        self._seq = itertools.count()      # next() is atomic under the GIL
+
+    # ── recording ---------------------------------------------------------------
+    def complete(self, name: str, start_ns: int, dur_ns: int, args: Any = None) -> None:
+        """A span that started at start_ns (perf_counter_ns) and lasted dur_ns."""
+        if self.enabled:
+            self._events[next(self._seq) % self.capacity] = ("X", name, start_ns, dur_ns, get_ident(), args)
+
+    def instant(self, name: str, args: Any = None) -> None:
+        if self.enabled:
+            self._events[next(self._seq) % self.capacity] = ("i", name, perf_counter_ns(), 0, get_ident(), args)
+
+    def counter(self, name: str, values: Dict[str, float]) -> None:
+        """A sampled value (or several) drawn as a graph in the viewer."""
+        if self.enabled:
+            self._events[next(self._seq) % self.capacity] = ("C", name, perf_counter_ns(), 0, get_ident(), values)
+
+    def span(self, name: str, args: Any = None) -> _Span:
+        return _Span(self, name, args)
+
+    def traced(self, name: str | None = None) -> Callable:
+        """Decorator: record every call of the function as a span."""
+        def wrap(fn):
+            label = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = perf_counter_ns()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.complete(label, start, perf_counter_ns() - start)
+            return inner
+        return wrap
+
+    def clear(self) -> None:
+        self._events = [None] * self.capacity
+
+    # ── export --------------------------------------------------------------------
+    def events(self) -> List[tuple]:
+        """Buffered events, oldest first."""
+        return sorted((e for e in list(self._events) if e is not None), key=lambda e: e[2])
+
+    def to_chrome(self) -> Dict:
+        """The buffer as a Chrome trace (JSON object format, times in µs)."""
+        pid = os.getpid()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        out = []
+        for ph, name, ts, dur, tid, args in self.events():
+            event = {"name": name, "ph": ph, "ts": ts / 1000, "pid": pid, "tid": tid}
+            if ph == "X":
+                event["dur"] = dur / 1000
+            elif ph == "i":
+                event["s"] = "t"
+            if args is not None:
+                event["args"] = args if isinstance(args, dict) else {"value": args}
+            out.append(event)
+        for tid in {e["tid"] for e in out}:
+            out.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                        "args": {"name": names.get(tid, f"thread-{tid}")}})
+        return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+    def dumps(self) -> str:
+        return json.dumps(self.to_chrome(), default=str)
+
+    def dump(self, path: str | None = None) -> str:
+        """Write the Chrome trace to `path` (default trace-<pid>-<time>.json)."""
+        path = path or f"trace-{os.getpid()}-{int(time.time())}.json"
+        with open(path, "w") as f:
+            f.write(self.dumps())
+        return path
+
+    def install_signal(self, signum: int = getattr(signal, "SIGUSR1", 0)) -> bool:
+        """
+        Dump the buffer to a file whenever `signum` arrives. Only possible
+        from the main thread and where the signal exists (not on Windows).
+        """
+        if not signum or threading.current_thread() is not threading.main_thread():
+            return False
+
+        def handler(_signum, _frame):
+            def write():
+                print(f"[INFO] trace written to {self.dump()}")
+            threading.Thread(target=write, daemon=True).start()
+        signal.signal(signum, handler)
+        return True
+
+
+TRACER = Tracer()
+span = TRACER.span
+instant = TRACER.instant
+counter = TRACER.counter
+complete = TRACER.complete
+traced = TRACER.traced
@@ -0,0 +1,65 @@
+# Tip‑keyed cache for rendered web responses
+# Every page and API response a node serves is a function of the request
+# and of the chain, and the tip hash pins down the whole chain. Caching
+# the rendered body under (request key, tip hash) means a response is
+# rendered at most once per tip. The same pair gives a strong ETag, so a
+# client that already has the body gets a 304 without it being rendered
+# or even looked up.
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+CACHE_ENTRIES = 256           # rendered responses kept (LRU)
+
+
+class TipCache:
+    """
+    LRU of rendered bodies keyed by (key, tip hash). Register clear() as
+    a Blockchain listener to drop entries for old tips on every change.
+    """
+
+    def __init__(self, blockchain, maxsize: int = CACHE_ENTRIES):
+        self.blockchain = blockchain
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Tuple[str, str], str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0     # 304s answered from the ETag alone
+
+    def tip(self) -> str:
+        with self.blockchain.lock:
+            return self.blockchain.get_latest_block().hash
+
+    @staticmethod
+    def etag(key: str, tip: str) -> str:
+        """Strong entity tag (unquoted) for the body of `key` at `tip`."""
+        return hashlib.sha1(f"{key}@{tip}".encode()).hexdigest()[:24]
+
+    def lookup(self, key: str, tip: str) -> str | None:
+        with self._lock:
+            body = self._entries.get((key, tip))
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key, tip))
+            self.hits += 1
+            return body
+
+    def store(self, key: str, tip: str, body: str) -> None:
+        """Cache a body rendered from the chain ending at `tip`."""
+        with self._lock:
+            self._entries[(key, tip)] = body
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "not_modified": self.not_modified}